@@ -0,0 +1,17 @@
+"""
+In-loop PDF text extraction as it was before the process pool.
+
+Kept as the baseline for bench_pdf_extraction.py; not used by the app.
+"""
+
+from io import BytesIO
+
+from pypdf import PdfReader
+
+from routers.mindmap.pdf_extraction import join_pages
+
+
+def extract_text_from_pdf(contents: bytes) -> str:
+    """Extract text from PDF bytes in the calling thread."""
+    reader = PdfReader(BytesIO(contents))
+    return join_pages([page.extract_text() or "" for page in reader.pages])
@@ -0,0 +1,72 @@
+"""
+Microbenchmark: multi-pass legacy CTM validator vs the single-pass parser.
+
+Usage:
+    python -m benchmarks.bench_ctm_validator [--nodes 5000] [--maps 20] [--repeat 5]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import _legacy_ctm_validator as legacy
+from routers.mindmap import ctm_validator
+
+WORDS = [
+    "Phật Giáo", "Tứ Thánh Đế", "Suffering", "Origin", "Cessation", "Path", "Bát Chánh Đạo",
+    "Definition", "Example", "Data", "Context", "Method", "Cause", "Effect", "Comparison",
+]
+
+
+def synthetic_map(nodes: int, seed: int, attr_ratio: float = 0.2, escape_ratio: float = 0.05) -> str:
+    """Build a valid CTM map with ``nodes`` nodes, some attributes and escapes."""
+    rng = random.Random(seed)
+    lines = ["Root topic"]
+    level = 0
+    for _ in range(nodes - 1):
+        level = rng.randint(1, min(level + 1, 6))
+        label = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6)))
+        if rng.random() < escape_ratio:
+            label += r" a\|b \: c\, d"
+        if rng.random() < attr_ratio:
+            label += f"|color:#{rng.randint(0, 0xFFFFFF):06x},icon:star,weight:{rng.randint(1, 9)}"
+        lines.append(">" * level + label)
+    return "\n".join(lines)
+
+
+def throughput(validate, maps: list[str], repeat: int) -> float:
+    """Best-of-``repeat`` throughput in nodes per second."""
+    total_nodes = sum(m.count("\n") + 1 for m in maps)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for m in maps:
+            validate(m)
+        best = min(best, time.perf_counter() - started)
+    return total_nodes / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=5000, help="nodes per synthetic map")
+    parser.add_argument("--maps", type=int, default=20, help="number of synthetic maps")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions (best is kept)")
+    args = parser.parse_args()
+
+    maps = [synthetic_map(args.nodes, seed) for seed in range(args.maps)]
+
+    # Both implementations must agree before their speed is worth comparing
+    for m in maps:
+        assert legacy.validate_ctm(m) == ctm_validator.validate_ctm(m)
+
+    old = throughput(legacy.validate_ctm, maps, args.repeat)
+    new = throughput(ctm_validator.validate_ctm, maps, args.repeat)
+
+    print(f"maps: {args.maps} x {args.nodes} nodes")
+    print(f"legacy validate_ctm : {old:14,.0f} nodes/s")
+    print(f"single-pass parser  : {new:14,.0f} nodes/s")
+    print(f"speedup             : {new / old:14.2f}x")
+
+
+if __name__ == "__main__":
+    main()
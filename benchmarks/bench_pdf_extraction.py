@@ -0,0 +1,93 @@
+"""
+Event-loop latency while several large PDFs are extracted concurrently.
+
+Compares the old in-loop extraction (extract_text_from_pdf called from async
+code) with the process-pool extraction used by /file/generate/stream.
+
+Usage:
+    python -m benchmarks.bench_pdf_extraction [--pages 300] [--uploads 4]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks._legacy_pdf_extraction import extract_text_from_pdf
+from benchmarks.pdf_fixtures import make_pdf
+from routers.mindmap import pdf_extraction
+from routers.mindmap.service import open_pdf
+
+SAMPLE_INTERVAL = 0.005
+
+
+async def sample_lag(lags: list[float], stop: asyncio.Event) -> None:
+    """Record how late a short sleep wakes up: the event-loop lag."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(SAMPLE_INTERVAL)
+        lags.append(time.perf_counter() - started - SAMPLE_INTERVAL)
+
+
+async def inline_upload(contents: bytes) -> int:
+    # What the old handler did: parse synchronously inside `async def`
+    return len(extract_text_from_pdf(contents))
+
+
+async def pool_upload(contents: bytes) -> int:
+    page_count = await open_pdf(contents)
+    pages = [""] * page_count
+    async for start, texts in pdf_extraction.extract_pdf_pages(contents, page_count):
+        pages[start:start + len(texts)] = texts
+    return len(pdf_extraction.join_pages(pages))
+
+
+async def run(mode, documents: list[bytes]) -> dict:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_lag(lags, stop))
+    await asyncio.sleep(SAMPLE_INTERVAL * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(mode(contents) for contents in documents))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await sampler
+    lags.sort()
+    return {
+        "wall_s": elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000,
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] * 1000 if len(lags) > 1 else lags[-1] * 1000,
+        "lag_max_ms": lags[-1] * 1000,
+    }
+
+
+async def main_async(args) -> None:
+    documents = [make_pdf(args.pages, seed=i) for i in range(args.uploads)]
+    size_mb = sum(len(d) for d in documents) / 1024 / 1024
+    print(f"{args.uploads} concurrent uploads x {args.pages} pages ({size_mb:.1f} MB total)")
+
+    # Warm the pool so process start-up is not counted
+    await pool_upload(make_pdf(2))
+
+    for name, mode in (("in-loop (old)", inline_upload), ("process pool", pool_upload)):
+        result = await run(mode, documents)
+        print(
+            f"{name:14}  wall {result['wall_s']:6.2f}s  "
+            f"loop lag p50 {result['lag_p50_ms']:8.1f}ms  "
+            f"p99 {result['lag_p99_ms']:8.1f}ms  max {result['lag_max_ms']:8.1f}ms"
+        )
+
+    pdf_extraction.shutdown_pdf_executor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300, help="pages per PDF")
+    parser.add_argument("--uploads", type=int, default=4, help="concurrent uploads")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
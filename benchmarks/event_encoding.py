@@ -0,0 +1,97 @@
+"""
+Per-event cost of the stream encoders.
+
+Encodes realistic pipeline events with the former ``json.dumps`` lines and
+with the orjson NDJSON and SSE encoders, first in a tight loop, then through
+``encode_events`` on many concurrent streams (with and without heartbeats)
+to include the per-event scheduling overhead.
+
+Usage:
+    python -m benchmarks.event_encoding [--streams 1000] [--events 50]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.fake_ollama import VALID_CTM
+from core.event_stream import EventEncoder, NDJSONEncoder, SSEEncoder, encode_events
+
+
+class LegacyEncoder(EventEncoder):
+    """What create_event and the StreamingResponse did before: json.dumps, then UTF-8."""
+    media_type = "text/event-stream"
+
+    def encode(self, event: dict) -> bytes:
+        return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def heartbeat(self) -> bytes:
+        return b"\n"
+
+
+def sample_events(count: int) -> list[dict]:
+    events = [
+        {"id": i + 1, "status": "PROCESSING", "message": f"Đang tạo mindmap... (lần thử 1/3) {i}",
+         "data": {"attempt": 1, "max_retries": 3}}
+        for i in range(count - 1)
+    ]
+    events.append({
+        "id": count, "status": "SUCCESS", "message": "Tạo mindmap thành công!",
+        "data": {"ctm": VALID_CTM * 4, "attempts_used": 1, "validation_message": "Valid CTM format with 44 nodes.",
+                 "cached": False, "repaired": False, "repairs": [], "retries": 0}
+    })
+    return events
+
+
+def bench_encode(encoder: EventEncoder, events: list[dict], rounds: int) -> float:
+    """Microseconds per event, encoding only."""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for event in events:
+            encoder.encode(event)
+    return (time.perf_counter() - started) / (rounds * len(events)) * 1e6
+
+
+async def bench_streams(encoder: EventEncoder, events: list[dict], streams: int, heartbeat: float) -> float:
+    """Microseconds per event through encode_events, ``streams`` at a time on one loop."""
+    async def source():
+        for event in events:
+            await asyncio.sleep(0)
+            yield event
+
+    async def consume():
+        size = 0
+        async for chunk in encode_events(source(), encoder, heartbeat):
+            size += len(chunk)
+        return size
+
+    started = time.perf_counter()
+    await asyncio.gather(*(consume() for _ in range(streams)))
+    return (time.perf_counter() - started) / (streams * len(events)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=1000, help="concurrent streams")
+    parser.add_argument("--events", type=int, default=50, help="events per stream")
+    parser.add_argument("--rounds", type=int, default=2000, help="rounds of the encode-only loop")
+    args = parser.parse_args()
+
+    events = sample_events(args.events)
+    encoders = {"json.dumps": LegacyEncoder(), "ndjson": NDJSONEncoder(), "sse": SSEEncoder(3000)}
+
+    print(f"encode only ({args.events} events, {args.rounds} rounds), us/event:")
+    for name, encoder in encoders.items():
+        print(f"  {name:11} {bench_encode(encoder, events, args.rounds):8.2f}")
+
+    print(f"\nencode_events, {args.streams} concurrent streams x {args.events} events, us/event:")
+    print(f"  {'':11} {'no heartbeat':>14} {'heartbeat 15s':>14}")
+    for name, encoder in encoders.items():
+        plain = asyncio.run(bench_streams(encoder, events, args.streams, 0))
+        beating = asyncio.run(bench_streams(encoder, events, args.streams, 15.0))
+        print(f"  {name:11} {plain:14.2f} {beating:14.2f}")
+
+
+if __name__ == "__main__":
+    main()
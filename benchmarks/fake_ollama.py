@@ -0,0 +1,241 @@
+"""
+Stub Ollama server for offline benchmarks.
+
+Implements the parts of the Ollama HTTP API the app uses (/api/chat,
+/api/generate, /api/tags, /api/embed) with canned CTM answers, a
+configurable time to first token and token rate, and a configurable share
+of invalid answers to exercise the retry path. It also serves synthetic
+article pages under /pages/{n} as a local fixture for /web/generate/stream.
+
+Usage:
+    python -m benchmarks.fake_ollama [--port 11435] [--latency 0.2] [--token-rate 200]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+VALID_CTM = """Kiến thức tổng quan
+>Khái niệm
+>>Định nghĩa|color:blue
+>>Ví dụ
+>Cấu trúc
+>>Thành phần chính
+>>>Chi tiết
+>>Quan hệ
+>Ứng dụng
+>>Thực tế
+>>Nghiên cứu"""
+
+# Skips two levels, which the local repair stage does not fix
+INVALID_CTM = """Kiến thức tổng quan
+>Khái niệm
+>>>>Chi tiết lạc cấp
+>Ứng dụng"""
+
+EMBEDDING_DIM = 64
+PAGE_WORDS = (
+    "mindmap knowledge structure concept example context method cause effect comparison "
+    "definition attribute process result analysis summary detail level network learning"
+).split()
+
+
+@dataclass
+class FakeOllamaConfig:
+    latency: float = 0.2  # seconds before the first token
+    token_rate: float = 200.0  # tokens per second after the first one
+    invalid_ratio: float = 0.0  # share of chat answers that are invalid CTM
+    chars_per_token: int = 4
+    seed: int = 0
+    model: str = "fake-mindmap"
+    calls: dict[str, int] = field(default_factory=dict)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _tokens(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _embedding(text: str) -> list[float]:
+    """Bag-of-words hashing: texts sharing words get similar vectors."""
+    vector = [0.0] * EMBEDDING_DIM
+    for word in text.lower().split():
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[digest[0] % EMBEDDING_DIM] += 1.0 if digest[1] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _page(n: int) -> str:
+    rng = random.Random(n)
+    paragraphs = "\n".join(
+        "<p>" + " ".join(rng.choice(PAGE_WORDS) for _ in range(60)) + ".</p>"
+        for _ in range(12)
+    )
+    return (
+        f"<html><head><title>Article {n}</title></head><body>"
+        f"<nav>Home | About | Contact</nav><article><h1>Article {n}</h1>{paragraphs}</article>"
+        f"<footer>Copyright fixture</footer></body></html>"
+    )
+
+
+def create_app(config: FakeOllamaConfig) -> Starlette:
+    rng = random.Random(config.seed)
+
+    def count(name: str) -> None:
+        config.calls[name] = config.calls.get(name, 0) + 1
+
+    async def stream_answer(text: str, key: str, prompt_tokens: int, streaming: bool) -> Response:
+        started = time.perf_counter_ns()
+        tokens = _tokens(text, config.chars_per_token)
+
+        def message(content: str, done: bool) -> dict:
+            body = {"model": config.model, "created_at": _now(), "done": done}
+            if key == "message":
+                body["message"] = {"role": "assistant", "content": content}
+            else:
+                body["response"] = content
+            if done:
+                elapsed = time.perf_counter_ns() - started
+                body.update({
+                    "done_reason": "stop",
+                    "total_duration": elapsed,
+                    "load_duration": 0,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(config.latency * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": max(0, elapsed - int(config.latency * 1e9))
+                })
+            return body
+
+        if not streaming:
+            await asyncio.sleep(config.latency + len(tokens) / config.token_rate)
+            return JSONResponse(message(text, True))
+
+        async def lines():
+            await asyncio.sleep(config.latency)
+            # Sleep per batch of tokens, not per token, to keep timer overhead low
+            batch = max(1, int(config.token_rate / 50))
+            for i in range(0, len(tokens), batch):
+                for token in tokens[i:i + batch]:
+                    yield json.dumps(message(token, False)) + "\n"
+                await asyncio.sleep(batch / config.token_rate)
+            yield json.dumps(message("", True)) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    async def chat(request: Request) -> Response:
+        count("chat")
+        body = await request.json()
+        prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        text = INVALID_CTM if rng.random() < config.invalid_ratio else VALID_CTM
+        return await stream_answer(text, "message", len(prompt) // 4, body.get("stream", True))
+
+    async def generate(request: Request) -> Response:
+        count("generate")
+        body = await request.json()
+        prompt = body.get("prompt") or ""
+        if not prompt:
+            # Empty prompt: Ollama only loads the model
+            return JSONResponse({
+                "model": config.model, "created_at": _now(), "response": "",
+                "done": True, "done_reason": "load"
+            })
+        return await stream_answer(VALID_CTM, "response", len(prompt) // 4, body.get("stream", True))
+
+    async def tags(request: Request) -> Response:
+        count("tags")
+        return JSONResponse({"models": [{
+            "name": config.model, "model": config.model, "modified_at": _now(),
+            "size": 0, "digest": "0" * 64, "details": {"family": "fake"}
+        }]})
+
+    async def embed(request: Request) -> Response:
+        count("embed")
+        body = await request.json()
+        inputs = body.get("input") or ""
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return JSONResponse({
+            "model": body.get("model", config.model),
+            "embeddings": [_embedding(text) for text in inputs]
+        })
+
+    async def page(request: Request) -> Response:
+        count("pages")
+        n = int(request.path_params["n"])
+        html = _page(n)
+        etag = '"' + hashlib.sha256(html.encode("utf-8")).hexdigest()[:16] + '"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return HTMLResponse(html, headers={"ETag": etag})
+
+    return Starlette(routes=[
+        Route("/api/chat", chat, methods=["POST"]),
+        Route("/api/generate", generate, methods=["POST"]),
+        Route("/api/tags", tags, methods=["GET"]),
+        Route("/api/embed", embed, methods=["POST"]),
+        Route("/pages/{n:int}", page, methods=["GET"]),
+    ])
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn on its own event loop in a daemon thread."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on"))
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ServerThread":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="tokens per second")
+    parser.add_argument("--invalid-ratio", type=float, default=0.0, help="share of invalid CTM answers")
+    args = parser.parse_args()
+    config = FakeOllamaConfig(latency=args.latency, token_rate=args.token_rate, invalid_ratio=args.invalid_ratio)
+    uvicorn.run(create_app(config), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Offline load test of main.app against the stub Ollama server.
+
+Starts benchmarks.fake_ollama and the app on local ports (each on its own
+event loop), drives the three streaming endpoints at a fixed concurrency and
+reports time to first event and first node (NODES), total latency, throughput and the event-loop lag
+of the app. Results are saved as JSON; pass an earlier file as --baseline to
+compare runs.
+
+Usage:
+    python -m benchmarks.loadtest [--requests 40] [--concurrency 8] [--endpoints text,file,web]
+        [--latency 0.2] [--token-rate 200] [--invalid-ratio 0.1] [--output loadtest.json]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.fake_ollama import PAGE_WORDS, FakeOllamaConfig, ServerThread, create_app
+from benchmarks.pdf_fixtures import make_pdf
+from config.Setttings import settings
+
+SAMPLE_INTERVAL = 0.005
+ENDPOINTS = ("text", "file", "web")
+
+
+class LagSampler:
+    """Measures how late a short sleep wakes up on the app's event loop."""
+
+    def __init__(self):
+        self.lags: list[float] = []
+        self.stopped = threading.Event()
+
+    async def run(self) -> None:
+        while not self.stopped.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            self.lags.append(time.perf_counter() - started - SAMPLE_INTERVAL)
+
+
+def percentiles(values: list[float], scale: float = 1000.0) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, int(p * len(ordered) + 0.5) - 1))] * scale, 3)
+
+    return {"p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99), "max": round(ordered[-1] * scale, 3)}
+
+
+def build_request(endpoint: str, index: int, args, fake_url: str) -> dict:
+    """httpx request arguments; every input is unique so nothing is cached or coalesced."""
+    if endpoint == "text":
+        rng = random.Random(index)
+        words = " ".join(rng.choice(PAGE_WORDS) for _ in range(args.text_chars // 8))
+        return {"url": "/mindmap/generate/stream", "json": {"text": f"Document {index}. {words}"}}
+    if endpoint == "file":
+        pdf = make_pdf(args.pdf_pages, lines_per_page=20, seed=index)
+        return {
+            "url": "/mindmap/file/generate/stream",
+            "files": {"file": (f"document-{index}.pdf", pdf, "application/pdf")}
+        }
+    return {"url": "/mindmap/web/generate/stream", "params": {"site_url": f"{fake_url}/pages/{index}"}}
+
+
+async def timed_request(client: httpx.AsyncClient, request: dict) -> dict:
+    started = time.perf_counter()
+    first_event = None
+    first_node = None
+    last_status = None
+    events = 0
+    async with client.stream("POST", **request) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return {"http_status": response.status_code, "ttfe": None, "ttfn": None,
+                    "total": time.perf_counter() - started, "status": None, "events": 0}
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            if first_event is None:
+                first_event = time.perf_counter() - started
+            events += 1
+            last_status = json.loads(line).get("status")
+            if first_node is None and last_status == "NODES":
+                first_node = time.perf_counter() - started
+    return {"http_status": 200, "ttfe": first_event, "ttfn": first_node, "total": time.perf_counter() - started,
+            "status": last_status, "events": events}
+
+
+async def run_scenario(endpoint: str, args, app_url: str, fake_url: str, first_index: int) -> list[dict]:
+    # Inputs are built up front so generating them is not measured
+    requests = [build_request(endpoint, first_index + i, args, fake_url) for i in range(args.requests)]
+    queue = iter(requests)
+    results: list[dict] = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=None, limits=limits) as client:
+        async def worker():
+            for request in queue:
+                results.append(await timed_request(client, request))
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return results
+
+
+def summarize(results: list[dict], wall: float, lags: list[float], llm_calls: int) -> dict:
+    statuses: dict[str, int] = {}
+    for result in results:
+        key = result["status"] or f"HTTP {result['http_status']}"
+        statuses[key] = statuses.get(key, 0) + 1
+    ok = statuses.get("SUCCESS", 0)
+    return {
+        "requests": len(results),
+        "succeeded": ok,
+        "statuses": statuses,
+        "wall_s": round(wall, 3),
+        "rps": round(len(results) / wall, 3) if wall else None,
+        "ttfe_ms": percentiles([r["ttfe"] for r in results if r["ttfe"] is not None]),
+        "ttfn_ms": percentiles([r["ttfn"] for r in results if r["ttfn"] is not None]),
+        "latency_ms": percentiles([r["total"] for r in results]),
+        "loop_lag_ms": percentiles(lags),
+        "llm_calls": llm_calls
+    }
+
+
+def print_summary(name: str, summary: dict) -> None:
+    print(
+        f"{name:5} {summary['succeeded']:4}/{summary['requests']:<4} ok  {summary['rps']:7.2f} req/s  "
+        f"TTFE p50 {summary['ttfe_ms']['p50']}ms p95 {summary['ttfe_ms']['p95']}ms p99 {summary['ttfe_ms']['p99']}ms  "
+        f"TTFN p50 {summary['ttfn_ms']['p50']}ms p95 {summary['ttfn_ms']['p95']}ms  "
+        f"latency p50 {summary['latency_ms']['p50']}ms p95 {summary['latency_ms']['p95']}ms "
+        f"p99 {summary['latency_ms']['p99']}ms  loop lag p99 {summary['loop_lag_ms']['p99']}ms"
+    )
+
+
+def print_comparison(current: dict, baseline: dict) -> None:
+    print("\nvs baseline:")
+    for name, summary in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for label, now, then in (
+            ("rps", summary["rps"], before["rps"]),
+            ("latency p95", summary["latency_ms"]["p95"], before["latency_ms"]["p95"]),
+            ("TTFE p95", summary["ttfe_ms"]["p95"], before["ttfe_ms"]["p95"]),
+            ("TTFN p95", summary.get("ttfn_ms", {}).get("p95"), before.get("ttfn_ms", {}).get("p95")),
+            ("loop lag p99", summary["loop_lag_ms"]["p99"], before["loop_lag_ms"]["p99"]),
+        ):
+            if now is not None and then:
+                changes.append(f"{label} {(now - then) / then * 100:+.1f}%")
+        print(f"{name:5} " + "  ".join(changes))
+
+
+async def drive(args, app_url: str, fake_url: str, sampler: LagSampler, fake_config: FakeOllamaConfig) -> dict:
+    scenarios = {}
+    for offset, endpoint in enumerate(args.endpoints):
+        # One unmeasured request warms pools and clients
+        warmup = await run_scenario(endpoint, argparse.Namespace(**{**vars(args), "requests": 1, "concurrency": 1}),
+                                    app_url, fake_url, first_index=10_000_000 + offset)
+        if warmup[0]["status"] is None:
+            raise RuntimeError(f"Warm-up request to '{endpoint}' failed: {warmup[0]}")
+
+        lag_start = len(sampler.lags)
+        calls_start = fake_config.calls.get("chat", 0)
+        started = time.perf_counter()
+        results = await run_scenario(endpoint, args, app_url, fake_url, first_index=offset * 1_000_000)
+        wall = time.perf_counter() - started
+        scenarios[endpoint] = summarize(
+            results, wall, sampler.lags[lag_start:], fake_config.calls.get("chat", 0) - calls_start
+        )
+        print_summary(endpoint, scenarios[endpoint])
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--endpoints", default="text,file,web", help="comma-separated subset of text,file,web")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub time to first token (s)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="stub tokens per second")
+    parser.add_argument("--invalid-ratio", type=float, default=0.1, help="share of invalid CTM answers")
+    parser.add_argument("--text-chars", type=int, default=4000, help="size of text inputs")
+    parser.add_argument("--pdf-pages", type=int, default=10, help="pages per generated PDF")
+    parser.add_argument("--backend-concurrency", type=int, default=None,
+                        help="override scheduler_ollama_max_concurrency")
+    parser.add_argument("--cache", action="store_true", help="keep the result and web caches enabled")
+    parser.add_argument("--output", default="loadtest.json", help="where to save the JSON results")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare with")
+    args = parser.parse_args()
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    fake_config = FakeOllamaConfig(latency=args.latency, token_rate=args.token_rate, invalid_ratio=args.invalid_ratio)
+    fake = ServerThread(create_app(fake_config)).start()
+
+    # Point the app at the stub before anything creates an LLM client
+    settings.ollama_base_url = fake.url
+    settings.ollama_chat_model = fake_config.model
+    settings.mindmap_cache_enabled = args.cache
+    settings.web_cache_enabled = args.cache
+    if args.backend_concurrency is not None:
+        settings.scheduler_ollama_max_concurrency = args.backend_concurrency
+
+    from main import app
+    server = ServerThread(app).start()
+    sampler = LagSampler()
+    asyncio.run_coroutine_threadsafe(sampler.run(), server.loop)
+
+    print(
+        f"{args.requests} requests x {args.concurrency} concurrent per endpoint; stub latency {args.latency}s, "
+        f"{args.token_rate} tok/s, {args.invalid_ratio:.0%} invalid"
+    )
+    try:
+        scenarios = asyncio.run(drive(args, server.url, fake.url, sampler, fake_config))
+    finally:
+        sampler.stopped.set()
+        server.stop()
+        fake.stop()
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "settings": {
+            "scheduler_ollama_max_concurrency": settings.scheduler_ollama_max_concurrency,
+            "mindmap_stream_llm": settings.mindmap_stream_llm,
+            "mindmap_progressive_nodes": settings.mindmap_progressive_nodes,
+            "mindmap_auto_repair": settings.mindmap_auto_repair
+        },
+        "scenarios": scenarios
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,127 @@ class Settings(BaseSettings):
     ollama_embedding_model: str = ""
     mindmap_generate_max_retry: int = 3
 
+    # Ollama warm-up: preload the chat model at startup and keep it resident.
+    # keep_alive is a duration ("30m") or seconds, negative = forever; the model is
+    # pinged again after the backend was idle for the interval (0 = warm-up only)
+    ollama_warmup_enabled: bool = True
+    ollama_keep_alive: str = "30m"
+    ollama_keep_warm_interval_seconds: int = 600
+    ollama_warmup_timeout_seconds: float = 300.0
+
+    # Pooled LLM clients (keyed by backend, model and hashed API key)
+    llm_pool_max_clients: int = 64
+    llm_pool_idle_ttl_seconds: int = 900
+    # Concurrent generations per backend; extra requests wait in a FIFO queue and
+    # end with an ERROR event (retry_after) once the queue is full. Requests answered
+    # by a cache or joining a running generation never need a place in the queue
+    scheduler_ollama_max_concurrency: int = 2
+    scheduler_gemini_max_concurrency: int = 8
+    scheduler_max_queue_depth: int = 32
+    # Starting point of the per-backend service time estimate used for ETAs
+    scheduler_initial_service_seconds: float = 20.0
+    # Hedging, opt-in per request (llm_config.hedge, needs a Gemini key): the same call goes to
+    # the other backend once the first exceeds the latency percentile of its backend (the
+    # default delay until enough samples); the first valid CTM wins and the other is cancelled.
+    # A backend failing breaker_failure_threshold calls in a row is skipped for the reset time
+    hedging_enabled: bool = True
+    hedge_latency_percentile: float = 0.9
+    hedge_default_delay_seconds: float = 15.0
+    hedge_min_samples: int = 5
+    hedge_latency_window: int = 100
+    breaker_failure_threshold: int = 3
+    breaker_reset_seconds: float = 30.0
+    # Consume llm.astream and abort a generation at the first invalid CTM line
+    mindmap_stream_llm: bool = False
+    # Progressive delivery: completed nodes are sent as NODES events while the output
+    # streams, at most one per interval. Turning it on also turns on mindmap_stream_llm
+    # for every unhedged request; hedged requests race whole answers and get no NODES
+    mindmap_progressive_nodes: bool = False
+    mindmap_nodes_interval_ms: int = 250
+    # Fix mechanical CTM errors locally before falling back to an LLM retry
+    mindmap_auto_repair: bool = True
+    # Tree output (output.format=tree) is compressed from this JSON size when the client accepts it
+    mindmap_tree_compress_min_bytes: int = 1024
+
+    # Optional input compression before generation: repeated PDF page headers/footers are
+    # dropped, near-duplicate passages (embedding cosine >= threshold) removed and, above the
+    # token budget (0 = none, tokens estimated from characters), the most central passages kept
+    input_compression_enabled: bool = False
+    input_compression_dedup_threshold: float = 0.95
+    input_compression_max_tokens: int = 0
+    input_compression_chars_per_token: float = 4.0
+    input_compression_embed_timeout_seconds: float = 30.0
+
+    # Long documents are split into chunks that are mapped concurrently (0 disables); the
+    # concurrency is also capped by the backend scheduler slots free when the map starts
+    mindmap_long_document_threshold_chars: int = 48000
+    mindmap_chunk_max_chars: int = 16000
+    mindmap_chunk_concurrency: int = 4
+
+    # Uploads are streamed to a spooled temp file; the limit is enforced while they arrive
+    max_upload_size_mb: int = 50
+    upload_spool_max_memory: int = 1024 * 1024
+
+    # Event streams: idle time before a heartbeat (0 disables) and the SSE reconnection hint
+    stream_heartbeat_seconds: float = 15.0
+    stream_sse_retry_ms: int = 3000
+
+    # Resumable streams: every generation runs as a detached job whose recent events
+    # are buffered for reattaching; status and results are kept in SQLite (empty path disables).
+    # A job is cancelled job_disconnect_grace_seconds after its last listener disconnected
+    job_event_buffer_size: int = 256
+    job_disconnect_grace_seconds: int = 15
+    job_abandon_seconds: int = 300
+    job_ttl_seconds: int = 24 * 3600
+    job_store_path: str = "mindmap_jobs.sqlite3"
+
+    # Batch jobs: shared worker pool, item/upload limits and retention of finished jobs
+    batch_workers: int = 4
+    batch_max_items: int = 200
+    batch_max_upload_mb: int = 200
+    batch_job_ttl_seconds: int = 3600
+
+    # PDF extraction process pool (0 workers = one per CPU)
+    pdf_extract_workers: int = 2
+    pdf_pages_per_task: int = 16
+
+    # Web page fetching (shared pooled client) and extraction pool
+    web_fetch_connect_timeout: float = 5.0
+    web_fetch_read_timeout: float = 15.0
+    web_fetch_max_bytes: int = 5 * 1024 * 1024
+    web_fetch_max_redirects: int = 5
+    web_fetch_max_connections: int = 100
+    web_fetch_max_connections_per_host: int = 4
+    web_extract_workers: int = 4
+    # Extracted pages, revalidated with conditional GETs
+    web_cache_enabled: bool = True
+    web_cache_max_entries: int = 1024
+    web_cache_max_bytes: int = 64 * 1024 * 1024
+    web_cache_ttl_seconds: int = 24 * 3600
+
+    # Result cache (in-memory LRU, optional on-disk tier when a directory is set)
+    mindmap_cache_enabled: bool = True
+    mindmap_cache_max_entries: int = 512
+    mindmap_cache_dir: str = ""
+    mindmap_cache_ttl_seconds: int = 7 * 24 * 3600
+    mindmap_cache_max_bytes: int = 256 * 1024 * 1024
+    # Semantic cache: near-duplicate inputs (cosine similarity of their ollama_embedding_model
+    # vectors >= threshold, similar length) reuse a stored result. Needs an embedding model;
+    # long inputs are embedded by their head and tail; an empty path disables persistence
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.97
+    semantic_cache_min_length_ratio: float = 0.8
+    semantic_cache_max_entries: int = 10000
+    semantic_cache_embed_max_chars: int = 8000
+    semantic_cache_embed_timeout_seconds: float = 10.0
+    semantic_cache_path: str = "mindmap_semantic_cache.npz"
+    semantic_cache_save_interval_seconds: int = 60
+
+    # Static files are compressed once (gzip, brotli/zstd when installed) and served with
+    # fingerprinted immutable URLs; static_watch rebuilds them when a file changes (development)
+    static_precompress: bool = True
+    static_watch: bool = False
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,261 @@
+"""
+Generic caches shared by the mindmap pipeline.
+
+- LRUCache: bounded in-memory tier with optional TTL and byte budget
+- DiskCache: optional on-disk tier with TTL and size-based eviction
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Generic, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    Thread-safe least-recently-used cache.
+
+    Args:
+        max_entries: Maximum number of entries kept in memory
+        max_bytes: Optional byte budget, measured with ``sizeof``
+        ttl_seconds: Optional time-to-live; expired entries count as misses
+        sizeof: Function returning the size of a value in bytes
+        sliding: Refresh the TTL on every hit (idle expiry instead of age expiry)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int | None = None,
+        ttl_seconds: float | None = None,
+        sizeof: Callable[[V], int] | None = None,
+        sliding: bool = False,
+        on_evict: Callable[[str, V], None] | None = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sliding = sliding
+        self._sizeof = sizeof or (lambda value: 0)
+        self._on_evict = on_evict
+        # key -> (value, stored_at, size)
+        self._data: OrderedDict[str, tuple[V, float, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> V | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at, size = entry
+            now = time.monotonic()
+            if self.ttl_seconds is not None and now - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            if self.sliding:
+                self._data[key] = (value, now, size)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: V) -> None:
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key, evicted=False)
+            self._data[key] = (value, time.monotonic(), size)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key: str) -> V | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._remove(key, evicted=False)
+            return entry[0]
+
+    def expire(self) -> int:
+        """Drop every expired entry. Returns the number of entries dropped."""
+        if self.ttl_seconds is None:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, (_, stored_at, _) in self._data.items() if now - stored_at > self.ttl_seconds]
+            for key in expired:
+                self._remove(key)
+        return len(expired)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._data):
+                self._remove(key, evicted=False)
+
+    def values(self) -> list[V]:
+        with self._lock:
+            return [value for value, _, _ in self._data.values()]
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+
+    def _remove(self, key: str, evicted: bool = True) -> None:
+        value, _, size = self._data.pop(key)
+        self._bytes -= size
+        if evicted:
+            self.evictions += 1
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+
+
+class DiskCache:
+    """
+    JSON-on-disk cache with TTL and size-based eviction.
+
+    Every entry is one file named after the key. Blocking file I/O, so call it
+    through ``asyncio.to_thread`` from async code.
+
+    The size of the entries is tracked in memory (seeded from the directory
+    once), so a write only scans the directory when the budget is exceeded;
+    that scan also corrects the totals for files changed by other processes.
+
+    Args:
+        directory: Directory holding the cache files (created on demand)
+        ttl_seconds: Entries older than this are treated as misses and removed
+        max_bytes: Oldest entries are removed once the directory exceeds this size
+    """
+
+    def __init__(self, directory: str | os.PathLike, ttl_seconds: float | None = None, max_bytes: int | None = None):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # File name -> size in bytes of every entry, and their total
+        self._sizes: dict[str, int] = {}
+        self._bytes = 0
+        with self._lock:
+            self._scan()
+
+    def get(self, key: str) -> Any | None:
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if self.ttl_seconds is not None and time.time() - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                with self._lock:
+                    self._bytes -= self._sizes.pop(path.name, 0)
+                self.misses += 1
+                return None
+            with path.open("r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Write an entry atomically; raises OSError when the disk write fails."""
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # A unique temp file per write, so concurrent writers of one key never share it
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=f".{path.stem[:16]}-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self._bytes += len(data) - self._sizes.get(path.name, 0)
+            self._sizes[path.name] = len(data)
+            if self.max_bytes is not None and self._bytes > self.max_bytes:
+                self._evict()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "directory": str(self.directory),
+            "entries": len(self._sizes),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _path(self, key: str) -> Path:
+        # Keys may be arbitrary strings; hash them into safe file names
+        return self.directory / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+    def _scan(self) -> list[tuple[Path, os.stat_result]]:
+        """Re-read the entries from the directory, dropping expired ones. Call with the lock held."""
+        try:
+            entries = [(p, p.stat()) for p in self.directory.glob("*.json")]
+        except OSError:
+            return []
+        now = time.time()
+        live = []
+        for path, stat in entries:
+            if self.ttl_seconds is not None and now - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                self.evictions += 1
+                continue
+            live.append((path, stat))
+        self._sizes = {path.name: stat.st_size for path, stat in live}
+        self._bytes = sum(self._sizes.values())
+        return live
+
+    def _evict(self) -> None:
+        """Remove expired, then oldest entries until the budget fits. Call with the lock held."""
+        live = self._scan()
+        if self.max_bytes is None or self._bytes <= self.max_bytes:
+            return
+        # Oldest first
+        live.sort(key=lambda item: item[1].st_mtime)
+        for path, stat in live:
+            if self._bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._bytes -= self._sizes.pop(path.name)
+            self.evictions += 1
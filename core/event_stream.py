@@ -0,0 +1,155 @@
+"""
+Wire encoding of event streams.
+
+The pipeline yields plain event dicts; they are serialized (with orjson) only
+here, at the edge, by one of two encoders:
+
+- ``SSEEncoder``: real Server-Sent Events (``id:``/``data:`` framing, a
+  ``retry:`` hint and ``:`` comment heartbeats). Works with ``EventSource``,
+  which reconnects with ``Last-Event-ID`` on its own.
+- ``NDJSONEncoder``: one JSON object per line, as existing clients expect;
+  heartbeats are blank lines, which they already skip.
+
+Heartbeats are sent whenever no event was written for ``heartbeat_seconds``,
+so proxies do not buffer or time out the stream during long LLM calls.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import AsyncGenerator
+
+import orjson
+
+# Queue markers of encode_events
+_END = object()
+_HEARTBEAT = object()
+
+
+class EventEncoder(ABC):
+    media_type = ""
+
+    def preamble(self) -> bytes:
+        """Bytes sent before the first event."""
+        return b""
+
+    @abstractmethod
+    def encode(self, event: dict) -> bytes:
+        """Wire bytes of one event."""
+
+    @abstractmethod
+    def heartbeat(self) -> bytes:
+        """Bytes that keep an idle stream open."""
+
+
+class NDJSONEncoder(EventEncoder):
+    media_type = "application/x-ndjson"
+
+    def encode(self, event: dict) -> bytes:
+        return orjson.dumps(event, option=orjson.OPT_APPEND_NEWLINE)
+
+    def heartbeat(self) -> bytes:
+        return b"\n"
+
+
+class SSEEncoder(EventEncoder):
+    media_type = "text/event-stream"
+
+    def __init__(self, retry_ms: int | None = None):
+        self.retry_ms = retry_ms
+
+    def preamble(self) -> bytes:
+        # Reconnection delay hint for EventSource
+        return b"retry: %d\n\n" % self.retry_ms if self.retry_ms else b""
+
+    def encode(self, event: dict) -> bytes:
+        data = orjson.dumps(event)
+        event_id = event.get("id")
+        if event_id is None:
+            return b"data: " + data + b"\n\n"
+        # orjson never emits raw newlines, so the JSON fits on one data: line
+        return b"id: %d\ndata: %s\n\n" % (event_id, data)
+
+    def heartbeat(self) -> bytes:
+        return b": keep-alive\n\n"
+
+
+def select_encoder(accept: str | None, requested: str | None = None, retry_ms: int | None = None) -> EventEncoder:
+    """
+    Pick the encoder for a request.
+
+    Args:
+        accept: Accept header; ``text/event-stream`` selects SSE
+        requested: Explicit choice (``sse`` or ``ndjson``), wins over the header
+        retry_ms: SSE reconnection hint
+    """
+    if requested is None:
+        requested = "sse" if accept and "text/event-stream" in accept else "ndjson"
+    return SSEEncoder(retry_ms) if requested == "sse" else NDJSONEncoder()
+
+
+async def encode_events(
+    events: AsyncGenerator[dict, None],
+    encoder: EventEncoder,
+    heartbeat_seconds: float = 0
+) -> AsyncGenerator[bytes, None]:
+    """
+    Encode a stream of event dicts, with a heartbeat after each quiet period.
+
+    Args:
+        events: Event dicts
+        encoder: Wire format
+        heartbeat_seconds: Idle time before a heartbeat (0 disables heartbeats)
+    """
+    preamble = encoder.preamble()
+    if preamble:
+        yield preamble
+
+    try:
+        if heartbeat_seconds <= 0:
+            async for event in events:
+                yield encoder.encode(event)
+            return
+
+        # Events are pulled by a separate task so a quiet period never cancels the
+        # generator; the heartbeat timer fires once per period, not once per event
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        last_write = loop.time()
+
+        async def pump():
+            try:
+                async for event in events:
+                    await queue.put(event)
+            except Exception as e:
+                await queue.put(e)
+            else:
+                await queue.put(_END)
+
+        def beat():
+            nonlocal timer
+            idle = loop.time() - last_write
+            if idle >= heartbeat_seconds and queue.empty():
+                queue.put_nowait(_HEARTBEAT)
+                idle = 0
+            timer = loop.call_later(heartbeat_seconds - idle, beat)
+
+        pump_task = asyncio.create_task(pump())
+        timer = loop.call_later(heartbeat_seconds, beat)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    return
+                if item is _HEARTBEAT:
+                    yield encoder.heartbeat()
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield encoder.encode(item)
+                last_write = loop.time()
+        finally:
+            timer.cancel()
+            pump_task.cancel()
+            await asyncio.gather(pump_task, return_exceptions=True)
+    finally:
+        await events.aclose()
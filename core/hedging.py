@@ -0,0 +1,323 @@
+"""
+Hedged LLM calls with failover between backends and per-backend circuit breakers.
+
+A hedged call starts on the preferred backend. Once it has run longer than
+the ``hedge_latency_percentile`` of that backend's recent call durations
+(``hedge_default_delay_seconds`` until ``hedge_min_samples`` are known), the
+same call is also sent to the next backend; the first acceptable answer wins
+and the other call is cancelled. A call that fails starts the next backend
+at once (failover).
+
+Each backend has a circuit breaker: after ``breaker_failure_threshold``
+failures in a row it opens and the backend is skipped for
+``breaker_reset_seconds``, then a single trial call decides whether it
+closes again. Unhedged calls feed the same breakers and latency samples
+through ``track``, so a hedged request starts with current numbers.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable
+
+from config.Setttings import settings
+from core import metrics
+
+
+class BackendBusy(Exception):
+    """Raised by a call that could not get a slot on its backend; does not count as a failure."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one trial call) -> closed or open."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0  # in a row
+        self.opened_at = 0.0  # monotonic
+        self.trips = 0
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        """Whether a call may go to the backend now; in half-open state only the first caller gets the trial."""
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial_running:
+                return False
+            self._trial_running = True
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_abandoned(self) -> None:
+        """The call ended without an outcome (cancelled or busy): a half-open breaker may try again."""
+        self._trial_running = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures_in_a_row": self.failures,
+            "trips": self.trips,
+            "retry_in_seconds": (
+                round(max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 1)
+                if self.state == "open" else None
+            )
+        }
+
+
+class BackendHealth:
+    """Breaker, recent call durations and race outcomes of one backend."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_reset_seconds)
+        # Durations of completed calls, newest last
+        self.latencies: deque[float] = deque(maxlen=settings.hedge_latency_window)
+        self.calls = 0
+        self.failures = 0
+        self.last_error: str | None = None
+        # Hedged races this backend was called in, and won
+        self.races = 0
+        self.wins = 0
+        self.rejected = 0  # answers of a race that were not acceptable
+        self.cancelled = 0  # calls that lost a race
+        self.busy = 0
+        self.skipped = 0  # calls not made because the breaker was open
+        self.hedges = 0  # started because the other backend was slow
+        self.failovers = 0  # started because the other backend failed or was skipped
+
+    def record_latency(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self.breaker.record_success()
+        metrics.backend_latency.observe(seconds, backend=self.name)
+
+    def record_failure(self, error: BaseException) -> None:
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.breaker.record_failure()
+        metrics.backend_calls.inc(backend=self.name, result="failed")
+
+    def latency_percentile(self, q: float) -> float | None:
+        """Nearest-rank percentile (``q`` in 0..1) of the recent call durations."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+    def hedge_delay(self) -> float:
+        """How long a call may run before it is hedged."""
+        if len(self.latencies) < settings.hedge_min_samples:
+            return settings.hedge_default_delay_seconds
+        return self.latency_percentile(settings.hedge_latency_percentile)
+
+    def stats(self) -> dict:
+        def percentile(q: float) -> float | None:
+            value = self.latency_percentile(q)
+            return round(value, 3) if value is not None else None
+
+        return {
+            "breaker": self.breaker.stats(),
+            "calls": self.calls,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "latency_samples": len(self.latencies),
+            "latency_p50_seconds": percentile(0.5),
+            "latency_p90_seconds": percentile(0.9),
+            "latency_p99_seconds": percentile(0.99),
+            "hedge_delay_seconds": round(self.hedge_delay(), 3),
+            "races": self.races,
+            "wins": self.wins,
+            "win_rate": round(self.wins / self.races, 4) if self.races else None,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "busy": self.busy,
+            "skipped": self.skipped,
+            "hedges": self.hedges,
+            "failovers": self.failovers
+        }
+
+
+class _CallRecord:
+    complete = True
+
+
+class Hedger:
+    """Per-backend health, created on first use, and the hedged race over backends."""
+
+    def __init__(self):
+        self.backends: dict[str, BackendHealth] = {}
+        self.races = 0
+        self.hedged_races = 0  # races that called more than one backend
+
+    def backend(self, name: str) -> BackendHealth:
+        health = self.backends.get(name)
+        if health is None:
+            health = self.backends[name] = BackendHealth(name)
+        return health
+
+    @contextmanager
+    def track(self, name: str):
+        """
+        Record one unhedged call to ``name``: its duration, or its failure.
+
+        Set ``complete = False`` on the yielded record when the call was cut
+        short on purpose, so its duration is not taken as a latency sample.
+        """
+        health = self.backend(name)
+        health.calls += 1
+        record = _CallRecord()
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            health.record_failure(e)
+            raise
+        if record.complete:
+            health.record_latency(time.perf_counter() - started)
+        else:
+            health.breaker.record_success()
+        metrics.backend_calls.inc(backend=name, result="ok")
+
+    async def race(
+        self,
+        calls: dict[str, Callable[[], Awaitable[str]]],
+        accept: Callable[[str], bool]
+    ) -> tuple[str, str]:
+        """
+        Run one call on several backends, hedging slow calls and failing over failed ones.
+
+        Args:
+            calls: Call factory per backend name, preferred backend first
+            accept: Whether an answer is good enough to win
+
+        Returns:
+            Tuple of (backend, answer): the first accepted answer, otherwise the
+            last answer received, for a corrective retry
+
+        Raises:
+            The error of the last failed call when no backend answered
+        """
+        self.races += 1
+        waiting = [self.backend(name) for name in calls]
+        running: dict[asyncio.Future, tuple[BackendHealth, float]] = {}
+        deadline: float | None = None
+        answer: tuple[str, str] | None = None
+        error: BaseException | None = None
+
+        preferred = waiting[0]
+        started_calls = 0
+
+        def start(health: BackendHealth, reason: str | None) -> None:
+            nonlocal deadline, started_calls
+            if reason is None and health is not preferred:
+                # The preferred backend was skipped
+                reason = "failover"
+            waiting.remove(health)
+            started_calls += 1
+            health.calls += 1
+            health.races += 1
+            if reason == "hedge":
+                health.hedges += 1
+            elif reason == "failover":
+                health.failovers += 1
+            if reason is not None:
+                metrics.hedges.inc(reason=reason)
+            task = asyncio.ensure_future(calls[health.name]())
+            now = time.perf_counter()
+            running[task] = (health, now)
+            deadline = now + health.hedge_delay()
+
+        def start_next(reason: str | None) -> bool:
+            """Start the next backend whose breaker lets a call through."""
+            for health in list(waiting):
+                if health.breaker.allow():
+                    start(health, reason)
+                    return True
+                waiting.remove(health)
+                health.skipped += 1
+                metrics.backend_calls.inc(backend=health.name, result="skipped")
+            return False
+
+        if not start_next(None):
+            # Every breaker is open: a call to the preferred backend beats failing without one
+            waiting.append(preferred)
+            start(preferred, None)
+        try:
+            while running:
+                timeout = max(0.0, deadline - time.perf_counter()) if waiting else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The newest call is slower than usual for its backend
+                    start_next("hedge")
+                    continue
+
+                for task in done:
+                    health, started = running.pop(task)
+                    try:
+                        text = task.result()
+                    except BackendBusy:
+                        health.busy += 1
+                        health.breaker.record_abandoned()
+                        metrics.backend_calls.inc(backend=health.name, result="busy")
+                        continue
+                    except Exception as e:
+                        health.record_failure(e)
+                        error = e
+                        continue
+
+                    health.record_latency(time.perf_counter() - started)
+                    if accept(text):
+                        health.wins += 1
+                        metrics.backend_calls.inc(backend=health.name, result="won")
+                        return health.name, text
+                    health.rejected += 1
+                    metrics.backend_calls.inc(backend=health.name, result="rejected")
+                    answer = (health.name, text)
+
+                if not running and answer is None:
+                    # Nothing left to wait for: fail over instead of hedging later
+                    start_next("failover")
+        finally:
+            if started_calls > 1:
+                self.hedged_races += 1
+            for task, (health, _) in running.items():
+                task.cancel()
+                health.cancelled += 1
+                health.breaker.record_abandoned()
+                metrics.backend_calls.inc(backend=health.name, result="cancelled")
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        if answer is not None:
+            return answer
+        if error is None:
+            error = BackendBusy("No backend could take the call")
+        raise error
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.hedging_enabled,
+            "races": self.races,
+            "hedged_races": self.hedged_races,
+            "backends": {name: health.stats() for name, health in self.backends.items()}
+        }
+
+
+hedger = Hedger()
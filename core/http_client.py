@@ -0,0 +1,121 @@
+"""
+Shared async HTTP client for fetching web pages.
+
+One pooled httpx client is reused by every request, with per-host connection
+limits, connect/read timeouts, a redirect limit and a cap on the body size.
+"""
+
+import asyncio
+from typing import TypedDict
+from urllib.parse import urlsplit
+
+import httpx
+
+from config.Setttings import settings
+
+USER_AGENT = "Mozilla/5.0 (compatible; Text2Mindmap/1.0)"
+# Idle per-host semaphores are dropped once this many hosts are tracked
+MAX_TRACKED_HOSTS = 4096
+
+_client: httpx.AsyncClient | None = None
+_host_limits: dict[str, asyncio.Semaphore] = {}
+
+
+class FetchError(Exception):
+    """Raised when a page cannot be fetched within the configured limits."""
+
+
+class FetchResult(TypedDict):
+    url: str
+    status_code: int
+    content: bytes
+    headers: dict[str, str]
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Lazily create the shared client."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            max_redirects=settings.web_fetch_max_redirects,
+            timeout=httpx.Timeout(
+                settings.web_fetch_read_timeout,
+                connect=settings.web_fetch_connect_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.web_fetch_max_connections,
+                max_keepalive_connections=settings.web_fetch_max_connections
+            ),
+            headers={"User-Agent": USER_AGENT}
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_limits.clear()
+
+
+def _host_limit(host: str) -> asyncio.Semaphore:
+    semaphore = _host_limits.get(host)
+    if semaphore is None:
+        if len(_host_limits) >= MAX_TRACKED_HOSTS:
+            for idle_host in [h for h, s in _host_limits.items() if not s.locked()]:
+                del _host_limits[idle_host]
+        semaphore = _host_limits[host] = asyncio.Semaphore(settings.web_fetch_max_connections_per_host)
+    return semaphore
+
+
+async def fetch_url(url: str, headers: dict[str, str] | None = None) -> FetchResult:
+    """
+    Download a page through the shared client.
+
+    Args:
+        url: http(s) URL to fetch
+        headers: Extra request headers (e.g. conditional request validators)
+
+    Returns:
+        FetchResult; a ``304 Not Modified`` is returned with an empty body
+
+    Raises:
+        FetchError: invalid URL, network error, timeout, too many redirects,
+            error status or a body larger than ``web_fetch_max_bytes``
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise FetchError(f"Unsupported URL: {url}")
+
+    max_bytes = settings.web_fetch_max_bytes
+    async with _host_limit(parts.hostname.lower()):
+        try:
+            async with get_http_client().stream("GET", url, headers=headers) as response:
+                if response.status_code == 304:
+                    return _result(response, b"")
+                if response.status_code >= 400:
+                    raise FetchError(f"HTTP {response.status_code} for {url}")
+
+                declared = response.headers.get("content-length")
+                if declared and declared.isdigit() and int(declared) > max_bytes:
+                    raise FetchError(f"Response too large ({declared} bytes) for {url}")
+
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) > max_bytes:
+                        raise FetchError(f"Response exceeded {max_bytes} bytes for {url}")
+                return _result(response, bytes(body))
+        except httpx.HTTPError as e:
+            raise FetchError(f"{type(e).__name__} for {url}: {e}") from e
+
+
+def _result(response: httpx.Response, content: bytes) -> FetchResult:
+    return {
+        "url": str(response.url),
+        "status_code": response.status_code,
+        "content": content,
+        "headers": dict(response.headers)
+    }
@@ -1,42 +1,182 @@
+import hashlib
+import time
+from typing import Any, Callable
+
 from langchain_ollama import ChatOllama
 
 from config.Setttings import settings
+from core.cache import LRUCache
 
-# Sync LLM for backwards compatibility
-sync_llm = ChatOllama(
-    model=settings.ollama_chat_model,
-    base_url=settings.ollama_base_url
-)
+GEMINI_CHAT_MODEL = "gemini-2.5-flash"
+
+
+class LLMClientPool:
+    """
+    Reusable LLM clients keyed by backend, model and API key.
+
+    Reusing a client keeps its HTTP connections alive between requests.
+    API keys are only stored as SHA-256 hashes inside pool keys; idle
+    clients are evicted by LRU and idle TTL.
+    """
+
+    def __init__(self, max_clients: int, idle_ttl_seconds: float):
+        self.clients: LRUCache[Any] = LRUCache(
+            max_entries=max_clients,
+            ttl_seconds=idle_ttl_seconds,
+            sliding=True
+        )
+        self.created = 0
+        self.reused = 0
+        self.setup_seconds = 0.0
+
+    @staticmethod
+    def key(backend: str, model: str, api_key: str | None = None) -> str:
+        key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else "-"
+        return f"{backend}:{model}:{key_hash}"
+
+    def get(self, backend: str, model: str, api_key: str | None, factory: Callable[[], Any]) -> Any:
+        """Return the pooled client for this key, creating it with ``factory`` if needed."""
+        key = self.key(backend, model, api_key)
+        client = self.clients.get(key)
+        if client is not None:
+            self.reused += 1
+            return client
+
+        started = time.perf_counter()
+        client = factory()
+        self.setup_seconds += time.perf_counter() - started
+        self.created += 1
+        self.clients.set(key, client)
+        return client
 
-# Async LLM for non-blocking operations in streaming endpoints
-async_llm = ChatOllama(
-    model=settings.ollama_chat_model,
-    base_url=settings.ollama_base_url
+    def stats(self) -> dict:
+        return {
+            "clients": len(self.clients),
+            "created": self.created,
+            "reused": self.reused,
+            "evicted": self.clients.evictions,
+            "avg_setup_ms": round(self.setup_seconds / self.created * 1000, 3) if self.created else 0.0
+        }
+
+
+llm_pool = LLMClientPool(
+    max_clients=settings.llm_pool_max_clients,
+    idle_ttl_seconds=settings.llm_pool_idle_ttl_seconds
 )
 
 
+def ollama_keep_alive() -> int | str | None:
+    """``ollama_keep_alive`` as sent to Ollama: seconds as a number, otherwise a duration string."""
+    value = settings.ollama_keep_alive.strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
 def get_llm(llm_config=None):
     """
     Factory function to create appropriate LLM instance based on config.
-    
+
+    Clients come from ``llm_pool`` so connections are reused across requests.
+
     Args:
         llm_config: LLMConfig object with llm_type and api_key
-        
+
     Returns:
         LLM instance (Ollama or Gemini)
     """
-    if llm_config is None:
-        return async_llm
-
     # Import here to avoid circular imports
     from routers.mindmap.dto import LLMType
 
-    if llm_config.llm_type == LLMType.GEMINI and llm_config.api_key:
+    if llm_config is not None and llm_config.llm_type == LLMType.GEMINI and llm_config.api_key:
         from langchain_google_genai import ChatGoogleGenerativeAI
-        return ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=llm_config.api_key
+        api_key = llm_config.api_key
+        return llm_pool.get(
+            "gemini",
+            GEMINI_CHAT_MODEL,
+            api_key,
+            lambda: ChatGoogleGenerativeAI(model=GEMINI_CHAT_MODEL, google_api_key=api_key)
         )
 
     # Default to Ollama
-    return async_llm
+    return llm_pool.get(
+        "ollama",
+        f"{settings.ollama_chat_model}@{settings.ollama_base_url}",
+        None,
+        lambda: ChatOllama(
+            model=settings.ollama_chat_model,
+            base_url=settings.ollama_base_url,
+            keep_alive=ollama_keep_alive()
+        )
+    )
+
+
+def get_embeddings():
+    """
+    Pooled Ollama client of ``ollama_embedding_model``.
+
+    Returns:
+        OllamaEmbeddings instance, or None when no embedding model is configured
+    """
+    if not settings.ollama_embedding_model or not settings.ollama_base_url:
+        return None
+
+    from langchain_ollama import OllamaEmbeddings
+    keep_alive = ollama_keep_alive()
+    return llm_pool.get(
+        "ollama-embed",
+        f"{settings.ollama_embedding_model}@{settings.ollama_base_url}",
+        None,
+        lambda: OllamaEmbeddings(
+            model=settings.ollama_embedding_model,
+            base_url=settings.ollama_base_url,
+            # The embeddings client only takes seconds
+            keep_alive=keep_alive if isinstance(keep_alive, int) else None
+        )
+    )
+
+
+def llm_fingerprint(llm_config=None) -> str:
+    """
+    Identify the backend and model a config resolves to, e.g. ``ollama:llama3``.
+
+    API keys are deliberately left out so results can be shared between users.
+    """
+    from routers.mindmap.dto import LLMType
+
+    if llm_config is not None and llm_config.llm_type == LLMType.GEMINI and llm_config.api_key:
+        return f"gemini:{GEMINI_CHAT_MODEL}"
+    return f"ollama:{settings.ollama_chat_model}"
+
+
+def llm_backend(llm_config=None) -> str:
+    """Backend a config resolves to: ``ollama`` or ``gemini``."""
+    return llm_fingerprint(llm_config).split(":", 1)[0]
+
+
+def hedge_alternate(llm_config=None):
+    """
+    Config of the other backend a hedged request may call (see core.hedging).
+
+    Hedging is opt-in per request (``llm_config.hedge``) and needs both
+    backends: a Gemini API key and a configured Ollama model.
+
+    Returns:
+        LLMConfig of the alternate backend, or None when the request is not hedged
+    """
+    from routers.mindmap.dto import LLMConfig, LLMType
+
+    if not (
+        settings.hedging_enabled
+        and llm_config is not None
+        and llm_config.hedge
+        and llm_config.api_key
+        and settings.ollama_chat_model
+        and settings.ollama_base_url
+    ):
+        return None
+    other = LLMType.OLLAMA if llm_backend(llm_config) == "gemini" else LLMType.GEMINI
+    return LLMConfig(llm_type=other, api_key=llm_config.api_key, hedge=True)
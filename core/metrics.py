@@ -0,0 +1,286 @@
+"""
+Minimal Prometheus metrics (text exposition format 0.0.4).
+
+Counters, gauges and histograms keep plain floats in dicts keyed by label
+values; recording is a dict lookup plus a bisect, so it is cheap enough to
+leave on. All recording happens on the event loop thread, so no locks are
+needed.
+"""
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import AsyncGenerator, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# Seconds; LLM calls dominate the upper range
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+INPUT_CHARS_BUCKETS = (500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+NODE_COUNT_BUCKETS = (5, 10, 20, 35, 50, 75, 100, 150, 250, 500, 1000)
+SIMILARITY_BUCKETS = (0.5, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.98, 0.99, 0.995, 1.0)
+
+_LE_INF = 'le="+Inf"'
+
+
+class Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Exposition lines of every label set."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{self._labels(key)} {_format(value)}"
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last one is +Inf), sum]
+        self.values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the duration of the ``with`` block, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%s"' % _format(bound)
+                yield f"{self.name}_bucket{self._labels(key, le)} {cumulative}"
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket{self._labels(key, _LE_INF)} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {_format(total)}"
+            yield f"{self.name}_count{self._labels(key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+
+stage_duration = registry.register(Histogram(
+    "mindmap_stage_duration_seconds",
+    "Duration of each pipeline stage.",
+    ("stage",)
+))
+retries = registry.register(Counter(
+    "mindmap_retries_total",
+    "LLM retries caused by invalid CTM output, by validation error code.",
+    ("error_code",)
+))
+repairs = registry.register(Counter(
+    "mindmap_repairs_total",
+    "Invalid responses fixed locally instead of retried.",
+))
+cache_requests = registry.register(Counter(
+    "mindmap_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ("cache", "result")
+))
+generations = registry.register(Counter(
+    "mindmap_generations_total",
+    "Finished generations by outcome.",
+    ("outcome",)
+))
+coalesced = registry.register(Counter(
+    "mindmap_coalesced_requests_total",
+    "Requests attached to an identical generation already in flight.",
+))
+input_chars = registry.register(Histogram(
+    "mindmap_input_chars",
+    "Length of the text sent to generation, in characters.",
+    buckets=INPUT_CHARS_BUCKETS
+))
+input_tokens_removed = registry.register(Counter(
+    "mindmap_input_tokens_removed_total",
+    "Estimated input tokens removed by input compression, by step (boilerplate/duplicates/budget).",
+    ("step",)
+))
+output_nodes = registry.register(Histogram(
+    "mindmap_output_nodes",
+    "Number of nodes in generated mindmaps.",
+    buckets=NODE_COUNT_BUCKETS
+))
+semantic_similarity = registry.register(Histogram(
+    "mindmap_semantic_cache_similarity",
+    "Cosine similarity of the nearest cached input on semantic cache lookups, by result (hit/miss).",
+    ("result",),
+    buckets=SIMILARITY_BUCKETS
+))
+time_to_first_node = registry.register(Histogram(
+    "mindmap_time_to_first_node_seconds",
+    "Time from the start of a generation to its first NODES event.",
+))
+backend_calls = registry.register(Counter(
+    "mindmap_backend_calls_total",
+    "LLM calls by backend and result (ok/won/rejected/failed/cancelled/busy/skipped).",
+    ("backend", "result")
+))
+backend_latency = registry.register(Histogram(
+    "mindmap_backend_latency_seconds",
+    "Duration of completed LLM calls, by backend.",
+    ("backend",)
+))
+hedges = registry.register(Counter(
+    "mindmap_hedges_total",
+    "Calls sent to another backend, by reason (hedge: the first was slow, failover: it failed or was skipped).",
+    ("reason",)
+))
+streams_in_flight = registry.register(Gauge(
+    "mindmap_streams_in_flight",
+    "Response streams currently open, by endpoint.",
+    ("endpoint",)
+))
+client_disconnects = registry.register(Counter(
+    "mindmap_client_disconnects_total",
+    "Response streams closed by the client before the last event, by endpoint.",
+    ("endpoint",)
+))
+abandoned_jobs = registry.register(Counter(
+    "mindmap_abandoned_jobs_total",
+    "Generation jobs cancelled because nobody was listening, by reason (disconnect/idle).",
+    ("reason",)
+))
+cancellations = registry.register(Counter(
+    "mindmap_cancellations_total",
+    "Pipeline stages cancelled before finishing because nobody wanted the result, by stage.",
+    ("stage",)
+))
+cancelled_seconds = registry.register(Counter(
+    "mindmap_cancelled_stage_seconds_total",
+    "Time cancelled stages had already run; the rest of their usual duration "
+    "(mindmap_stage_duration_seconds) was reclaimed.",
+    ("stage",)
+))
+
+
+def record_cancellation(stage: str, elapsed: float = 0.0) -> None:
+    cancellations.inc(stage=stage)
+    cancelled_seconds.inc(elapsed, stage=stage)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a pipeline stage into ``stage_duration``.
+
+    A stage interrupted by cancellation is recorded as a cancellation instead,
+    so abandoned work does not skew the duration histogram.
+    """
+    started = time.perf_counter()
+    cancelled = False
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        cancelled = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        if cancelled:
+            record_cancellation(name, elapsed)
+        else:
+            stage_duration.observe(elapsed, stage=name)
+
+
+async def track_stream(stream: AsyncGenerator[T, None], endpoint: str) -> AsyncGenerator[T, None]:
+    """Count ``stream`` in the in-flight gauge while it is being consumed, and early closes."""
+    streams_in_flight.inc(endpoint=endpoint)
+    try:
+        async for item in stream:
+            yield item
+    except (asyncio.CancelledError, GeneratorExit):
+        # The server closes or cancels the response when the client goes away
+        client_disconnects.inc(endpoint=endpoint)
+        raise
+    finally:
+        streams_in_flight.dec(endpoint=endpoint)
+        await stream.aclose()
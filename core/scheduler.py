@@ -0,0 +1,193 @@
+"""
+Admission control and per-backend concurrency scheduling for generations.
+
+Each LLM backend gets a bounded number of concurrent generations and a FIFO
+queue in front of it. Requests beyond the queue depth are rejected up front
+so overload turns into a fast error instead of timeouts for everyone.
+
+Background work (batch items) waits in a second, unbounded FIFO queue that
+only gets a slot when no interactive request is waiting.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import AsyncGenerator
+
+from config.Setttings import settings
+from core.llm import llm_backend
+
+# Weight of the newest sample in the service-time moving average
+_EWMA_ALPHA = 0.2
+
+
+class QueueFullError(Exception):
+    """Raised when a backend's queue is at its maximum depth."""
+
+    def __init__(self, backend: str, retry_after: float):
+        super().__init__(f"Queue for backend '{backend}' is full")
+        self.backend = backend
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One generation's place in a backend queue."""
+
+    def __init__(self, scheduler: "BackendScheduler", background: bool = False):
+        self.scheduler = scheduler
+        self.background = background
+        self.state = "new"  # new -> queued -> running -> released
+        self.started_at = 0.0
+        self._wakeup = asyncio.Event()
+
+    async def wait(self) -> AsyncGenerator[tuple[int, float], None]:
+        """
+        Wait for a slot.
+
+        Yields:
+            Tuple of (queue position, estimated wait in seconds) every time the
+            position changes; returns once the slot is granted
+        """
+        scheduler = self.scheduler
+        if scheduler.try_start(self):
+            return
+        scheduler.enqueue(self)
+        while self.state == "queued":
+            position = scheduler.position(self)
+            yield position, scheduler.estimated_wait(position)
+            self._wakeup.clear()
+            if self.state == "queued":
+                await self._wakeup.wait()
+
+    def release(self) -> None:
+        """Leave the queue or free the slot; safe to call in any state."""
+        self.scheduler.release(self)
+
+
+class BackendScheduler:
+    """Bounded concurrency and FIFO queue for one backend."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue_depth: int, initial_service_seconds: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.avg_service_seconds = initial_service_seconds
+        self.active = 0
+        self.queue: deque[Ticket] = deque()
+        # Background tickets, served when the interactive queue is empty
+        self.background: deque[Ticket] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        # Monotonic time the backend last started or finished a generation
+        self.last_active = time.monotonic()
+
+    def ticket(self, background: bool = False) -> Ticket:
+        return Ticket(self, background)
+
+    def check_admission(self) -> None:
+        """Fail fast when a new request would not fit in the queue."""
+        if self.active >= self.max_concurrency and len(self.queue) >= self.max_queue_depth:
+            self.rejected += 1
+            raise QueueFullError(self.name, self.estimated_wait(len(self.queue) + 1))
+
+    def try_start(self, ticket: Ticket) -> bool:
+        if self.active < self.max_concurrency and not self.queue and not (ticket.background and self.background):
+            self._start(ticket)
+            return True
+        return False
+
+    def enqueue(self, ticket: Ticket) -> None:
+        """Queue a ticket; background tickets are never rejected."""
+        if ticket.background:
+            ticket.state = "queued"
+            self.background.append(ticket)
+            return
+        self.check_admission()
+        ticket.state = "queued"
+        self.queue.append(ticket)
+
+    def position(self, ticket: Ticket) -> int:
+        if ticket.background:
+            return len(self.queue) + self.background.index(ticket) + 1
+        return self.queue.index(ticket) + 1
+
+    def estimated_wait(self, position: int) -> float:
+        return math.ceil(position / self.max_concurrency) * self.avg_service_seconds
+
+    def release(self, ticket: Ticket) -> None:
+        if ticket.state == "queued":
+            (self.background if ticket.background else self.queue).remove(ticket)
+            self._notify_queue()
+        elif ticket.state == "running":
+            self.active -= 1
+            self.completed += 1
+            self.last_active = time.monotonic()
+            elapsed = self.last_active - ticket.started_at
+            self.avg_service_seconds += _EWMA_ALPHA * (elapsed - self.avg_service_seconds)
+            if self.active < self.max_concurrency and (self.queue or self.background):
+                self._start((self.queue or self.background).popleft())
+            self._notify_queue()
+        ticket.state = "released"
+
+    def idle_seconds(self) -> float:
+        """How long the backend has had nothing running (0 while busy)."""
+        return 0.0 if self.active else time.monotonic() - self.last_active
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": len(self.queue),
+            "background_queued": len(self.background),
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_service_seconds": round(self.avg_service_seconds, 3)
+        }
+
+    def _start(self, ticket: Ticket) -> None:
+        self.active += 1
+        self.admitted += 1
+        ticket.state = "running"
+        ticket.started_at = self.last_active = time.monotonic()
+        ticket._wakeup.set()
+
+    def _notify_queue(self) -> None:
+        # Every remaining waiter moved up one place
+        for waiting in (*self.queue, *self.background):
+            waiting._wakeup.set()
+
+
+class GenerationScheduler:
+    """Per-backend schedulers, created on first use."""
+
+    def __init__(self):
+        self.backends: dict[str, BackendScheduler] = {}
+
+    def backend(self, name: str) -> BackendScheduler:
+        scheduler = self.backends.get(name)
+        if scheduler is None:
+            limits = {
+                "ollama": settings.scheduler_ollama_max_concurrency,
+                "gemini": settings.scheduler_gemini_max_concurrency,
+            }
+            scheduler = self.backends[name] = BackendScheduler(
+                name,
+                max_concurrency=limits.get(name, settings.scheduler_ollama_max_concurrency),
+                max_queue_depth=settings.scheduler_max_queue_depth,
+                initial_service_seconds=settings.scheduler_initial_service_seconds
+            )
+        return scheduler
+
+    def for_config(self, llm_config=None) -> BackendScheduler:
+        """Scheduler of the backend an LLMConfig resolves to."""
+        return self.backend(llm_backend(llm_config))
+
+    def stats(self) -> dict:
+        return {name: scheduler.stats() for name, scheduler in self.backends.items()}
+
+
+scheduler = GenerationScheduler()
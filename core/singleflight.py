@@ -0,0 +1,168 @@
+"""
+Single-flight execution of async generators.
+
+Concurrent callers asking for the same key share one run of the underlying
+generator. Every event is fanned out to all subscribers, and late joiners
+first receive the events they missed, so each of them sees the full stream.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncGenerator, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class SharedRun(Generic[T]):
+    """
+    One run of an async generator, fanned out to any number of subscribers.
+
+    Events are numbered from 1. With ``max_events`` only the most recent
+    events are kept for replay. A ``detached`` run keeps going when every
+    subscriber has left; otherwise it is cancelled with the last one.
+    """
+
+    def __init__(
+        self,
+        source: AsyncGenerator[T, None],
+        on_close: Callable[[], None],
+        max_events: int | None = None,
+        detached: bool = False
+    ):
+        self.source = source
+        self.on_close = on_close
+        self.detached = detached
+        self.events: deque[tuple[int, T]] = deque(maxlen=max_events)
+        self.last_id = 0
+        self.subscribers: set[asyncio.Queue] = set()
+        self.error: BaseException | None = None
+        self.done = False
+        self.closed = False
+        self.task: asyncio.Task | None = None
+        # When the last subscriber left (monotonic), None while someone listens
+        self.idle_since: float | None = time.monotonic()
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._pump())
+
+    async def subscribe(self) -> AsyncGenerator[T, None]:
+        """
+        Stream the run's events from the beginning.
+
+        A non-detached run keeps going while at least one subscriber is
+        attached; it is cancelled when the last one leaves before it finished.
+        """
+        async for _, event in self.subscribe_from(0):
+            yield event
+
+    async def subscribe_from(self, after: int = 0) -> AsyncGenerator[tuple[int, T], None]:
+        """
+        Stream ``(event id, event)`` pairs for the events after ``after``.
+
+        Events that already fell out of a bounded buffer are skipped.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        backlog = [(event_id, event) for event_id, event in self.events if event_id > after]
+        if not self.done:
+            self.subscribers.add(queue)
+            self.idle_since = None
+        self.start()
+        try:
+            for item in backlog:
+                yield item
+            if self.done:
+                # Finished before we attached: the backlog is the whole stream
+                if self.error is not None:
+                    raise self.error
+                return
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield item
+        finally:
+            self.subscribers.discard(queue)
+            if not self.subscribers:
+                self.idle_since = time.monotonic()
+                if not self.done and not self.detached:
+                    self.close()
+
+    def close(self) -> None:
+        """Cancel the run and stop new subscribers from joining it."""
+        if not self.closed:
+            self.closed = True
+            self.on_close()
+            if self.task is not None:
+                self.task.cancel()
+
+    async def _pump(self) -> None:
+        try:
+            async for event in self.source:
+                self.last_id += 1
+                item = (self.last_id, event)
+                self.events.append(item)
+                for queue in self.subscribers:
+                    queue.put_nowait(item)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            await self.source.aclose()
+            self.done = True
+            for queue in self.subscribers:
+                queue.put_nowait(_DONE)
+            if not self.closed:
+                self.closed = True
+                self.on_close()
+
+
+class SingleFlight(Generic[T]):
+    """Registry of in-flight shared runs keyed by request identity."""
+
+    def __init__(self):
+        self.runs: dict[str, SharedRun[T]] = {}
+        self.started = 0
+        self.joined = 0
+
+    def subscribe(self, key: str, factory: Callable[[], AsyncGenerator[T, None]]) -> AsyncGenerator[T, None]:
+        """
+        Attach to the run for ``key``, starting it with ``factory`` if none is in flight.
+
+        Args:
+            key: Identity of the work (equal keys produce equal results)
+            factory: Creates the generator to run when there is nothing to join
+
+        Returns:
+            Async generator of the run's events
+        """
+        run = self.runs.get(key)
+        if run is None or run.closed:
+            run = self.runs[key] = SharedRun(factory(), lambda: self._forget(key, run))
+            self.started += 1
+        else:
+            self.joined += 1
+        return run.subscribe()
+
+    def is_running(self, key: str) -> bool:
+        """Whether a subscriber for ``key`` would join a run already in flight."""
+        run = self.runs.get(key)
+        return run is not None and not run.closed
+
+    def _forget(self, key: str, run: SharedRun[T]) -> None:
+        if self.runs.get(key) is run:
+            del self.runs[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.runs),
+            "subscribers": sum(len(run.subscribers) for run in self.runs.values()),
+            "started": self.started,
+            "joined": self.joined
+        }
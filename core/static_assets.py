@@ -0,0 +1,233 @@
+"""
+Static asset pipeline.
+
+Every file of the static directory is loaded once, compressed ahead of time
+(gzip, plus brotli and zstd when their packages are installed) and served in
+the smallest encoding the client accepts. Assets also get a content-hash
+fingerprinted URL (``loading.<hash>.js``) that is cached as immutable; HTML
+pages reference their scripts and stylesheets through those URLs and are
+themselves revalidated on every load, cheaply, with strong ETags.
+
+Usage (size report):
+    python -m core.static_assets [directory]
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+from pathlib import Path
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from config.Setttings import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional
+    zstandard = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Smaller files gain nothing from compression
+MIN_COMPRESS_BYTES = 256
+
+# src="..." / href="..." attributes of HTML pages
+_REFERENCE_PATTERN = re.compile(r'\b(src|href)="([^"#?]+)"')
+
+
+def _compressors() -> dict:
+    compressors = {"gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors["br"] = lambda data: brotli.compress(data, quality=11)
+    if zstandard is not None:
+        compressors["zstd"] = lambda data: zstandard.ZstdCompressor(level=19).compress(data)
+    return compressors
+
+
+class Asset:
+    """One file with its precompressed variants."""
+
+    def __init__(self, path: str, content: bytes, mtime: float):
+        self.path = path
+        self.mtime = mtime
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.digest = hashlib.sha256(content).hexdigest()
+        stem, dot, suffix = path.rpartition(".")
+        self.fingerprinted_path = f"{stem}.{self.digest[:12]}.{suffix}" if dot else f"{path}.{self.digest[:12]}"
+        # Encoding -> body, "identity" is the original
+        self.variants: dict[str, bytes] = {"identity": content}
+
+    @property
+    def compressible(self) -> bool:
+        return self.media_type.startswith(COMPRESSIBLE_TYPES)
+
+    def compress(self, compressors: dict) -> None:
+        content = self.variants["identity"]
+        if not self.compressible or len(content) < MIN_COMPRESS_BYTES:
+            return
+        for encoding, compress in compressors.items():
+            body = compress(content)
+            if len(body) < len(content) * 0.9:
+                self.variants[encoding] = body
+
+    def etag(self, encoding: str) -> str:
+        # Strong ETags must differ between representations
+        tag = self.digest[:32] if encoding == "identity" else f"{self.digest[:32]}-{encoding}"
+        return f'"{tag}"'
+
+
+class StaticAssets:
+    """Precompressed, fingerprinted files of one directory, served under ``prefix``."""
+
+    def __init__(self, directory: str | Path, prefix: str = "/static"):
+        self.directory = Path(directory)
+        self.prefix = prefix.rstrip("/")
+        self.assets: dict[str, Asset] = {}
+        # Fingerprinted path -> asset
+        self.fingerprinted: dict[str, Asset] = {}
+        self.built = False
+
+    def build(self) -> None:
+        """Load, rewrite and compress every file. Blocking: call through asyncio.to_thread."""
+        compressors = _compressors() if settings.static_precompress else {}
+        assets = {}
+        for file in sorted(self.directory.rglob("*")):
+            if file.is_file():
+                path = file.relative_to(self.directory).as_posix()
+                assets[path] = Asset(path, file.read_bytes(), file.stat().st_mtime)
+
+        # Pages reference the fingerprinted URLs, so they are hashed after rewriting
+        for path, asset in assets.items():
+            if asset.media_type == "text/html":
+                page = asset.variants["identity"].decode("utf-8")
+                rewritten = _REFERENCE_PATTERN.sub(lambda m: self._rewrite(m, path, assets), page)
+                assets[path] = Asset(path, rewritten.encode("utf-8"), asset.mtime)
+
+        for asset in assets.values():
+            asset.compress(compressors)
+        self.assets = assets
+        self.fingerprinted = {asset.fingerprinted_path: asset for asset in assets.values()}
+        self.built = True
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL of a file, e.g. ``/static/loading.3f2a9c1b7e04.js``."""
+        if not self.built:
+            self.build()
+        return f"{self.prefix}/{self.assets[path].fingerprinted_path}"
+
+    def response(self, request: Request, path: str) -> Response:
+        """Serve ``path`` (plain or fingerprinted) in the best accepted encoding."""
+        if not self.built or (settings.static_watch and self._changed(path)):
+            self.build()
+
+        asset = self.fingerprinted.get(path)
+        cache_control = IMMUTABLE
+        if asset is None:
+            asset = self.assets.get(path)
+            # Plain URLs (pages, links typed by hand) must pick up new deployments
+            cache_control = REVALIDATE
+        if asset is None:
+            return Response("Not Found", status_code=404, media_type="text/plain")
+
+        encoding = _negotiate(request.headers.get("accept-encoding", ""), asset.variants)
+        etag = asset.etag(encoding)
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(asset.variants[encoding], media_type=asset.media_type, headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            path: {encoding: len(body) for encoding, body in asset.variants.items()}
+            for path, asset in self.assets.items()
+        }
+
+    def _rewrite(self, match: re.Match, page: str, assets: dict[str, Asset]) -> str:
+        attribute, reference = match.groups()
+        if reference.startswith(self.prefix + "/"):
+            target = reference[len(self.prefix) + 1:]
+        elif "://" in reference or reference.startswith(("/", "data:", "mailto:")):
+            return match.group(0)
+        else:
+            target = os.path.normpath(os.path.join(os.path.dirname(page), reference)).replace(os.sep, "/")
+        asset = assets.get(target)
+        if asset is None or asset.media_type == "text/html":
+            # Pages are navigation targets and keep their plain URLs
+            return match.group(0)
+        return f'{attribute}="{self.prefix}/{asset.fingerprinted_path}"'
+
+    def _changed(self, path: str) -> bool:
+        asset = self.fingerprinted.get(path) or self.assets.get(path)
+        if asset is None:
+            return False
+        try:
+            return (self.directory / asset.path).stat().st_mtime != asset.mtime
+        except OSError:
+            return True
+
+
+def _negotiate(accept_encoding: str, variants: dict[str, bytes]) -> str:
+    """Smallest variant the client accepts (``q`` > 0), or identity."""
+    if len(variants) == 1:
+        return "identity"
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    candidates = [e for e in variants if e != "identity" and (e in accepted or "*" in accepted)]
+    if not candidates:
+        return "identity"
+    return min(candidates, key=lambda e: len(variants[e]))
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+static_assets = StaticAssets(Path(__file__).resolve().parent.parent / "static")
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else static_assets.directory
+    assets = StaticAssets(directory)
+    assets.build()
+    encodings = ["identity", *_compressors()]
+    print(f"{'file':40}" + "".join(f"{e:>10}" for e in encodings))
+    totals = dict.fromkeys(encodings, 0)
+    for path, sizes in assets.stats().items():
+        print(f"{path:40}" + "".join(f"{sizes.get(e, sizes['identity']):>10}" for e in encodings))
+        for e in encodings:
+            totals[e] += sizes.get(e, sizes["identity"])
+    print(f"{'total':40}" + "".join(f"{totals[e]:>10}" for e in encodings))
+
+
+if __name__ == "__main__":
+    main()
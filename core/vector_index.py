@@ -0,0 +1,229 @@
+"""
+In-process nearest-neighbour index over embedding vectors.
+
+Vectors are normalized to unit length and stored as rows of one float32
+matrix, so a cosine-similarity search is a single matrix-vector product.
+Capacity is fixed; once full, the least recently used entry is replaced.
+Every entry belongs to a group (e.g. a model fingerprint), searches only
+consider entries of the query's group, and an entry can carry a JSON
+payload that is persisted with it.
+
+Blocking file I/O in ``save``/``load``: call them through ``asyncio.to_thread``.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Fixed-capacity cosine-similarity index with LRU replacement.
+
+    Args:
+        capacity: Maximum number of vectors kept
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.dim: int | None = None
+        # (rows, dim); grows by doubling up to capacity, slots beyond it are free
+        self._vectors: np.ndarray | None = None
+        self._groups = np.full(capacity, -1, dtype=np.int32)  # -1 marks a free slot
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._keys: list[str | None] = [None] * capacity
+        self._payloads: list = [None] * capacity
+        self._slots: dict[str, int] = {}
+        self._group_ids: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def add(self, key: str, vector, group: str = "", payload=None) -> str | None:
+        """
+        Insert or replace ``key``.
+
+        Args:
+            key: Entry key
+            vector: Embedding, normalized here
+            group: Entries are only compared with queries of the same group
+            payload: JSON-serializable value kept (and persisted) with the entry
+
+        Returns:
+            Key of the entry evicted to make room, if any
+        """
+        vector = _unit(vector)
+        evicted = None
+        with self._lock:
+            if self.dim != len(vector):
+                # Another embedding model: old vectors are not comparable anymore
+                self._reset(len(vector))
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._free_slot()
+                if self._keys[slot] is not None:
+                    evicted = self._keys[slot]
+                    del self._slots[evicted]
+                    self.evictions += 1
+                self._keys[slot] = key
+                self._slots[key] = slot
+            if slot >= len(self._vectors):
+                self._grow(slot + 1)
+            self._vectors[slot] = vector
+            self._payloads[slot] = payload
+            self._groups[slot] = self._group_id(group)
+            self._last_used[slot] = time.time()
+        return evicted
+
+    def search(self, vector, group: str = "", k: int = 1) -> list[tuple[str, float]]:
+        """The ``k`` most similar entries of ``group`` as ``(key, cosine similarity)``, best first."""
+        vector = _unit(vector)
+        with self._lock:
+            group_id = self._group_ids.get(group)
+            if self._vectors is None or group_id is None or self.dim != len(vector):
+                return []
+            similarities = self._vectors @ vector
+            similarities[self._groups[:len(similarities)] != group_id] = -np.inf
+            k = min(k, len(similarities))
+            if k <= 0:
+                return []
+            best = np.argpartition(-similarities, k - 1)[:k]
+            best = best[np.argsort(-similarities[best])]
+            return [
+                (self._keys[slot], float(similarities[slot]))
+                for slot in best
+                if np.isfinite(similarities[slot])
+            ]
+
+    def payload(self, key: str):
+        """Payload stored with ``key``, or None."""
+        with self._lock:
+            slot = self._slots.get(key)
+            return self._payloads[slot] if slot is not None else None
+
+    def touch(self, key: str) -> None:
+        """Mark ``key`` as recently used."""
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                self._last_used[slot] = time.time()
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            slot = self._slots.pop(key, None)
+            if slot is not None:
+                self._keys[slot] = None
+                self._payloads[slot] = None
+                self._groups[slot] = -1
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return list(self._slots)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def save(self, path: str | os.PathLike) -> None:
+        """Write the index to one ``.npz`` file (atomically replaced)."""
+        with self._lock:
+            used = np.flatnonzero(self._groups >= 0)
+            meta = {
+                "keys": [self._keys[slot] for slot in used],
+                "payloads": [self._payloads[slot] for slot in used],
+                "groups": dict(self._group_ids)
+            }
+            vectors = self._vectors[used] if self._vectors is not None else np.zeros((0, 0), dtype=np.float32)
+            groups = self._groups[used]
+            last_used = self._last_used[used]
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(
+                f,
+                vectors=vectors,
+                groups=groups,
+                last_used=last_used,
+                # Metadata as UTF-8 JSON bytes, so loading never needs pickle
+                meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str | os.PathLike) -> int:
+        """
+        Replace the content with a file written by ``save``.
+
+        The most recently used entries are kept when the file holds more than
+        ``capacity``. Returns the number of entries loaded.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            vectors = data["vectors"]
+            groups = data["groups"]
+            last_used = data["last_used"]
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+
+        order = np.argsort(-last_used)[:self.capacity]
+        with self._lock:
+            self._reset(vectors.shape[1] if len(vectors) else None)
+            if len(order):
+                self._grow(len(order))
+            self._group_ids = dict(meta["groups"])
+            for slot, row in enumerate(order):
+                key = meta["keys"][row]
+                self._vectors[slot] = vectors[row]
+                self._groups[slot] = groups[row]
+                self._last_used[slot] = last_used[row]
+                self._keys[slot] = key
+                self._payloads[slot] = meta["payloads"][row]
+                self._slots[key] = slot
+        return len(order)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._slots),
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "evictions": self.evictions,
+            "bytes": self._vectors.nbytes if self._vectors is not None else 0
+        }
+
+    def _reset(self, dim: int | None) -> None:
+        self.dim = dim
+        self._vectors = np.zeros((0, dim), dtype=np.float32) if dim else None
+        self._groups.fill(-1)
+        self._last_used.fill(0.0)
+        self._keys = [None] * self.capacity
+        self._payloads = [None] * self.capacity
+        self._slots.clear()
+        self._group_ids.clear()
+
+    def _grow(self, rows: int) -> None:
+        rows = min(self.capacity, max(rows, 2 * len(self._vectors), 64))
+        vectors = np.zeros((rows, self.dim), dtype=np.float32)
+        vectors[:len(self._vectors)] = self._vectors
+        self._vectors = vectors
+
+    def _free_slot(self) -> int:
+        free = np.flatnonzero(self._groups < 0)
+        if len(free):
+            return int(free[0])
+        return int(np.argmin(self._last_used))
+
+    def _group_id(self, group: str) -> int:
+        group_id = self._group_ids.get(group)
+        if group_id is None:
+            group_id = self._group_ids[group] = len(self._group_ids)
+        return group_id
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
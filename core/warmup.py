@@ -0,0 +1,143 @@
+"""
+Ollama model warm-up and keep-alive.
+
+At startup the chat model is checked (``/api/tags``) and preloaded with an
+empty ``/api/generate`` request, so the first user request does not pay the
+model load time. Every request, including the warm-up, sends
+``ollama_keep_alive`` so Ollama keeps the model resident, and a background
+task repeats the preload once the backend has been idle for
+``ollama_keep_warm_interval_seconds``.
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from config.Setttings import settings
+from core.llm import ollama_keep_alive
+from core.scheduler import scheduler
+
+
+class WarmupError(Exception):
+    """Raised when Ollama is unreachable or does not have the chat model."""
+
+
+class OllamaWarmer:
+    """Preloads the Ollama chat model and keeps it warm while the app is quiet."""
+
+    def __init__(self):
+        self.state = "idle"  # idle -> warming -> ready / failed, or disabled
+        self.error: str | None = None
+        self.load_seconds: float | None = None
+        self.last_warmed: float | None = None  # wall clock
+        self.warmups = 0
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("ready", "disabled")
+
+    def start(self) -> None:
+        """Warm up in the background and keep the model warm until shutdown."""
+        if not settings.ollama_warmup_enabled or not settings.ollama_base_url or not settings.ollama_chat_model:
+            self.state = "disabled"
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="ollama-keep-warm")
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def warm(self) -> None:
+        """
+        Check that the chat model exists and load it into memory.
+
+        Raises:
+            WarmupError: Ollama is unreachable, answers with an error or lacks the model
+        """
+        client = self._get_client()
+        model = settings.ollama_chat_model
+        try:
+            response = await client.get("/api/tags")
+            response.raise_for_status()
+            try:
+                names = {m.get("name") for m in response.json().get("models", [])}
+            except (ValueError, AttributeError, TypeError) as e:
+                raise WarmupError(f"Unexpected /api/tags response from {settings.ollama_base_url}: {e}") from e
+            if model not in names and f"{model}:latest" not in names:
+                raise WarmupError(f"Model '{model}' is not available on {settings.ollama_base_url}")
+
+            # A request without a prompt only loads the model
+            started = time.perf_counter()
+            body = {"model": model, "stream": False}
+            keep_alive = ollama_keep_alive()
+            if keep_alive is not None:
+                body["keep_alive"] = keep_alive
+            response = await client.post("/api/generate", json=body)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise WarmupError(f"{type(e).__name__}: {e}") from e
+
+        self.load_seconds = time.perf_counter() - started
+        self.last_warmed = time.time()
+        self.warmups += 1
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "model": settings.ollama_chat_model or None,
+            "error": self.error,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "last_warmed": self.last_warmed,
+            "warmups": self.warmups,
+            "keep_alive": ollama_keep_alive()
+        }
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=settings.ollama_base_url,
+                timeout=httpx.Timeout(settings.ollama_warmup_timeout_seconds, connect=5.0)
+            )
+        return self._client
+
+    async def _run(self) -> None:
+        interval = settings.ollama_keep_warm_interval_seconds
+        backend = scheduler.backend("ollama")
+        while True:
+            if self.state != "ready" or (interval > 0 and backend.idle_seconds() >= interval):
+                await self._warm_once()
+            if self.state != "ready":
+                # Not reachable yet: retry soon instead of waiting a full interval
+                await asyncio.sleep(min(30.0, interval or 30.0))
+            elif interval > 0:
+                # Real generations also renew keep_alive, so only quiet periods need a ping
+                await asyncio.sleep(max(1.0, interval - backend.idle_seconds()))
+            else:
+                return
+
+    async def _warm_once(self) -> None:
+        if self.state != "ready":
+            self.state = "warming"
+        try:
+            await self.warm()
+        except Exception as e:
+            # Whatever went wrong, the keep-warm loop retries and /health reports it
+            self.state = "failed"
+            self.error = str(e) if isinstance(e, WarmupError) else f"{type(e).__name__}: {e}"
+            return
+        self.state = "ready"
+        self.error = None
+        # A successful warm-up counts as activity for the keep-warm timer
+        scheduler.backend("ollama").last_active = time.monotonic()
+
+
+ollama_warmer = OllamaWarmer()
@@ -1,22 +1,69 @@
-from pathlib import Path
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from core.http_client import close_http_client
+from core.metrics import registry
+from core.static_assets import static_assets
+from core.warmup import ollama_warmer
+from routers.mindmap.batch import batch_manager
+from routers.mindmap.jobs import job_manager
+from routers.mindmap.pdf_extraction import shutdown_pdf_executor
 from routers.mindmap.router import router as mindmap_routers
+from routers.mindmap.semantic_cache import semantic_cache
+from routers.mindmap.web_extraction import shutdown_extract_executor
 
-app = FastAPI()
 
-# Get the directory where main.py is located
-BASE_DIR = Path(__file__).resolve().parent
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the Ollama model in the background; /health reports when it is ready
+    ollama_warmer.start()
+    # Compress static files before the first page view
+    await asyncio.to_thread(static_assets.build)
+    await semantic_cache.load()
+    yield
+    # Release worker pools and pooled connections on shutdown
+    await ollama_warmer.shutdown()
+    await batch_manager.shutdown()
+    await job_manager.shutdown()
+    await semantic_cache.save()
+    shutdown_pdf_executor()
+    shutdown_extract_executor()
+    await close_http_client()
 
-# Mount static files (CSS, JS, images)
-app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
+
+app = FastAPI(lifespan=lifespan)
 
 # Include mindmap router
 app.include_router(mindmap_routers, prefix="/mindmap")
 
 
 @app.get("/")
-async def serve_homepage():
+async def serve_homepage(request: Request):
     """Serve the main homepage"""
-    return FileResponse(BASE_DIR / "static" / "index.html")
\ No newline at end of file
+    return static_assets.response(request, "index.html")
+
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_static(request: Request, path: str):
+    """Static files (CSS, JS, pages), precompressed and fingerprinted"""
+    return static_assets.response(request, path)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Pipeline metrics in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/health")
+async def health():
+    """Readiness: 200 once the Ollama model is loaded (or warm-up is disabled), 503 before"""
+    if ollama_warmer.ready:
+        status = "ready"
+    else:
+        status = "unavailable" if ollama_warmer.state == "failed" else "starting"
+    return JSONResponse(
+        {"status": status, "ollama": ollama_warmer.status()},
+        status_code=200 if status == "ready" else 503
+    )
@@ -0,0 +1,257 @@
+"""
+Batch jobs: many mindmaps from one submission.
+
+Items (texts, URLs and uploaded PDFs) are queued on a shared pool of
+``batch_workers`` workers. Each worker runs the same streaming pipeline as the
+single-document endpoints and keeps only the final result. Items wait for a
+backend slot behind interactive requests instead of being rejected when the
+interactive queue is full. A failing item is recorded on its own and never
+fails the rest of the job. Finished jobs are kept for
+``batch_job_ttl_seconds`` so their results can be downloaded.
+"""
+
+import asyncio
+import time
+import uuid
+from typing import AsyncGenerator
+
+from fastapi import HTTPException
+
+from config.Setttings import settings
+from routers.mindmap.dto import LLMConfig, StreamEvent, StreamStatus
+from routers.mindmap.service import (
+    generate_mindmap_from_text, generate_mindmap_from_file, generate_mindmap_from_web_url,
+    open_pdf
+)
+from routers.mindmap.upload import UploadSpool
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class BatchItem:
+    """One document of a batch job."""
+
+    def __init__(self, index: int, kind: str, payload: str | UploadSpool):
+        self.index = index
+        self.kind = kind  # text, url or file
+        self.payload = payload
+        self.status = "pending"
+        self.error: str | None = None
+        self.result: dict | None = None
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def source(self) -> str:
+        if self.kind == "url":
+            return self.payload
+        if self.kind == "file":
+            return self.payload.filename
+        return f"text #{self.index}"
+
+    def finish(self, status: str, error: str | None = None, result: dict | None = None) -> None:
+        self.status = status
+        self.error = error
+        self.result = result
+        self.finished_at = time.time()
+        self.release()
+
+    def release(self) -> None:
+        """Drop the input once it is no longer needed (removes spooled uploads)."""
+        if isinstance(self.payload, UploadSpool):
+            self.payload.close()
+
+    def summary(self) -> dict:
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = round((self.finished_at - self.started_at) * 1000)
+        return {
+            "index": self.index,
+            "kind": self.kind,
+            "source": self.source,
+            "status": self.status,
+            "error": self.error,
+            "duration_ms": duration
+        }
+
+    def record(self) -> dict:
+        """Result line of the NDJSON download."""
+        record = self.summary()
+        if self.result is not None:
+            record.update({
+                "ctm": self.result.get("ctm"),
+                "attempts_used": self.result.get("attempts_used"),
+                "validation_message": self.result.get("validation_message"),
+                "cached": self.result.get("cached", False)
+            })
+        return record
+
+
+class BatchJob:
+    def __init__(self, items: list[BatchItem], llm_config: LLMConfig | None):
+        self.id = uuid.uuid4().hex
+        self.items = items
+        self.llm_config = llm_config
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.cancelled = False
+
+    @property
+    def status(self) -> str:
+        if self.cancelled:
+            return "cancelled"
+        if self.finished_at is not None:
+            return "completed"
+        if any(item.status != "pending" for item in self.items):
+            return "running"
+        return "queued"
+
+    def counts(self) -> dict:
+        counts = {"pending": 0, "running": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+        for item in self.items:
+            counts[item.status] += 1
+        return counts
+
+    def item_finished(self) -> None:
+        if self.finished_at is None and all(item.status in FINISHED for item in self.items):
+            self.finished_at = time.time()
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "total": len(self.items),
+            "counts": self.counts(),
+            "items": [item.summary() for item in self.items]
+        }
+
+
+class BatchManager:
+    """Job registry and the worker pool shared by all jobs (FIFO across jobs)."""
+
+    def __init__(self):
+        self.jobs: dict[str, BatchJob] = {}
+        self.queue: asyncio.Queue | None = None
+        self.workers: list[asyncio.Task] = []
+        self.processed = 0
+
+    def submit(self, items: list[BatchItem], llm_config: LLMConfig | None = None) -> BatchJob:
+        self._reap()
+        job = BatchJob(items, llm_config)
+        self.jobs[job.id] = job
+        self._ensure_workers()
+        for item in items:
+            self.queue.put_nowait((job, item))
+        return job
+
+    def get(self, job_id: str) -> BatchJob | None:
+        self._reap()
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> BatchJob | None:
+        """Stop a job: pending items are skipped and running ones cancelled."""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished_at is not None:
+            return job
+        job.cancelled = True
+        for item in job.items:
+            if item.status == "pending":
+                item.finish("cancelled")
+            elif item.task is not None:
+                item.task.cancel()
+        job.item_finished()
+        return job
+
+    async def shutdown(self) -> None:
+        running = [item.task for job in self.jobs.values() for item in job.items if item.task is not None]
+        for task in [*self.workers, *running]:
+            task.cancel()
+        await asyncio.gather(*self.workers, *running, return_exceptions=True)
+        self.workers.clear()
+        self.queue = None
+        for job in self.jobs.values():
+            for item in job.items:
+                item.release()
+        self.jobs.clear()
+
+    def stats(self) -> dict:
+        self._reap()
+        return {
+            "jobs": len(self.jobs),
+            "workers": len(self.workers),
+            "queued_items": self.queue.qsize() if self.queue is not None else 0,
+            "processed_items": self.processed
+        }
+
+    def _ensure_workers(self) -> None:
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        if not self.workers:
+            self.workers = [
+                asyncio.create_task(self._worker(), name=f"batch-worker-{i}")
+                for i in range(max(1, settings.batch_workers))
+            ]
+
+    async def _worker(self) -> None:
+        while True:
+            job, item = await self.queue.get()
+            if item.status == "pending":
+                item.task = asyncio.create_task(self._run_item(job, item))
+                # wait() instead of await: cancelling the item must not stop the worker
+                await asyncio.wait({item.task})
+                item.task = None
+                self.processed += 1
+            job.item_finished()
+
+    async def _run_item(self, job: BatchJob, item: BatchItem) -> None:
+        item.status = "running"
+        item.started_at = time.time()
+        final = None
+        try:
+            async for event in _item_events(item, job.llm_config):
+                final = event
+        except asyncio.CancelledError:
+            item.finish("cancelled")
+            return
+        except HTTPException as e:
+            item.finish("failed", error=str(e.detail))
+            return
+        except Exception as e:
+            item.finish("failed", error=f"{type(e).__name__}: {e}")
+            return
+
+        if final is not None and final["status"] == StreamStatus.SUCCESS.value:
+            item.finish("succeeded", result=final["data"])
+        elif final is not None:
+            data = final["data"] or {}
+            detail = data.get("last_error") or data.get("error")
+            item.finish("failed", error=f"{final['message']} {detail}" if detail else final["message"])
+        else:
+            item.finish("failed", error="No result produced")
+
+    def _reap(self) -> None:
+        """Forget finished jobs older than the retention period."""
+        expires = time.time() - settings.batch_job_ttl_seconds
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at is not None and j.finished_at < expires]:
+            del self.jobs[job_id]
+
+
+async def _item_events(item: BatchItem, llm_config: LLMConfig | None) -> AsyncGenerator[StreamEvent, None]:
+    """Run the single-document pipeline that matches the item kind, as background work."""
+    if item.kind == "text":
+        events = generate_mindmap_from_text(item.payload, llm_config, background=True)
+    elif item.kind == "url":
+        events = generate_mindmap_from_web_url(item.payload, llm_config, background=True)
+    else:
+        page_count = await open_pdf(item.payload.source())
+        events = generate_mindmap_from_file(
+            item.payload.source(), page_count, item.payload.filename, llm_config, background=True
+        )
+    async for event in events:
+        yield event
+
+
+batch_manager = BatchManager()
@@ -0,0 +1,119 @@
+"""
+Content-addressed cache of generated mindmaps.
+
+Keys combine a hash of the normalized input, the backend/model fingerprint and
+a hash of the generation prompt, so a prompt or model change never serves a
+stale result.
+"""
+
+import asyncio
+import hashlib
+import re
+import unicodedata
+from typing import TypedDict
+
+from config.Setttings import settings
+from core.cache import DiskCache, LRUCache
+from core.llm import hedge_alternate, llm_fingerprint
+from routers.mindmap.dto import LLMConfig
+from routers.mindmap.prompt import mindmap_generate
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PROMPT_HASH = hashlib.sha256(mindmap_generate.encode("utf-8")).hexdigest()[:16]
+
+
+class CachedMindmap(TypedDict):
+    ctm: str
+    validation_message: str
+
+
+def normalize_input(content: str) -> str:
+    """Normalize input so trivially different copies of a text share a key."""
+    content = unicodedata.normalize("NFC", content)
+    return _WHITESPACE_RE.sub(" ", content).strip()
+
+
+def input_hash(content: str) -> str:
+    return hashlib.sha256(normalize_input(content).encode("utf-8")).hexdigest()
+
+
+def cache_namespace(llm_config: LLMConfig | None = None) -> str:
+    """
+    Backend/model fingerprint and prompt hash: results are only shared within a namespace.
+
+    Hedged requests get their own namespace, their results may come from either backend.
+    """
+    namespace = f"{llm_fingerprint(llm_config)}:{_PROMPT_HASH}"
+    if hedge_alternate(llm_config) is not None:
+        namespace += ":hedged"
+    return namespace
+
+
+def cache_key(content: str, llm_config: LLMConfig | None = None) -> str:
+    """Build the cache key for an input and LLM config."""
+    return f"{input_hash(content)}:{cache_namespace(llm_config)}"
+
+
+class ResultCache:
+    """Two-tier (memory, then optional disk) cache of validated CTM results."""
+
+    def __init__(self):
+        self.memory: LRUCache[CachedMindmap] = LRUCache(max_entries=settings.mindmap_cache_max_entries)
+        self.disk = (
+            DiskCache(
+                settings.mindmap_cache_dir,
+                ttl_seconds=settings.mindmap_cache_ttl_seconds,
+                max_bytes=settings.mindmap_cache_max_bytes,
+            )
+            if settings.mindmap_cache_dir
+            else None
+        )
+        self.hits = 0
+        self.misses = 0
+        self.write_errors = 0
+        self.last_error: str | None = None
+
+    async def get(self, key: str) -> CachedMindmap | None:
+        if not settings.mindmap_cache_enabled:
+            return None
+
+        result = self.memory.get(key)
+        if result is None and self.disk is not None:
+            result = await asyncio.to_thread(self.disk.get, key)
+            if result is not None:
+                # Promote disk hits to the memory tier
+                self.memory.set(key, result)
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    async def set(self, key: str, value: CachedMindmap) -> None:
+        """Store a result; a failed disk write is recorded, never raised (the memory tier still has it)."""
+        if not settings.mindmap_cache_enabled:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, value)
+            except (OSError, ValueError, TypeError) as e:
+                self.write_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": settings.mindmap_cache_enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+            "write_errors": self.write_errors,
+            "last_error": self.last_error,
+        }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,123 @@
+"""
+Helpers for long-document (map-reduce) generation.
+
+Long inputs are split into section-aware chunks, each chunk is turned into a
+CTM subtree, and the subtrees are merged under a single root.
+"""
+
+import re
+
+from routers.mindmap.ctm_validator import CTMTree, escape_label, format_ctm
+
+# Markdown headings (trafilatura output) start a new section
+_HEADING_RE = re.compile(r'^#{1,6}\s+\S')
+# Sentence ends used when a single paragraph is larger than a chunk
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?。])\s+')
+
+ROOT_LABEL_MAX_CHARS = 80
+
+
+def split_into_sections(text: str) -> list[str]:
+    """
+    Split text into paragraphs, keeping headings attached to the text below.
+
+    Blank lines and page breaks (form feeds) end a paragraph; a heading always
+    starts a new one.
+    """
+    sections: list[str] = []
+    current: list[str] = []
+
+    def flush():
+        if current:
+            block = "\n".join(current).strip()
+            if block:
+                sections.append(block)
+            current.clear()
+
+    for line in text.replace("\f", "\n\n").split("\n"):
+        if not line.strip():
+            # A heading followed by a blank line still belongs to the next paragraph
+            if not all(_HEADING_RE.match(c) for c in current):
+                flush()
+        elif _HEADING_RE.match(line):
+            flush()
+            current.append(line)
+        else:
+            current.append(line)
+    flush()
+    return sections
+
+
+def split_into_chunks(text: str, max_chars: int) -> list[str]:
+    """
+    Pack paragraphs into chunks of at most ``max_chars`` characters.
+
+    A heading starts a new chunk once the current one is at least half full,
+    so sections stay together where possible. Oversized paragraphs are split
+    on sentence boundaries, then hard-wrapped as a last resort.
+    """
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+
+    for section in split_into_sections(text):
+        pieces = [section] if len(section) <= max_chars else _split_oversized(section, max_chars)
+        for piece in pieces:
+            starts_section = _HEADING_RE.match(piece) is not None
+            if current and (size + len(piece) + 2 > max_chars or (starts_section and size >= max_chars // 2)):
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 2
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _split_oversized(section: str, max_chars: int) -> list[str]:
+    pieces: list[str] = []
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(section):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def document_title(text: str, fallback: str = "Mindmap") -> str:
+    """Pick a root label: the first heading, else the first non-empty line."""
+    first_line = ""
+    for line in text.split("\n", 200)[:200]:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if _HEADING_RE.match(stripped):
+            return _shorten(stripped.lstrip("#").strip())
+        if not first_line:
+            first_line = stripped
+    return _shorten(first_line) if first_line else fallback
+
+
+def merge_subtrees(root_label: str, subtrees: list[CTMTree]) -> str:
+    """Merge validated subtrees under one root, pushing each down one level."""
+    lines = [escape_label(root_label)]
+    for tree in subtrees:
+        lines.append(format_ctm(tree, level_offset=1))
+    return "\n".join(lines)
+
+
+def _shorten(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= ROOT_LABEL_MAX_CHARS:
+        return text
+    return text[:ROOT_LABEL_MAX_CHARS - 1].rstrip() + "…"
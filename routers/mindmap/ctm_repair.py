@@ -0,0 +1,155 @@
+"""
+Deterministic local repair of near-valid CTM.
+
+Most validation failures are mechanical (stray whitespace, code fences,
+an off-by-one level skip, ...). Fixing them locally is much cheaper than
+spending an LLM retry on them.
+"""
+
+import re
+from collections import Counter
+from typing import TypedDict
+
+from routers.mindmap.ctm_validator import parse_ctm, _find_unescaped
+
+# Leading whitespace, then '>' markers possibly separated/followed by whitespace
+_PREFIX_RE = re.compile(r'([ \t]*)((?:>[ \t]*)*)')
+
+
+class RepairResult(TypedDict):
+    ctm: str
+    fixes: list[str]
+    validation_message: str
+
+
+class CTMLineRepairer:
+    """
+    Stateful line-by-line repair, usable on a full text or on a token stream.
+
+    Only safe fixes are applied; anything else is passed through unchanged
+    for the validator to report.
+    """
+
+    def __init__(self):
+        self.fixes: set[str] = set()
+        self.prev_level = 0
+        self.started = False
+        # (original level that started a shift, cumulative shift) for repaired level skips
+        self._shifts: list[tuple[int, int]] = []
+
+    def repair_line(self, line: str) -> str | None:
+        """Return the repaired line, or None when the line should be dropped."""
+        if not line.strip():
+            if self.started:
+                self.fixes.add("blank_lines")
+            return None
+
+        if line.lstrip().startswith('```'):
+            self.fixes.add("code_fence")
+            return None
+
+        match = _PREFIX_RE.match(line)
+        leading, markers = match.group(1), match.group(2)
+        rest = line[match.end():]
+        level = markers.count('>')
+
+        if leading and self.started:
+            self.fixes.add("leading_whitespace")
+        if len(markers) != level:
+            self.fixes.add("space_after_marker")
+
+        rest = self._drop_dangling_pipe(rest)
+
+        if not self.started:
+            # Root problems are not repaired; let the validator report them
+            self.started = True
+            self.prev_level = level
+            return '>' * level + rest
+
+        level = self._repair_level(level)
+        self.prev_level = level
+        return '>' * level + rest
+
+    def _repair_level(self, original: int) -> int:
+        shifts = self._shifts
+        while shifts and original < shifts[-1][0]:
+            shifts.pop()
+        shift = shifts[-1][1] if shifts else 0
+        level = original - shift
+
+        # Off-by-one skip: pull this node (and its subtree) up by one level
+        if level == self.prev_level + 2:
+            shifts.append((original, shift + 1))
+            self.fixes.add("level_skip")
+            level -= 1
+        return level
+
+    def _drop_dangling_pipe(self, rest: str) -> str:
+        pipe = _find_unescaped(rest, '|', 0)
+        if pipe != -1 and not rest[pipe + 1:].strip():
+            self.fixes.add("dangling_pipe")
+            return rest[:pipe].rstrip()
+        return rest
+
+
+class RepairStats:
+    """Counters for the local repair stage."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.repaired = 0
+        self.fixes: Counter[str] = Counter()
+
+    def record(self, result: RepairResult | None) -> None:
+        self.attempts += 1
+        if result is not None:
+            self.repaired += 1
+            self.fixes.update(result["fixes"])
+
+    def stats(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "repaired": self.repaired,
+            # Every successful repair replaces one LLM retry
+            "retries_avoided": self.repaired,
+            "fixes": dict(self.fixes),
+        }
+
+
+repair_stats = RepairStats()
+
+
+def repair_ctm(text: str, record: bool = True) -> RepairResult | None:
+    """
+    Apply safe deterministic fixes to an invalid CTM text and re-validate it.
+
+    Args:
+        text: CTM text that failed validation
+        record: Count the attempt in repair_stats; False for checks whose
+            caller repairs the text again
+
+    Returns:
+        RepairResult with the repaired text and the fixes applied, or None when
+        nothing could be fixed or the result is still invalid
+    """
+    repairer = CTMLineRepairer()
+    lines = []
+    for line in text.strip().split('\n'):
+        repaired = repairer.repair_line(line)
+        if repaired is not None:
+            lines.append(repaired)
+
+    if not repairer.fixes:
+        result = None
+    else:
+        ctm = '\n'.join(lines)
+        validation = parse_ctm(ctm)
+        result = {
+            "ctm": ctm,
+            "fixes": sorted(repairer.fixes),
+            "validation_message": validation["message"]
+        } if validation["is_valid"] else None
+
+    if record:
+        repair_stats.record(result)
+    return result
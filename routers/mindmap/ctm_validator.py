@@ -2,26 +2,85 @@
 CTM (Compact Tree Markup) Validator
 
 Validates mindmap output from LLM to ensure it follows CTM format rules.
+
+A single linear scan validates every line and builds a compact tree at the
+same time: node levels and parent indices live in flat integer arrays,
+labels in a list and attributes in a side table.
 """
 
 import re
+from array import array
 from typing import TypedDict
 
+_FENCE_PATTERNS = [
+    re.compile(r'^```(?:ctm|txt|text|plaintext)?\s*\n(.*?)\n```$', re.DOTALL | re.IGNORECASE),
+    re.compile(r'^```(?:ctm|txt|text|plaintext)?\s*\n(.*?)```$', re.DOTALL | re.IGNORECASE),
+]
+_ESCAPE_PATTERN = re.compile(r'\\([|:,>\\n])')
+
 
 class ValidationResult(TypedDict):
     is_valid: bool
     message: str
 
 
-def validate_ctm(message: str) -> ValidationResult:
+class CTMTree:
     """
-    Validate a CTM format string returned from LLM.
-    
+    Parsed CTM tree stored as parallel arrays.
+
+    Node ``i`` has level ``levels[i]``, parent ``parents[i]`` (-1 for the root)
+    and raw (still escaped) label ``labels[i]``. Attributes are kept as
+    ``(node_index, key, value)`` rows in ``attributes``.
+    """
+
+    __slots__ = ("levels", "parents", "labels", "attributes", "_last_at_level")
+
+    def __init__(self):
+        self.levels = array("i")
+        self.parents = array("i")
+        self.labels: list[str] = []
+        self.attributes: list[tuple[int, str, str]] = []
+        # Index of the most recent node on each level, used to find parents
+        self._last_at_level: list[int] = []
+
+    def append(self, level: int, label: str, attrs: list[tuple[str, str]] | None = None) -> int:
+        """Add a node; the caller guarantees the level is reachable. Returns its index."""
+        index = len(self.labels)
+        self.levels.append(level)
+        self.parents.append(self._last_at_level[level - 1] if level else -1)
+        self.labels.append(label)
+        if attrs:
+            for key, value in attrs:
+                self.attributes.append((index, key, value))
+
+        stack = self._last_at_level
+        if level == len(stack):
+            stack.append(index)
+        else:
+            stack[level] = index
+        return index
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+
+class ParseResult(TypedDict):
+    is_valid: bool
+    message: str
+    error_code: str | None
+    tree: CTMTree | None
+
+
+def parse_ctm(message: str) -> ParseResult:
+    """
+    Validate a CTM string and build its tree in one pass.
+
     Args:
         message: The CTM format string to validate
-        
+
     Returns:
-        ValidationResult with is_valid and message fields
+        ParseResult with is_valid, message, error_code and the parsed tree
+        (None when invalid)
     """
 
     # Strip markdown code blocks if present
@@ -29,281 +88,355 @@ def validate_ctm(message: str) -> ValidationResult:
 
     # Check for empty input
     if not message or not message.strip():
-        return {
-            "is_valid": False,
-            "message": "Input is empty. Expected CTM format content."
-        }
-
-    lines = message.strip().split('\n')
+        return _error("empty_input", "Input is empty. Expected CTM format content.")
 
-    # Filter out empty lines and track if there were any
-    non_empty_lines = []
+    tree = CTMTree()
     has_blank_lines = False
-    prev_was_content = False
-
-    for line in lines:
-        if line.strip() == '':
-            if prev_was_content:
+    prev_level = 0
+    line_num = 0
+    # Attribute errors are reported only when the structure is valid
+    attr_error: tuple[str, str] | None = None
+
+    for line in message.strip().split('\n'):
+        if not line or line.isspace():
+            # Leading blank lines are impossible after strip()
+            if line_num:
                 has_blank_lines = True
             continue
-        non_empty_lines.append(line)
-        prev_was_content = True
+        line_num += 1
 
-    if not non_empty_lines:
-        return {
-            "is_valid": False,
-            "message": "No valid content found. Expected CTM format nodes."
-        }
+        level, label, attrs, code, error = _parse_line(line)
 
-    # Warning about blank lines (not a hard error but noted)
-    warnings = []
-    if has_blank_lines:
-        warnings.append("Warning: Blank lines detected between nodes (should be avoided).")
+        if line_num == 1 and level != 0:
+            return _error(
+                "root_level",
+                f"Line 1: Root node must not have any '>' prefix. Found {level} '>' character(s)."
+            )
 
-    # Validate first line is root (level 0)
-    first_line = non_empty_lines[0]
-    first_level = _count_level(first_line)
+        if code is not None and label is None:
+            return _error(code, f"Line {line_num}: {error}")
 
-    if first_level != 0:
-        return {
-            "is_valid": False,
-            "message": f"Line 1: Root node must not have any '>' prefix. Found {first_level} '>' character(s)."
-        }
+        if level > prev_level + 1:
+            return _error("level_skip", _level_skip_message(line_num, prev_level, level))
 
-    # Track the current level for continuity check
-    prev_level = 0
+        if code is not None:
+            if attr_error is None:
+                attr_error = (code, f"Line {line_num}: {error}")
+        elif attr_error is None:
+            tree.append(level, label, attrs)
 
-    for i, line in enumerate(non_empty_lines):
-        line_num = i + 1
-
-        # Check for spaces around '>' characters
-        space_error = _check_spaces_around_markers(line)
-        if space_error:
-            return {
-                "is_valid": False,
-                "message": f"Line {line_num}: {space_error}"
-            }
-
-        # Count current level
-        current_level = _count_level(line)
-
-        # Validate label is not empty
-        label = _extract_label(line)
-        if not label:
-            return {
-                "is_valid": False,
-                "message": f"Line {line_num}: Node label is empty. Each node must have a label."
-            }
-
-        # Check for level skip (going down more than 1 level at a time)
-        if current_level > prev_level + 1:
-            return {
-                "is_valid": False,
-                "message": (
-                    f"Line {line_num}: Level skip detected! "
-                    f"Jumped from level {prev_level} to level {current_level}. "
-                    f"You can only increment by 1 level at a time. "
-                    f"Missing parent node at level {prev_level + 1}."
-                )
-            }
-
-        # Check for invalid characters in markers (only '>' allowed for indentation)
-        prefix = _get_prefix(line)
-        if prefix and not all(c == '>' for c in prefix):
-            return {
-                "is_valid": False,
-                "message": f"Line {line_num}: Invalid indentation characters. Only '>' is allowed for indentation."
-            }
-
-        prev_level = current_level
-
-    # Validate attributes format if present
-    for i, line in enumerate(non_empty_lines):
-        line_num = i + 1
-        attr_error = _validate_attributes(line)
-        if attr_error:
-            return {
-                "is_valid": False,
-                "message": f"Line {line_num}: {attr_error}"
-            }
+        prev_level = level
+
+    if not line_num:
+        return _error("no_content", "No valid content found. Expected CTM format nodes.")
+
+    if attr_error is not None:
+        return _error(*attr_error)
 
     # All validations passed
-    warning_text = " ".join(warnings) if warnings else ""
-    success_message = f"Valid CTM format with {len(non_empty_lines)} nodes."
-    if warning_text:
-        success_message += f" {warning_text}"
+    success_message = f"Valid CTM format with {line_num} nodes."
+    if has_blank_lines:
+        # Warning about blank lines (not a hard error but noted)
+        success_message += " Warning: Blank lines detected between nodes (should be avoided)."
 
     return {
         "is_valid": True,
-        "message": success_message
+        "message": success_message,
+        "error_code": None,
+        "tree": tree
     }
 
 
-def _strip_markdown_blocks(text: str) -> str:
-    """Remove markdown code block wrappers if present."""
-    text = text.strip()
+def validate_ctm(message: str) -> ValidationResult:
+    """
+    Validate a CTM format string returned from LLM.
 
-    # Pattern to match ```ctm, ```txt, ``` or similar
-    patterns = [
-        r'^```(?:ctm|txt|text|plaintext)?\s*\n(.*?)\n```$',
-        r'^```(?:ctm|txt|text|plaintext)?\s*\n(.*?)```$',
-    ]
+    Args:
+        message: The CTM format string to validate
 
-    for pattern in patterns:
-        match = re.match(pattern, text, re.DOTALL | re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
+    Returns:
+        ValidationResult with is_valid and message fields
+    """
+    result = parse_ctm(message)
+    return {
+        "is_valid": result["is_valid"],
+        "message": result["message"]
+    }
 
-    # Also try simple removal
-    if text.startswith('```') and text.endswith('```'):
-        # Remove first line (```...) and last (```)
-        lines = text.split('\n')
-        if len(lines) >= 2:
-            return '\n'.join(lines[1:-1]).strip()
 
-    return text
+class IncrementalCTMValidator:
+    """
+    Line-by-line CTM validator for streamed LLM output.
 
+    Feed each completed line as it arrives; ``feed_line`` returns a hard error
+    message as soon as one is detected. It is never stricter than
+    ``validate_ctm``, which stays the authoritative check on the full text.
+    Accepted nodes are appended to ``tree``.
 
-def _count_level(line: str) -> int:
-    """Count the number of '>' at the start of the line (indentation level)."""
-    count = 0
-    for char in line:
-        if char == '>':
-            count += 1
-        else:
-            break
-    return count
+    Inside an opening code fence, whether ``validate_ctm`` strips the fence
+    depends on how the text ends, so the opening fence is taken as the root
+    when the first node needs one, and a line ending with a fence is only
+    judged once a later line shows it was not the last.
+    """
 
+    def __init__(self):
+        self.tree = CTMTree()
+        self.line_count = 0
+        self.prev_level = 0
+        self.in_fence = False
+        self.fence_line: str | None = None
+        self.closed = False
+        self.error: str | None = None
+        self.error_code: str | None = None
+        self._deferred: str | None = None
+
+    def feed_line(self, line: str) -> str | None:
+        """Validate one line. Returns the first hard error, if any."""
+        if self.error is not None or self.closed:
+            return self.error
+
+        if not line or line.isspace():
+            return None
+
+        if self._deferred is not None:
+            # A later line arrived: the deferred one is not the last line after all
+            deferred, self._deferred = self._deferred, None
+            if self._check_line(deferred) is not None:
+                return self.error
+
+        # Markdown code fences around the output are tolerated
+        if line.lstrip().startswith('```'):
+            if self.line_count == 0 and not self.in_fence:
+                self.in_fence = True
+                self.fence_line = line.strip()
+            else:
+                self.closed = True
+            return None
+
+        if self.in_fence and line.rstrip().endswith('```'):
+            # validate_ctm cuts the closing fence off the last line, or drops that line
+            self._deferred = line
+            return None
+
+        return self._check_line(line)
+
+    def _check_line(self, line: str) -> str | None:
+        if self.line_count == 0:
+            # validate_ctm strips the whole message, so leading whitespace of the root is fine
+            line = line.lstrip()
+            if self.in_fence and _parse_line(line)[0] != 0:
+                # Without a closing fence validate_ctm keeps the opening one as the root node
+                self.tree.append(0, self.fence_line)
+                self.line_count = 1
+
+        self.line_count += 1
+        line_num = self.line_count
+
+        level, label, attrs, code, error = _parse_line(line)
+
+        if line_num == 1 and level != 0:
+            return self._fail(
+                "root_level",
+                f"Line 1: Root node must not have any '>' prefix. Found {level} '>' character(s)."
+            )
+
+        if code is not None and label is None:
+            return self._fail(code, f"Line {line_num}: {error}")
+
+        if level > self.prev_level + 1:
+            return self._fail("level_skip", _level_skip_message(line_num, self.prev_level, level))
+
+        if code is not None:
+            return self._fail(code, f"Line {line_num}: {error}")
+
+        self.tree.append(level, label, attrs)
+        self.prev_level = level
+        return None
+
+    def _fail(self, code: str, message: str) -> str:
+        self.error_code = code
+        self.error = message
+        return message
+
+
+def format_ctm(tree: CTMTree, level_offset: int = 0) -> str:
+    """
+    Serialize a parsed tree back to CTM text.
 
-def _get_prefix(line: str) -> str:
-    """Get the prefix characters (everything before the label)."""
-    match = re.match(r'^([>]+)', line)
-    return match.group(1) if match else ""
+    Args:
+        tree: Tree built by ``parse_ctm`` or ``IncrementalCTMValidator``
+        level_offset: Number of levels to push every node down by
 
+    Returns:
+        CTM text, one node per line
+    """
+    attributes = tree.attributes
+    attr_pos = 0
+    lines = []
+    for index, (level, label) in enumerate(zip(tree.levels, tree.labels)):
+        line = '>' * (level + level_offset) + label
+        if attr_pos < len(attributes) and attributes[attr_pos][0] == index:
+            pairs = []
+            while attr_pos < len(attributes) and attributes[attr_pos][0] == index:
+                _, key, value = attributes[attr_pos]
+                pairs.append(f"{key}:{value}")
+                attr_pos += 1
+            line += '|' + ','.join(pairs)
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def escape_label(text: str) -> str:
+    """Escape free text so it can be used as a CTM label."""
+    for char in ('\\', '|', ':', ',', '>'):
+        text = text.replace(char, '\\' + char)
+    return text
 
-def _extract_label(line: str) -> str:
-    """Extract the label from a CTM line (without level markers and attributes)."""
-    # Remove leading '>' characters
-    content = line.lstrip('>')
 
-    # Remove attributes (everything after unescaped |)
-    # Handle escaped pipes \|
-    label = ""
-    i = 0
-    while i < len(content):
-        if content[i] == '\\' and i + 1 < len(content):
-            # Escaped character, keep both
-            label += content[i:i + 2]
-            i += 2
-        elif content[i] == '|':
-            # Unescaped pipe, stop here
-            break
-        else:
-            label += content[i]
-            i += 1
+def unescape_label(text: str) -> str:
+    """Decode CTM escapes (``\\|``, ``\\:``, ``\\,``, ``\\>``, ``\\\\`` and ``\\n``) in a label or value."""
+    if '\\' not in text:
+        return text
+    return _ESCAPE_PATTERN.sub(lambda m: '\n' if m.group(1) == 'n' else m.group(1), text)
 
-    return label.strip()
 
+def _parse_line(line: str) -> tuple[int, str | None, list[tuple[str, str]] | None, str | None, str | None]:
+    """
+    Scan one non-blank CTM line.
 
-def _check_spaces_around_markers(line: str) -> str | None:
-    """Check for invalid spaces around '>' markers."""
+    Returns:
+        Tuple of (level, label, attributes, error_code, error_message).
+        Structural errors come back with ``label=None``; attribute errors keep
+        the label so the caller can still track the level structure.
+    """
     # Check for space before first '>'
-    if line.startswith(' ') or line.startswith('\t'):
-        return "Line starts with whitespace. Remove spaces/tabs before '>' markers."
-
-    # Check for spaces between '>' characters or immediately after
-    prefix_match = re.match(r'^(>+)', line)
-    if prefix_match:
-        prefix = prefix_match.group(1)
-        after_prefix = line[len(prefix):]
-
-        # Check if prefix contains spaces (shouldn't be possible but safe check)
-        if ' ' in prefix or '\t' in prefix:
-            return "Spaces found within '>' markers. Remove all spaces from indentation."
-
-        # Check for space immediately after prefix before label
-        if after_prefix.startswith(' ') or after_prefix.startswith('\t'):
-            return "Space after '>' markers. Label should immediately follow '>' without spaces."
+    if line[0] == ' ' or line[0] == '\t':
+        return 0, None, None, "leading_whitespace", \
+            "Line starts with whitespace. Remove spaces/tabs before '>' markers."
 
-    return None
-
-
-def _validate_attributes(line: str) -> str | None:
-    """Validate attribute format if present (|key:value,key2:value2)."""
-    # Find unescaped pipe
     content = line.lstrip('>')
+    level = len(line) - len(content)
+
+    # Check for space immediately after prefix before label
+    if level and content[:1] in (' ', '\t'):
+        return level, None, None, "space_after_marker", \
+            "Space after '>' markers. Label should immediately follow '>' without spaces."
+
+    # Label is everything before the first unescaped '|'
+    has_escapes = '\\' in content
+    pipe = _find_unescaped(content, '|', 0) if has_escapes else content.find('|')
+    label = (content if pipe == -1 else content[:pipe]).strip()
+    if not label:
+        return level, None, None, "empty_label", "Node label is empty. Each node must have a label."
+
+    if pipe == -1:
+        return level, label, None, None, None
+
+    attrs, code, error = _parse_attributes(content, pipe + 1, has_escapes)
+    return level, label, attrs, code, error
+
+
+def _parse_attributes(
+    content: str,
+    start: int,
+    has_escapes: bool
+) -> tuple[list[tuple[str, str]] | None, str | None, str | None]:
+    """Parse the attribute section (|key:value,key2:value2) starting at ``start``."""
+    attr_str = content[start:]
+    if not attr_str or attr_str.isspace():
+        return None, "empty_attributes", \
+            "Attribute section is empty after '|'. Either remove '|' or add attributes."
 
-    pipe_pos = -1
-    i = 0
-    while i < len(content):
-        if content[i] == '\\' and i + 1 < len(content):
-            i += 2
-            continue
-        if content[i] == '|':
-            pipe_pos = i
-            break
-        i += 1
-
-    if pipe_pos == -1:
-        return None  # No attributes, that's fine
-
-    attr_str = content[pipe_pos + 1:]
-
-    if not attr_str.strip():
-        return "Attribute section is empty after '|'. Either remove '|' or add attributes."
-
-    # Parse attributes (key:value pairs separated by commas)
     # Handle escaped characters: \| \: \, \> \\
-    pairs = []
-    current_pair = ""
-    j = 0
-
-    while j < len(attr_str):
-        if attr_str[j] == '\\' and j + 1 < len(attr_str):
-            current_pair += attr_str[j:j + 2]
-            j += 2
-            continue
-        if attr_str[j] == ',':
-            pairs.append(current_pair.strip())
-            current_pair = ""
-            j += 1
-            continue
-        current_pair += attr_str[j]
-        j += 1
+    pairs = _split_unescaped(attr_str, ',') if has_escapes else attr_str.split(',')
 
-    if current_pair.strip():
-        pairs.append(current_pair.strip())
-
-    # Validate each pair has key:value format
+    attrs = []
     for pair in pairs:
+        pair = pair.strip()
         if not pair:
             continue
 
-        # Find unescaped colon
-        colon_pos = -1
-        k = 0
-        while k < len(pair):
-            if pair[k] == '\\' and k + 1 < len(pair):
-                k += 2
-                continue
-            if pair[k] == ':':
-                colon_pos = k
-                break
-            k += 1
+        colon = _find_unescaped(pair, ':', 0) if has_escapes else pair.find(':')
+        if colon == -1:
+            return None, "invalid_attribute", f"Invalid attribute format '{pair}'. Expected 'key:value' format."
+
+        key = pair[:colon].strip()
+        if not key:
+            return None, "empty_attribute_key", f"Attribute key is empty in '{pair}'."
+        attrs.append((key, pair[colon + 1:].strip()))
+
+    return attrs, None, None
+
+
+def _find_unescaped(text: str, char: str, start: int) -> int:
+    """Find ``char`` not preceded by an odd run of backslashes, or -1."""
+    pos = text.find(char, start)
+    while pos != -1:
+        run_start = pos
+        while run_start > start and text[run_start - 1] == '\\':
+            run_start -= 1
+        if (pos - run_start) % 2 == 0:
+            return pos
+        pos = text.find(char, pos + 1)
+    return -1
+
+
+def _split_unescaped(text: str, char: str) -> list[str]:
+    """Split ``text`` on every unescaped ``char``."""
+    parts = []
+    start = 0
+    pos = _find_unescaped(text, char, 0)
+    while pos != -1:
+        parts.append(text[start:pos])
+        start = pos + 1
+        pos = _find_unescaped(text, char, start)
+    parts.append(text[start:])
+    return parts
+
+
+def _level_skip_message(line_num: int, prev_level: int, level: int) -> str:
+    return (
+        f"Line {line_num}: Level skip detected! "
+        f"Jumped from level {prev_level} to level {level}. "
+        f"You can only increment by 1 level at a time. "
+        f"Missing parent node at level {prev_level + 1}."
+    )
+
+
+def _error(code: str, message: str) -> ParseResult:
+    return {
+        "is_valid": False,
+        "message": message,
+        "error_code": code,
+        "tree": None
+    }
 
-        if colon_pos == -1:
-            return f"Invalid attribute format '{pair}'. Expected 'key:value' format."
 
-        key = pair[:colon_pos].strip()
-        value = pair[colon_pos + 1:].strip()
+def _strip_markdown_blocks(text: str) -> str:
+    """Remove markdown code block wrappers if present."""
+    text = text.strip()
 
-        if not key:
-            return f"Attribute key is empty in '{pair}'."
+    # Every supported wrapper starts with a fence
+    if not text.startswith('```'):
+        return text
 
-    return None
+    # Pattern to match ```ctm, ```txt, ``` or similar
+    for pattern in _FENCE_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            return match.group(1).strip()
+
+    # Also try simple removal
+    if text.endswith('```'):
+        # Remove first line (```...) and last (```)
+        lines = text.split('\n')
+        if len(lines) >= 2:
+            return '\n'.join(lines[1:-1]).strip()
+
+    return text
 
 
 # Convenience function for quick validation
 def is_valid_ctm(message: str) -> bool:
     """Quick check if message is valid CTM format."""
-    return validate_ctm(message)["is_valid"]
+    return parse_ctm(message)["is_valid"]
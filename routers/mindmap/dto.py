@@ -1,11 +1,12 @@
 from enum import Enum
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 from pydantic import BaseModel
 
 
 class StreamEvent(TypedDict):
     """Structure for stream events"""
+    id: NotRequired[int]  # Position in a job's stream, set by the job layer
     status: str
     message: str
     data: dict | None
@@ -23,7 +24,9 @@ class StreamStatus(str, Enum):
     EXTRACTING_TEXT = "EXTRACTING_TEXT"
     
     # AI Processing
+    QUEUED = "QUEUED"
     PROCESSING = "PROCESSING"
+    NODES = "NODES"  # Nodes completed so far by the streamed LLM output
     VALIDATING = "VALIDATING"
     RETRY = "RETRY"
     
@@ -42,9 +45,38 @@ class LLMConfig(BaseModel):
     """LLM configuration for custom API keys"""
     llm_type: LLMType = LLMType.OLLAMA
     api_key: str | None = None  # Required for Gemini
+    # Also call the other backend when this one is slow or failing (needs api_key)
+    hedge: bool = False
+
+
+class EventFormat(str, Enum):
+    """Wire format of event streams"""
+    NDJSON = "ndjson"  # One JSON object per line (default)
+    SSE = "sse"  # Server-Sent Events
+
+
+class OutputFormat(str, Enum):
+    """Shape of the mindmap in the SUCCESS event"""
+    CTM = "ctm"  # Raw CTM text (default)
+    TREE = "tree"  # Parsed tree as parallel arrays, see tree_format
+
+
+class OutputOptions(BaseModel):
+    """How the SUCCESS event carries the mindmap"""
+    format: OutputFormat = OutputFormat.CTM
+    # Payload compressions the client can decode, most preferred first ("zstd", "gzip")
+    encodings: list[str] = []
 
 
 class MindmapRequest(BaseModel):
     """Request body for mindmap generation"""
     text: str
     llm_config: LLMConfig | None = None
+    output: OutputOptions | None = None
+
+
+class BatchRequest(BaseModel):
+    """JSON body of a batch submission without files"""
+    texts: list[str] = []
+    urls: list[str] = []
+    llm_config: LLMConfig | None = None
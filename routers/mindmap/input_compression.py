@@ -0,0 +1,230 @@
+"""
+Input compression before generation.
+
+Long web pages and PDFs reach the LLM with text the mindmap does not need:
+per-page headers and footers, navigation leftovers and near-duplicate
+paragraphs. With ``input_compression_enabled`` the input is
+
+1. stripped of lines repeated at the top or bottom of most PDF pages,
+2. split into passages (paragraphs with their headings),
+3. deduplicated: exact copies always, near-identical passages by the cosine
+   similarity of their ``ollama_embedding_model`` embeddings,
+4. cut to ``input_compression_max_tokens`` by keeping the passages closest
+   to the document centroid, in document order.
+
+Tokens are estimated from the character count. Without an embedding model
+(or when it fails) only steps 1 to 3 run, with exact deduplication.
+"""
+
+import asyncio
+import math
+import re
+from collections import Counter
+from typing import TypedDict
+
+import numpy as np
+
+from config.Setttings import settings
+from core.llm import get_embeddings
+from routers.mindmap.cache import normalize_input
+from routers.mindmap.chunking import split_into_sections
+from routers.mindmap.pdf_extraction import PAGE_SEPARATOR
+
+# Non-blank lines at each end of a page that may be a header or footer
+PAGE_EDGE_LINES = 3
+# Longer lines are content, even when repeated
+BOILERPLATE_MAX_CHARS = 120
+# Short passages (headings, captions) are only removed as exact copies
+NEAR_DUPLICATE_MIN_CHARS = 80
+EMBED_BATCH_SIZE = 64
+# Passages deduplicated per matrix product
+DEDUP_BLOCK_SIZE = 256
+EMBED_MAX_CHARS = 2000
+
+_DIGITS_RE = re.compile(r"\d+")
+
+
+class CompressionReport(TypedDict):
+    tokens_before: int
+    tokens_after: int
+    tokens_removed: int
+    # Tokens removed by each step
+    removed_boilerplate: int
+    removed_duplicates: int
+    removed_for_budget: int
+    passages: int
+    passages_kept: int
+    embedded: bool
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / settings.input_compression_chars_per_token)
+
+
+def strip_page_boilerplate(text: str) -> str:
+    """
+    Drop header/footer lines repeated on most pages of a PDF text.
+
+    Page numbers are ignored when comparing lines, so "Page 3 of 40" repeats.
+    Texts with fewer than three pages are returned unchanged.
+    """
+    pages = text.split(PAGE_SEPARATOR)
+    if len(pages) < 3:
+        return text
+
+    page_lines = [page.split("\n") for page in pages]
+    edges = [_edge_indices(lines) for lines in page_lines]
+    counts = Counter()
+    for lines, indices in zip(page_lines, edges):
+        counts.update({_line_key(lines[i]) for i in indices})
+    min_pages = max(3, math.ceil(len(pages) / 2))
+    repeated = {key for key, count in counts.items() if count >= min_pages}
+    if not repeated:
+        return text
+
+    cleaned = []
+    for lines, indices in zip(page_lines, edges):
+        drop = {i for i in indices if _line_key(lines[i]) in repeated}
+        cleaned.append("\n".join(line for i, line in enumerate(lines) if i not in drop))
+    return PAGE_SEPARATOR.join(cleaned)
+
+
+async def compress_input(content: str) -> tuple[str, CompressionReport]:
+    """
+    Compress an input for generation.
+
+    Returns:
+        Tuple of (text to generate from, report). The text is ``content``
+        itself when nothing was removed.
+    """
+    tokens_before = estimate_tokens(content)
+    stripped = strip_page_boilerplate(content)
+
+    passages = split_into_sections(stripped)
+    # Exact copies (ignoring whitespace and case) need no embeddings
+    seen = set()
+    unique = []
+    for passage in passages:
+        key = normalize_input(passage).lower()
+        if key not in seen:
+            seen.add(key)
+            unique.append(passage)
+
+    kept = unique
+    removed_for_budget = 0
+    vectors = await _embed_passages(unique)
+    if vectors is not None:
+        indices, removed_for_budget = await asyncio.to_thread(
+            _select_passages, unique, vectors, settings.input_compression_max_tokens
+        )
+        kept = [unique[i] for i in indices]
+
+    if stripped is content and len(kept) == len(passages):
+        # Nothing removed: keep the original layout and page breaks
+        text = content
+    else:
+        text = "\n\n".join(kept)
+    tokens_after = estimate_tokens(text)
+    passage_tokens = sum(estimate_tokens(p) for p in passages)
+    kept_tokens = sum(estimate_tokens(p) for p in kept)
+    return text, {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_removed": max(0, tokens_before - tokens_after),
+        "removed_boilerplate": max(0, tokens_before - estimate_tokens(stripped)),
+        "removed_duplicates": max(0, passage_tokens - kept_tokens - removed_for_budget),
+        "removed_for_budget": removed_for_budget,
+        "passages": len(passages),
+        "passages_kept": len(kept),
+        "embedded": vectors is not None
+    }
+
+
+async def _embed_passages(passages: list[str]) -> np.ndarray | None:
+    """Unit embeddings of the passages, one row each, or None without a (working) embedding model."""
+    embeddings = get_embeddings()
+    if embeddings is None or not passages:
+        return None
+
+    texts = [passage[:EMBED_MAX_CHARS] for passage in passages]
+
+    async def embed_all() -> list[list[float]]:
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            vectors.extend(await embeddings.aembed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+        return vectors
+
+    try:
+        vectors = np.asarray(
+            await asyncio.wait_for(embed_all(), settings.input_compression_embed_timeout_seconds),
+            dtype=np.float32
+        )
+    except Exception:
+        # Compression is an optimization: generate from the exact-deduplicated text instead
+        return None
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def _select_passages(passages: list[str], vectors: np.ndarray, budget: int) -> tuple[list[int], int]:
+    """
+    Drop near-duplicates, then fit the budget with the most central passages.
+
+    Returns:
+        Tuple of (indices of the kept passages in document order, tokens
+        dropped to fit the budget)
+    """
+    threshold = settings.input_compression_dedup_threshold
+    comparable = np.array([len(p) >= NEAR_DUPLICATE_MIN_CHARS for p in passages], dtype=bool)
+    kept_mask = np.zeros(len(passages), dtype=bool)
+    # Kept comparable passages so far. Blocks of passages are compared with them and
+    # with each other, so memory grows with the passage count instead of its square
+    reference = np.empty((int(comparable.sum()), vectors.shape[1]), dtype=vectors.dtype)
+    references = 0
+    for start in range(0, len(passages), DEDUP_BLOCK_SIZE):
+        block = vectors[start:start + DEDUP_BLOCK_SIZE]
+        block_comparable = comparable[start:start + DEDUP_BLOCK_SIZE]
+        if references:
+            near_kept = (block @ reference[:references].T >= threshold).any(axis=1)
+        else:
+            near_kept = np.zeros(len(block), dtype=bool)
+        near_block = (block @ block.T >= threshold) & block_comparable
+        block_kept = np.zeros(len(block), dtype=bool)
+        for j in range(len(block)):
+            # A passage is a duplicate of an earlier, kept one (the first occurrence wins)
+            if block_comparable[j] and (near_kept[j] or np.any(near_block[j, :j] & block_kept[:j])):
+                continue
+            block_kept[j] = True
+        kept_mask[start:start + len(block)] = block_kept
+        added = block[block_kept & block_comparable]
+        reference[references:references + len(added)] = added
+        references += len(added)
+    kept = np.flatnonzero(kept_mask)
+
+    tokens = np.array([estimate_tokens(p) for p in passages])
+    if budget <= 0 or tokens[kept].sum() <= budget:
+        return kept.tolist(), 0
+
+    # Closest to the centroid first; the opening passage (title, abstract) is kept when it fits
+    centroid = vectors[kept].mean(axis=0)
+    centrality = vectors[kept] @ centroid
+    order = sorted(range(len(kept)), key=lambda j: (j != 0, -centrality[j]))
+    selected = []
+    used = 0
+    for j in order:
+        index = kept[j]
+        if used + tokens[index] <= budget:
+            selected.append(int(index))
+            used += tokens[index]
+    return sorted(selected), int(tokens[kept].sum() - used)
+
+
+def _edge_indices(lines: list[str]) -> list[int]:
+    """Short non-blank lines at the top and bottom of a page."""
+    indices = [i for i, line in enumerate(lines) if line.strip()]
+    edges = set(indices[:PAGE_EDGE_LINES] + indices[-PAGE_EDGE_LINES:])
+    return sorted(i for i in edges if len(lines[i].strip()) <= BOILERPLATE_MAX_CHARS)
+
+
+def _line_key(line: str) -> str:
+    return _DIGITS_RE.sub("#", " ".join(line.split()).lower())
@@ -0,0 +1,360 @@
+"""
+Resumable generation jobs.
+
+Every streaming request runs as a detached job with an id (``X-Job-Id``), so
+the work survives the client going away. Events are numbered and the most
+recent ``job_event_buffer_size`` are kept: a client that lost its stream
+reattaches with the last id it saw (``Last-Event-ID`` header or ``cursor``)
+and receives what it missed, then the live events.
+
+Job status and the final event are persisted in SQLite, so results outlive
+the in-memory job (and a restart) for ``job_ttl_seconds``.
+
+When the last listener disconnects, a running job is cancelled after
+``job_disconnect_grace_seconds`` unless someone reattaches first; the
+cancellation reaches the LLM call, pending retries and queued extraction
+work. Jobs nobody ever listened to are cancelled, and finished ones dropped
+from memory, after ``job_abandon_seconds``.
+"""
+
+import asyncio
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import AsyncGenerator, Callable, TypedDict
+
+import orjson
+
+from config.Setttings import settings
+from core import metrics
+from core.singleflight import SharedRun
+from routers.mindmap.dto import StreamEvent, StreamStatus
+from routers.mindmap.service import create_event
+
+
+class JobRecord(TypedDict):
+    job_id: str
+    status: str
+    created_at: float
+    updated_at: float
+    last_event_id: int
+    final_event: StreamEvent | None
+
+
+class JobResultStore:
+    """SQLite table of job status and final events. Blocking: call through asyncio.to_thread."""
+
+    COLUMNS = ("job_id", "status", "created_at", "updated_at", "last_event_id", "final_event")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._execute("PRAGMA journal_mode=WAL")
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL, last_event_id INTEGER NOT NULL, final_event TEXT)"
+        )
+        self._execute("CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)")
+
+    def _execute(self, sql: str, params: tuple = ()) -> tuple[list[tuple], int]:
+        """Run one statement; returns (rows, rowcount)."""
+        # One short-lived connection per call keeps this safe across worker threads
+        with closing(sqlite3.connect(self.path, timeout=5)) as conn, conn:
+            cursor = conn.execute(sql, params)
+            return cursor.fetchall(), cursor.rowcount
+
+    def save(
+        self,
+        job_id: str,
+        status: str,
+        created_at: float,
+        last_event_id: int = 0,
+        final_event: StreamEvent | None = None
+    ) -> None:
+        encoded = orjson.dumps(final_event).decode("utf-8") if final_event is not None else None
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, created_at, updated_at, last_event_id, final_event) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, status, created_at, time.time(), last_event_id, encoded)
+        )
+
+    def load(self, job_id: str) -> JobRecord | None:
+        rows, _ = self._execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        record = dict(zip(self.COLUMNS, rows[0]))
+        if record["final_event"] is not None:
+            record["final_event"] = orjson.loads(record["final_event"])
+        return record
+
+    def purge(self, before: float) -> int:
+        return self._execute("DELETE FROM jobs WHERE updated_at < ?", (before,))[1]
+
+
+class GenerationJob:
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.created_at = time.time()
+        self.status = "running"
+        self.run: SharedRun[StreamEvent] | None = None
+        # Pending cancellation after the last listener disconnected
+        self.abandon_timer: asyncio.TimerHandle | None = None
+
+    def summary(self) -> dict:
+        run = self.run
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "last_event_id": run.last_id if run is not None else None,
+            "buffered_from": run.events[0][0] if run is not None and run.events else None,
+            "listeners": len(run.subscribers) if run is not None else 0
+        }
+
+
+class JobManager:
+    def __init__(self):
+        self.jobs: dict[str, GenerationJob] = {}
+        self._store: JobResultStore | None = None
+        self._reaper: asyncio.Task | None = None
+        self.started = 0
+        self.reattached = 0
+        self.abandoned = 0
+        self.store_errors = 0
+        self.last_store_error: str | None = None
+
+    async def store(self) -> JobResultStore | None:
+        """Lazily open the SQLite store; None when persistence is disabled."""
+        if self._store is None and settings.job_store_path:
+            self._store = await asyncio.to_thread(JobResultStore, settings.job_store_path)
+        return self._store
+
+    async def start(
+        self,
+        events: AsyncGenerator[StreamEvent, None],
+        on_finish: Callable[[], None] | None = None
+    ) -> GenerationJob:
+        """
+        Run ``events`` as a detached job.
+
+        Args:
+            events: Generation event stream (create_event dicts)
+            on_finish: Called once the job ended, e.g. to remove an uploaded file
+        """
+        job = GenerationJob(uuid.uuid4().hex)
+        job.run = SharedRun(
+            self._recording(job, events, on_finish),
+            on_close=lambda: None,
+            max_events=settings.job_event_buffer_size,
+            detached=True
+        )
+        self.jobs[job.id] = job
+        self.started += 1
+        job.run.start()
+        self._ensure_reaper()
+        return job
+
+    async def stream(self, job: GenerationJob, after: int = 0) -> AsyncGenerator[StreamEvent, None]:
+        """Events after ``after``, each tagged with its id."""
+        if job.abandon_timer is not None:
+            # Reattached within the grace period
+            job.abandon_timer.cancel()
+            job.abandon_timer = None
+        events = job.run.subscribe_from(after)
+        try:
+            async for event_id, event in events:
+                yield _with_id(event, event_id)
+        finally:
+            # Closed here, not when collected, so the listener count is current
+            await events.aclose()
+            if not job.run.subscribers and not job.run.done and job.abandon_timer is None:
+                job.abandon_timer = asyncio.get_running_loop().call_later(
+                    settings.job_disconnect_grace_seconds, self._abandon, job, "disconnect"
+                )
+
+    async def reattach(self, job_id: str, after: int = 0) -> AsyncGenerator[StreamEvent, None] | None:
+        """
+        Resume a job's stream, from memory or from the persisted final event.
+
+        Returns:
+            Event stream, or None when the job is unknown (or expired)
+        """
+        job = self.jobs.get(job_id)
+        if job is not None:
+            self.reattached += 1
+            return self.stream(job, after)
+
+        store = await self.store()
+        record = await asyncio.to_thread(store.load, job_id) if store is not None else None
+        if record is None:
+            return None
+        self.reattached += 1
+        if record["final_event"] is not None and record["last_event_id"] <= after:
+            # The client already has everything
+            return _single(None)
+        if record["final_event"] is None:
+            # Still marked running: the process stopped before the job finished
+            final_event = _with_id(create_event(
+                StreamStatus.ERROR,
+                "Tiến trình tạo mindmap đã bị gián đoạn, vui lòng thử lại.",
+                {"job_id": job_id, "status": record["status"]}
+            ), 0)
+        else:
+            final_event = record["final_event"]
+        return _single(final_event)
+
+    async def status(self, job_id: str) -> dict | None:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.summary()
+        store = await self.store()
+        record = await asyncio.to_thread(store.load, job_id) if store is not None else None
+        if record is None:
+            return None
+        return {
+            "job_id": job_id,
+            "status": record["status"],
+            "created_at": record["created_at"],
+            "last_event_id": record["last_event_id"],
+            "buffered_from": None,
+            "listeners": 0
+        }
+
+    async def shutdown(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for job in self.jobs.values():
+            if job.abandon_timer is not None:
+                job.abandon_timer.cancel()
+        tasks = [job.run.task for job in self.jobs.values() if job.run.task is not None]
+        for job in self.jobs.values():
+            job.run.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.jobs.clear()
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self.jobs),
+            "running": sum(1 for job in self.jobs.values() if job.status == "running"),
+            "started": self.started,
+            "reattached": self.reattached,
+            "abandoned": self.abandoned,
+            "store_errors": self.store_errors,
+            "last_store_error": self.last_store_error
+        }
+
+    async def _recording(
+        self,
+        job: GenerationJob,
+        events: AsyncGenerator[StreamEvent, None],
+        on_finish: Callable[[], None] | None
+    ) -> AsyncGenerator[StreamEvent, None]:
+        """
+        Pass events through, persisting the job status and its final event.
+
+        A generation that raises ends with an ERROR event, so live and
+        resuming clients both see why the job failed.
+        """
+        last_event = None
+        count = 0
+        status = "cancelled"
+        try:
+            await self._save(job, "running")
+            try:
+                async for event in events:
+                    count += 1
+                    last_event = event
+                    yield event
+            except Exception as e:
+                count += 1
+                last_event = create_event(
+                    StreamStatus.ERROR,
+                    "Tiến trình tạo mindmap gặp lỗi, vui lòng thử lại.",
+                    {"job_id": job.id, "error": f"{type(e).__name__}: {e}"}
+                )
+                yield last_event
+            status = _final_status(last_event)
+        finally:
+            job.status = status
+            try:
+                await events.aclose()
+            finally:
+                if on_finish is not None:
+                    on_finish()
+            final_event = _with_id(last_event, count) if last_event is not None and status != "cancelled" else None
+            await self._save(job, status, count, final_event)
+
+    async def _save(
+        self,
+        job: GenerationJob,
+        status: str,
+        last_event_id: int = 0,
+        final_event: StreamEvent | None = None
+    ) -> None:
+        """Persist a job's status; a failed write is recorded, never raised (the job keeps streaming)."""
+        try:
+            store = await self.store()
+            if store is not None:
+                await asyncio.to_thread(store.save, job.id, status, job.created_at, last_event_id, final_event)
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            self.store_errors += 1
+            self.last_store_error = f"{type(e).__name__}: {e}"
+
+    def _abandon(self, job: GenerationJob, reason: str) -> None:
+        """Cancel a running job nobody is listening to."""
+        job.abandon_timer = None
+        if job.run.subscribers or job.run.done:
+            return
+        self.abandoned += 1
+        metrics.abandoned_jobs.inc(reason=reason)
+        job.run.close()
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def _reap_loop(self) -> None:
+        interval = max(1.0, min(30.0, settings.job_abandon_seconds / 4))
+        while True:
+            await asyncio.sleep(interval)
+            await self.reap()
+
+    async def reap(self) -> None:
+        """Cancel abandoned jobs, forget idle finished ones and purge expired records."""
+        now = time.monotonic()
+        for job in list(self.jobs.values()):
+            run = job.run
+            if run.idle_since is None or now - run.idle_since < settings.job_abandon_seconds:
+                continue
+            self._abandon(job, "idle")
+            del self.jobs[job.id]
+
+        try:
+            store = await self.store()
+            if store is not None:
+                await asyncio.to_thread(store.purge, time.time() - settings.job_ttl_seconds)
+        except (sqlite3.Error, OSError) as e:
+            # Retried at the next reap
+            self.store_errors += 1
+            self.last_store_error = f"{type(e).__name__}: {e}"
+
+
+def _with_id(event: StreamEvent, event_id: int) -> StreamEvent:
+    """Copy of a (possibly shared) event with its position in the job's stream."""
+    return {"id": event_id, **event}
+
+
+def _final_status(event: StreamEvent | None) -> str:
+    if event is not None and event["status"] == StreamStatus.SUCCESS.value:
+        return "succeeded"
+    return "failed"
+
+
+async def _single(event: StreamEvent | None) -> AsyncGenerator[StreamEvent, None]:
+    if event is not None:
+        yield event
+
+
+job_manager = JobManager()
@@ -0,0 +1,105 @@
+"""
+PDF text extraction in a process pool.
+
+pypdf is pure Python and CPU bound, so parsing inside the event loop (or a
+thread) stalls every other stream. Pages are extracted in ranges by worker
+processes and joined once, with pages separated by form feeds.
+
+A source is either the PDF bytes (small uploads) or the path of a spooled
+upload, which workers memory-map instead of receiving a copy.
+"""
+
+import asyncio
+import mmap
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+from typing import AsyncGenerator, Iterator
+
+from pypdf import PdfReader
+
+from config.Setttings import settings
+
+PAGE_SEPARATOR = "\f"
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """Lazily create the shared extraction pool."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.pdf_extract_workers or None,
+            # Forking a process that runs an event loop and threads is unsafe
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_pdf_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# Worker functions (run in the pool, must stay importable and picklable)
+@contextmanager
+def open_reader(source: bytes | str) -> Iterator[PdfReader]:
+    if isinstance(source, bytes):
+        yield PdfReader(BytesIO(source))
+        return
+    with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PdfReader(mapped)
+
+
+def count_pages(source: bytes | str) -> int:
+    with open_reader(source) as reader:
+        return len(reader.pages)
+
+
+def extract_page_range(source: bytes | str, start: int, stop: int) -> list[str]:
+    with open_reader(source) as reader:
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def page_ranges(page_count: int) -> list[tuple[int, int]]:
+    """Split pages into ranges, at least one per worker for small documents."""
+    workers = settings.pdf_extract_workers or multiprocessing.cpu_count()
+    size = max(1, min(settings.pdf_pages_per_task, -(-page_count // workers)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+async def count_pdf_pages(source: bytes | str) -> int:
+    """Open the PDF in the pool and return its page count."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pdf_executor(), count_pages, source)
+
+
+async def extract_pdf_pages(source: bytes | str, page_count: int) -> AsyncGenerator[tuple[int, list[str]], None]:
+    """
+    Extract all pages in parallel.
+
+    Yields:
+        Tuple of (first page index, page texts) for each range, in completion order
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_pdf_executor()
+
+    async def run_range(start: int, stop: int) -> tuple[int, list[str]]:
+        return start, await loop.run_in_executor(executor, extract_page_range, source, start, stop)
+
+    tasks = [asyncio.ensure_future(run_range(start, stop)) for start, stop in page_ranges(page_count)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Ranges that have not started yet are dropped from the pool queue
+        for task in tasks:
+            task.cancel()
+
+
+def join_pages(pages: list[str]) -> str:
+    return PAGE_SEPARATOR.join(pages)
@@ -162,4 +162,14 @@ Root
 Return ONLY CTM text. No explanations, no markdown blocks.
 
 **Remember**: Depth = Value. A detailed tree teaches; a shallow tree just lists.
-"""
\ No newline at end of file
+"""
+
+mindmap_generate_section = mindmap_generate + """
+# SECTION MODE
+
+The input is ONE PART of a longer document that is being mapped part by part.
+The parts are merged afterwards under a shared root, so:
+- The root node is a short, specific title for THIS part (not the whole document)
+- Cover only what is in this part; do not invent context from other parts
+- Keep the same depth and detail rules as above
+"""
@@ -1,65 +1,165 @@
-from fastapi import APIRouter, UploadFile
+from typing import AsyncGenerator, Callable
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
-from routers.mindmap.dto import MindmapRequest, LLMConfig, LLMType
+from config.Setttings import settings
+from core.event_stream import EventEncoder, encode_events, select_encoder
+from core.hedging import hedger
+from core.llm import llm_pool
+from core.metrics import track_stream
+from core.scheduler import scheduler
+from routers.mindmap.batch import BatchItem, batch_manager
+from routers.mindmap.cache import result_cache
+from routers.mindmap.ctm_repair import repair_stats
+from routers.mindmap.dto import (
+    MindmapRequest, LLMConfig, LLMType, BatchRequest, EventFormat, OutputFormat, OutputOptions, StreamEvent
+)
+from routers.mindmap.jobs import GenerationJob, job_manager
+from routers.mindmap.semantic_cache import semantic_cache
 from routers.mindmap.service import (
     generate_mindmap_from_text, generate_mindmap_from_file, generate_mindmap_from_web_url,
-    extract_text_from_pdf
+    open_pdf, generation_flights
 )
+from routers.mindmap.upload import receive_pdf_upload, receive_form
+from routers.mindmap.web_extraction import web_page_cache
 
 router = APIRouter()
 
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache, no-transform",  # no-transform: proxies must not compress (buffer) the stream
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"  # Disable nginx buffering
+}
+
+
+def event_encoder(
+    accept: str | None = Header(default=None),
+    event_format: EventFormat | None = None
+) -> EventEncoder:
+    """SSE when asked for (``event_format=sse`` or ``Accept: text/event-stream``), NDJSON otherwise."""
+    return select_encoder(
+        accept,
+        event_format.value if event_format is not None else None,
+        settings.stream_sse_retry_ms
+    )
+
+
+def _event_response(
+    events: AsyncGenerator[StreamEvent, None],
+    encoder: EventEncoder,
+    endpoint: str,
+    job_id: str
+) -> StreamingResponse:
+    return StreamingResponse(
+        encode_events(track_stream(events, endpoint), encoder, settings.stream_heartbeat_seconds),
+        media_type=encoder.media_type,
+        headers={**STREAM_HEADERS, "X-Job-Id": job_id}
+    )
+
+
+def output_options(output_format: OutputFormat = OutputFormat.CTM, tree_encodings: str = "") -> OutputOptions:
+    """Output options of the query-string endpoints; ``tree_encodings`` is comma-separated."""
+    return OutputOptions(
+        format=output_format,
+        encodings=[e.strip() for e in tree_encodings.split(",") if e.strip()]
+    )
+
+
+async def _stream_job(
+    events: AsyncGenerator[StreamEvent, None],
+    encoder: EventEncoder,
+    endpoint: str,
+    on_finish: Callable[[], None] | None = None
+) -> StreamingResponse:
+    """Start ``events`` as a detached job and stream it; the job id is sent as ``X-Job-Id``."""
+    job: GenerationJob = await job_manager.start(events, on_finish)
+    return _event_response(job_manager.stream(job), encoder, endpoint, job.id)
+
 
 @router.post("/generate/stream")
-async def generate_mindmap_text(request: MindmapRequest):
+async def generate_mindmap_text(request: MindmapRequest, encoder: EventEncoder = Depends(event_encoder)):
     """
     Generate mindmap from text with streaming status updates.
 
-    Returns Server-Sent Events with status updates:
+    Streams NDJSON, or Server-Sent Events with ``event_format=sse`` or
+    ``Accept: text/event-stream``. Quiet periods are filled with heartbeats
+    (blank lines / SSE comments). Status updates:
+    - QUEUED: Waiting for a free slot of the LLM backend
     - PROCESSING: LLM is generating
     - VALIDATING: Checking CTM format
     - RETRY: Validation failed, retrying
     - SUCCESS: Mindmap generated successfully
     - ERROR: Failed after all retries
 
+    With ``output.format = "tree"`` the SUCCESS event carries the parsed tree
+    (parallel arrays, see tree_format) instead of CTM text, compressed with
+    the first of ``output.encodings`` the server supports (zstd, gzip).
+
+    Every event carries an increasing ``id``. The generation keeps running if
+    the client disconnects; resume it with ``GET /jobs/{X-Job-Id}/stream``.
+
     Example response stream:
     ```
-    {"status": "PROCESSING", "message": "Đang tạo mindmap...", "data": {...}}
-    {"status": "VALIDATING", "message": "Đang kiểm tra...", "data": {...}}
-    {"status": "SUCCESS", "message": "Thành công!", "data": {"ctm": "..."}}
+    {"id": 1, "status": "PROCESSING", "message": "Đang tạo mindmap...", "data": {...}}
+    {"id": 2, "status": "VALIDATING", "message": "Đang kiểm tra...", "data": {...}}
+    {"id": 3, "status": "SUCCESS", "message": "Thành công!", "data": {"ctm": "..."}}
     ```
     """
-    return StreamingResponse(
-        generate_mindmap_from_text(request.text, request.llm_config),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"  # Disable nginx buffering
-        }
+    return await _stream_job(
+        generate_mindmap_from_text(request.text, request.llm_config, request.output),
+        encoder,
+        "text"
     )
 
 
-@router.post("/file/generate/stream")
+@router.post(
+    "/file/generate/stream",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"]
+                    }
+                }
+            }
+        }
+    }
+)
 async def generate_mindmap_file(
-    file: UploadFile,
+    request: Request,
     llm_type: LLMType = LLMType.OLLAMA,
-    api_key: str | None = None
+    api_key: str | None = None,
+    hedge: bool = False,
+    output: OutputOptions = Depends(output_options),
+    encoder: EventEncoder = Depends(event_encoder)
 ):
-    # Process file BEFORE streaming to handle errors properly
-    contents = await file.read()
-    text = extract_text_from_pdf(contents)
-    
-    llm_config = LLMConfig(llm_type=llm_type, api_key=api_key)
-    
-    return StreamingResponse(
-        generate_mindmap_from_file(text, file.filename or "file.pdf", llm_config),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
+    llm_config = LLMConfig(llm_type=llm_type, api_key=api_key, hedge=hedge)
+
+    # The body is read here (not by FastAPI) so the size limit is enforced
+    # while it arrives and the file is spooled instead of held in memory
+    upload = await receive_pdf_upload(request)
+    try:
+        # Check the file BEFORE streaming to handle errors properly; the text itself
+        # is extracted by the PDF process pool while the stream reports progress
+        page_count = await open_pdf(upload.source())
+    except Exception:
+        upload.close()
+        raise
+
+    return await _stream_job(
+        generate_mindmap_from_file(upload.source(), page_count, upload.filename or "file.pdf", llm_config, output),
+        encoder,
+        "file",
+        # Remove the spooled file once the job is done
+        on_finish=upload.close
     )
 
 
@@ -67,15 +167,166 @@ async def generate_mindmap_file(
 async def generate_mindmap_web(
     site_url: str,
     llm_type: LLMType = LLMType.OLLAMA,
-    api_key: str | None = None
+    api_key: str | None = None,
+    hedge: bool = False,
+    output: OutputOptions = Depends(output_options),
+    encoder: EventEncoder = Depends(event_encoder)
 ):
-    llm_config = LLMConfig(llm_type=llm_type, api_key=api_key)
-    return StreamingResponse(
-        generate_mindmap_from_web_url(site_url, llm_config),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
+    llm_config = LLMConfig(llm_type=llm_type, api_key=api_key, hedge=hedge)
+    return await _stream_job(generate_mindmap_from_web_url(site_url, llm_config, output), encoder, "web")
+
+
+@router.get("/jobs/{job_id}/stream")
+async def resume_job_stream(
+    job_id: str,
+    cursor: int | None = None,
+    last_event_id: int | None = Header(default=None),
+    encoder: EventEncoder = Depends(event_encoder)
+):
+    """
+    Reattach to a generation job.
+
+    Streams the events after ``cursor`` (or the ``Last-Event-ID`` header),
+    then the live ones. Events that already left the job's buffer are
+    skipped; once the job has left memory only its final event is available.
+    A GET endpoint, so ``EventSource`` can use it directly and resume on its own.
+    """
+    after = cursor if cursor is not None else last_event_id or 0
+    events = await job_manager.reattach(job_id, after)
+    if events is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return _event_response(events, encoder, "resume", job_id)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a generation job."""
+    summary = await job_manager.status(job_id)
+    if summary is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return summary
+
+
+@router.post(
+    "/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": BatchRequest.model_json_schema()},
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "texts": {"type": "array", "items": {"type": "string"}},
+                            "urls": {"type": "array", "items": {"type": "string"}},
+                            "files": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                        }
+                    }
+                }
+            }
         }
+    }
+)
+async def submit_batch(
+    request: Request,
+    llm_type: LLMType = LLMType.OLLAMA,
+    api_key: str | None = None,
+    hedge: bool = False
+):
+    """
+    Submit many documents at once and get a job id back.
+
+    Accepts a JSON body (texts, urls, llm_config) or a multipart form with
+    repeated ``texts``, ``urls`` and ``files`` (PDF) fields. Poll
+    ``GET /batch/{job_id}`` and download results from
+    ``GET /batch/{job_id}/results`` (NDJSON, one line per finished item).
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await receive_form(
+            request,
+            "files",
+            max_files=settings.batch_max_items,
+            max_total_bytes=settings.batch_max_upload_mb * 1024 * 1024
+        )
+        texts, urls, files = form.fields.get("texts", []), form.fields.get("urls", []), form.files
+        llm_config = LLMConfig(llm_type=llm_type, api_key=api_key, hedge=hedge)
+    else:
+        try:
+            body = BatchRequest.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False))
+        texts, urls, files = body.texts, body.urls, []
+        llm_config = body.llm_config
+
+    items = [BatchItem(0, "text", text) for text in texts if text.strip()]
+    items += [BatchItem(0, "url", url.strip()) for url in urls if url.strip()]
+    items += [BatchItem(0, "file", spool) for spool in files]
+    if not items or len(items) > settings.batch_max_items:
+        for item in items:
+            item.release()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch needs between 1 and {settings.batch_max_items} items"
+        )
+    for index, item in enumerate(items):
+        item.index = index
+
+    job = batch_manager.submit(items, llm_config)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total": len(items),
+        "status_url": f"{request.url.path}/{job.id}",
+        "results_url": f"{request.url.path}/{job.id}/results"
+    }
+
+
+def _get_job(job_id: str):
+    job = batch_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found")
+    return job
+
+
+@router.get("/batch/{job_id}")
+async def get_batch(job_id: str):
+    """Job status with per-item progress and errors."""
+    return _get_job(job_id).summary()
+
+
+@router.get("/batch/{job_id}/results")
+async def get_batch_results(job_id: str):
+    """Finished items as NDJSON, in submission order."""
+    job = _get_job(job_id)
+    finished = [item for item in job.items if item.finished_at is not None]
+    return StreamingResponse(
+        (orjson.dumps(item.record(), option=orjson.OPT_APPEND_NEWLINE) for item in finished),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Status": job.status}
     )
+
+
+@router.delete("/batch/{job_id}")
+async def cancel_batch(job_id: str):
+    """Cancel the remaining items of a job."""
+    _get_job(job_id)
+    return batch_manager.cancel(job_id).summary()
+
+
+@router.get("/stats")
+async def get_stats():
+    """Runtime counters of the mindmap pipeline (cache hits/misses, ...)."""
+    return {
+        "result_cache": result_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "repair": repair_stats.stats(),
+        "web_cache": web_page_cache.stats(),
+        "llm_pool": llm_pool.stats(),
+        "scheduler": scheduler.stats(),
+        "hedging": hedger.stats(),
+        "in_flight": generation_flights.stats(),
+        "batch": batch_manager.stats(),
+        "jobs": job_manager.stats()
+    }
@@ -0,0 +1,186 @@
+"""
+Semantic cache of generated mindmaps.
+
+The result cache only matches inputs that are identical after normalization,
+so it misses near-duplicates: the same article under another URL, or a PDF
+re-exported with a different header. Here the normalized input is embedded
+with ``ollama_embedding_model`` and looked up in an in-process vector index;
+the stored CTM of a neighbour at or above ``semantic_cache_threshold``
+cosine similarity, and of a similar length, is reused.
+
+Entries are compared only within a cache namespace (backend/model and
+prompt), are bounded by ``semantic_cache_max_entries`` with LRU replacement
+and are persisted to ``semantic_cache_path``.
+"""
+
+import asyncio
+import os
+import time
+from typing import TypedDict
+
+from config.Setttings import settings
+from core import metrics
+from core.llm import get_embeddings
+from core.vector_index import VectorIndex
+from routers.mindmap.cache import CachedMindmap, cache_namespace, normalize_input
+from routers.mindmap.dto import LLMConfig
+
+
+class SemanticMatch(TypedDict):
+    key: str  # Result cache key of the matched input
+    similarity: float
+    result: CachedMindmap
+
+
+def embedding_text(content: str) -> str:
+    """Normalized input, cut to its head and tail when longer than the embedding budget."""
+    content = normalize_input(content)
+    limit = settings.semantic_cache_embed_max_chars
+    if limit <= 0 or len(content) <= limit:
+        return content
+    half = limit // 2
+    return f"{content[:half]} {content[-half:]}"
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of validated CTM results, keyed by input embeddings."""
+
+    def __init__(self):
+        self.index = VectorIndex(settings.semantic_cache_max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.last_error: str | None = None
+        # Sum of the best similarity per lookup result, for averages
+        self.similarity_sums = {"hit": 0.0, "miss": 0.0}
+        self.searched_misses = 0  # misses that had a neighbour to compare with
+        self.dirty = False
+        self.last_saved: float | None = None  # wall clock
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            settings.mindmap_cache_enabled
+            and settings.semantic_cache_enabled
+            and bool(settings.ollama_embedding_model)
+        )
+
+    async def embed(self, content: str) -> list[float] | None:
+        """Embedding of an input, or None when the embedding model fails (the lookup is skipped)."""
+        embeddings = get_embeddings()
+        if embeddings is None:
+            return None
+        try:
+            with metrics.stage("embed"):
+                return await asyncio.wait_for(
+                    embeddings.aembed_query(embedding_text(content)),
+                    settings.semantic_cache_embed_timeout_seconds
+                )
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            return None
+
+    def lookup(self, vector: list[float], length: int, llm_config: LLMConfig | None = None) -> SemanticMatch | None:
+        """
+        Find a stored result for a near-duplicate input.
+
+        Args:
+            vector: Embedding of the input
+            length: Length of the normalized input
+            llm_config: LLM configuration, results are only shared within its namespace
+
+        Returns:
+            The closest match above the threshold, or None
+        """
+        candidates = self.index.search(vector, cache_namespace(llm_config), k=4)
+        match = None
+        for key, similarity in candidates:
+            if similarity < settings.semantic_cache_threshold:
+                break
+            entry = self.index.payload(key)
+            # Similar topic but much shorter or longer (e.g. one chapter of a book) is a different map
+            if entry is not None and _length_ratio(length, entry["length"]) >= settings.semantic_cache_min_length_ratio:
+                match = {"key": key, "similarity": similarity, "result": entry["result"]}
+                break
+
+        if match is not None:
+            self.hits += 1
+            self.similarity_sums["hit"] += match["similarity"]
+            self.index.touch(match["key"])
+            metrics.semantic_similarity.observe(match["similarity"], result="hit")
+        else:
+            self.misses += 1
+            if candidates:
+                self.searched_misses += 1
+                self.similarity_sums["miss"] += candidates[0][1]
+                metrics.semantic_similarity.observe(candidates[0][1], result="miss")
+        metrics.cache_requests.inc(cache="semantic", result="hit" if match is not None else "miss")
+        return match
+
+    async def store(
+        self,
+        key: str,
+        vector: list[float],
+        length: int,
+        result: CachedMindmap,
+        llm_config: LLMConfig | None = None
+    ) -> None:
+        """Remember a validated result; saves to disk at most once per save interval."""
+        self.index.add(key, vector, cache_namespace(llm_config), {"length": length, "result": result})
+        self.dirty = True
+        interval = settings.semantic_cache_save_interval_seconds
+        if self.last_saved is None or time.time() - self.last_saved >= interval:
+            await self.save()
+
+    async def load(self) -> None:
+        """Load the persisted index, if any."""
+        path = settings.semantic_cache_path
+        if not self.enabled or not path or not os.path.exists(path):
+            return
+        try:
+            await asyncio.to_thread(self.index.load, path)
+        except (OSError, ValueError, KeyError) as e:
+            # A corrupt or foreign file only costs the cached entries
+            self.errors += 1
+            self.last_error = f"Could not load {path}: {e}"
+        self.last_saved = time.time()
+
+    async def save(self) -> None:
+        path = settings.semantic_cache_path
+        if not self.dirty or not path:
+            return
+        self.dirty = False
+        self.last_saved = time.time()
+        try:
+            await asyncio.to_thread(self.index.save, path)
+        except OSError as e:
+            self.dirty = True
+            self.errors += 1
+            self.last_error = f"Could not save {path}: {e}"
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "model": settings.ollama_embedding_model or None,
+            "threshold": settings.semantic_cache_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "avg_hit_similarity": round(self.similarity_sums["hit"] / self.hits, 4) if self.hits else None,
+            "avg_miss_similarity": (
+                round(self.similarity_sums["miss"] / self.searched_misses, 4) if self.searched_misses else None
+            ),
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_saved": self.last_saved,
+            "index": self.index.stats()
+        }
+
+
+def _length_ratio(a: int, b: int) -> float:
+    return min(a, b) / max(a, b) if max(a, b) else 1.0
+
+
+semantic_cache = SemanticCache()
@@ -1,32 +1,67 @@
 import asyncio
-import json
-from functools import partial
-from io import BytesIO
+import hashlib
+import time
+from pathlib import Path
 from typing import AsyncGenerator
 
-import trafilatura
-from fastapi import UploadFile, HTTPException, status
+from fastapi import HTTPException, status
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from pypdf import PdfReader
 
 from config.Setttings import settings
-from core.llm import get_llm
-from routers.mindmap.ctm_validator import validate_ctm
-from routers.mindmap.dto import StreamStatus, StreamEvent, LLMConfig
-from routers.mindmap.prompt import mindmap_generate
+from core.http_client import fetch_url, FetchError
+from core.hedging import BackendBusy, hedger
+from core.llm import get_llm, hedge_alternate, llm_backend
+from core import metrics
+from core.scheduler import scheduler, QueueFullError, Ticket
+from core.singleflight import SingleFlight
+from routers.mindmap.cache import cache_key, normalize_input, result_cache
+from routers.mindmap.chunking import split_into_chunks, merge_subtrees, document_title
+from routers.mindmap.ctm_repair import repair_ctm, CTMLineRepairer
+from routers.mindmap.ctm_validator import validate_ctm, parse_ctm, IncrementalCTMValidator, CTMTree
+from routers.mindmap.dto import StreamStatus, StreamEvent, LLMConfig, OutputOptions
+from routers.mindmap.input_compression import compress_input
+from routers.mindmap.pdf_extraction import count_pdf_pages, extract_pdf_pages, join_pages
+from routers.mindmap.prompt import mindmap_generate, mindmap_generate_section
+from routers.mindmap.semantic_cache import semantic_cache
+from routers.mindmap.tree_format import encode_nodes, shape_event
+from routers.mindmap.web_extraction import extract_web_content, web_page_cache
 
+# Running generations by flight_key, shared by identical requests
+generation_flights: SingleFlight[StreamEvent] = SingleFlight()
 
-async def generate_mindmap_from_text(message: str, llm_config: LLMConfig | None = None) -> AsyncGenerator[str, None]:
+
+def flight_key(key: str, llm_config: LLMConfig | None = None) -> str:
+    """
+    Key of a running generation: the result cache key plus a hash of the API key.
+
+    Results are shared between users, but a run is only joined by requests
+    with the same credentials, so an invalid or exhausted key never fails
+    another user's request.
+    """
+    api_key = llm_config.api_key if llm_config is not None else None
+    if not api_key:
+        return key
+    return f"{key}:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]}"
+
+
+async def generate_mindmap_from_text(
+    message: str,
+    llm_config: LLMConfig | None = None,
+    output: OutputOptions | None = None,
+    background: bool = False
+) -> AsyncGenerator[StreamEvent, None]:
     """
     Generate mindmap from text with streaming status updates.
 
-    Yields JSON events with detailed status for each processing step.
+    Yields events with detailed status for each processing step.
 
     Args:
         message: The input text to generate mindmap from
+        output: Format of the SUCCESS event (raw CTM by default)
+        background: Batch work: waits behind interactive requests instead of being rejected
 
     Yields:
-        JSON string events with status, message, and optional data
+        Event dicts with status, message, and optional data (encoded by the router)
     """
     # Emit preparing status
     yield create_event(
@@ -35,24 +70,23 @@ async def generate_mindmap_from_text(message: str, llm_config: LLMConfig | None
         {"text_length": len(message)}
     )
     
-    async for event in generate_mindmap(message, llm_config):
+    async for event in generate_mindmap(message, llm_config, output=output, background=background):
         yield event
 
 
-def extract_text_from_pdf(contents: bytes) -> str:
-    """Extract text from PDF bytes. Raises HTTPException on error."""
-    if len(contents) > 10 * 1024 * 1024:  # 10 MB:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="File too large. Max size is 10 MB"
-        )
+async def open_pdf(source: bytes | str) -> int:
+    """
+    Check an uploaded PDF before streaming starts, without blocking the event loop.
+
+    Args:
+        source: PDF bytes or the path of a spooled upload
+
+    Returns:
+        Number of pages. Raises HTTPException when the file is unreadable.
+    """
     try:
-        pdf_file = BytesIO(contents)
-        reader = PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
+        with metrics.stage("pdf_open"):
+            return await count_pdf_pages(source)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -60,31 +94,78 @@ def extract_text_from_pdf(contents: bytes) -> str:
         )
 
 
-async def generate_mindmap_from_file(text: str, filename: str = "file.pdf", llm_config: LLMConfig | None = None) -> AsyncGenerator[str, None]:
+async def generate_mindmap_from_file(
+    source: bytes | str,
+    page_count: int,
+    filename: str = "file.pdf",
+    llm_config: LLMConfig | None = None,
+    output: OutputOptions | None = None,
+    background: bool = False
+) -> AsyncGenerator[StreamEvent, None]:
     """
-    Generate mindmap from pre-extracted text with detailed status updates.
-    
+    Generate mindmap from a PDF with detailed status updates.
+
+    Pages are extracted in parallel by the PDF process pool.
+
     Args:
-        text: Pre-extracted text content from file
+        source: PDF bytes or spooled upload path (already checked by open_pdf)
+        page_count: Number of pages reported by open_pdf
         filename: Original filename for display purposes
+        output: Format of the SUCCESS event (raw CTM by default)
+        background: Batch work (see generate_mindmap_from_text)
     """
-    # Emit extracting text status (file already read by router)
+    pages: list[str] = [""] * page_count
+    pages_done = 0
+    started = time.perf_counter()
+    try:
+        async for start, texts in extract_pdf_pages(source, page_count):
+            pages[start:start + len(texts)] = texts
+            pages_done += len(texts)
+
+            # Emit page-level extraction progress
+            yield create_event(
+                StreamStatus.EXTRACTING_TEXT,
+                f"Đang trích xuất văn bản từ {filename}... ({pages_done}/{page_count} trang)",
+                {"filename": filename, "pages_done": pages_done, "page_count": page_count}
+            )
+    except (asyncio.CancelledError, GeneratorExit):
+        # Nobody is waiting anymore; ranges not started yet are dropped from the pool
+        metrics.record_cancellation("pdf_extract", time.perf_counter() - started)
+        raise
+    except Exception as e:
+        yield create_event(
+            StreamStatus.ERROR,
+            f"Không thể trích xuất văn bản từ {filename}.",
+            {"filename": filename, "error": str(e)}
+        )
+        return
+
+    metrics.stage_duration.observe(time.perf_counter() - started, stage="pdf_extract")
+    text = join_pages(pages)
     yield create_event(
         StreamStatus.EXTRACTING_TEXT,
         f"Đã trích xuất văn bản từ {filename}...",
-        {"text_length": len(text), "filename": filename}
+        {"text_length": len(text), "filename": filename, "page_count": page_count}
     )
-    
-    async for event in generate_mindmap(text, llm_config):
+
+    async for event in generate_mindmap(
+        text, llm_config, title=Path(filename).stem, output=output, background=background
+    ):
         yield event
 
 
-async def generate_mindmap_from_web_url(site_url: str, llm_config: LLMConfig | None = None) -> AsyncGenerator[str, None]:
+async def generate_mindmap_from_web_url(
+    site_url: str,
+    llm_config: LLMConfig | None = None,
+    output: OutputOptions | None = None,
+    background: bool = False
+) -> AsyncGenerator[StreamEvent, None]:
     """
     Generate mindmap from web URL with detailed status updates.
     
     Args:
         site_url: URL of the web page to extract content from
+        background: Batch work (see generate_mindmap_from_text)
     """
     # Emit loading web status
     yield create_event(
@@ -93,35 +174,47 @@ async def generate_mindmap_from_web_url(site_url: str, llm_config: LLMConfig | N
         {"url": site_url}
     )
     
-    # Run blocking fetch_url in thread executor to avoid blocking event loop
-    loop = asyncio.get_event_loop()
-    downloaded = await loop.run_in_executor(None, trafilatura.fetch_url, site_url)
-    
-    if not downloaded:
+    # Revalidate a cached extraction instead of downloading it again
+    cached_page = web_page_cache.lookup(site_url)
+
+    # Download through the shared, pooled async HTTP client
+    try:
+        with metrics.stage("fetch"):
+            response = await fetch_url(site_url, web_page_cache.conditional_headers(cached_page))
+        not_modified = cached_page is not None and response["status_code"] == 304
+        downloaded = response["content"]
+        fetch_error = None if downloaded or not_modified else "Empty response"
+    except FetchError as e:
+        downloaded, fetch_error = None, str(e)
+
+    if fetch_error is not None:
         yield create_event(
             StreamStatus.ERROR,
             f"Không thể tải trang web: {site_url}",
-            {"url": site_url}
+            {"url": site_url, "error": fetch_error}
         )
         return
-    
+
+    content = None
+    if cached_page is not None:
+        content = web_page_cache.reuse(site_url, cached_page, None if not_modified else downloaded)
+    if settings.web_cache_enabled:
+        metrics.cache_requests.inc(cache="web", result="hit" if content is not None else "miss")
+
     # Emit extracting text status
     yield create_event(
         StreamStatus.EXTRACTING_TEXT,
         "Đang trích xuất nội dung từ trang web...",
-        {"url": site_url}
-    )
-    
-    # Run blocking extract in thread executor
-    extract_func = partial(
-        trafilatura.extract,
-        downloaded,
-        output_format="markdown",
-        include_tables=True,
-        include_images=False
+        {"url": site_url, "cached": content is not None}
     )
-    content = await loop.run_in_executor(None, extract_func)
-    
+
+    if content is None:
+        # Run blocking extract in the dedicated extraction pool
+        with metrics.stage("extract"):
+            content = await extract_web_content(downloaded, site_url)
+        if content:
+            web_page_cache.store(site_url, response["headers"], downloaded, content)
+
     if not content:
         yield create_event(
             StreamStatus.ERROR,
@@ -129,20 +222,205 @@ async def generate_mindmap_from_web_url(site_url: str, llm_config: LLMConfig | N
             {"url": site_url}
         )
         return
-    
-    async for event in generate_mindmap(content, llm_config):
+
+    async for event in generate_mindmap(content, llm_config, output=output, background=background):
         yield event
 
 
 # Helper function
-async def generate_mindmap(content: str, llm_config: LLMConfig | None = None) -> AsyncGenerator[str, None]:
+async def generate_mindmap(
+    content: str,
+    llm_config: LLMConfig | None = None,
+    title: str | None = None,
+    output: OutputOptions | None = None,
+    background: bool = False
+) -> AsyncGenerator[StreamEvent, None]:
+    # Serve repeated inputs straight from the result cache
+    key = cache_key(content, llm_config)
+    metrics.input_chars.observe(len(content))
+    cached = await result_cache.get(key)
+    if settings.mindmap_cache_enabled:
+        metrics.cache_requests.inc(cache="result", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        metrics.generations.inc(outcome="cached")
+        yield shape_event(create_event(
+            StreamStatus.SUCCESS,
+            "Tạo mindmap thành công!",
+            {
+                "ctm": cached["ctm"],
+                "attempts_used": 0,
+                "validation_message": cached["validation_message"],
+                "cached": True
+            }
+        ), output)
+        return
+
+    # Identical in-flight requests attach to one shared generation
+    flight = flight_key(key, llm_config)
+    if background:
+        # An interactive request must not wait in the background queue by joining a batch run
+        flight += ":background"
+    running = generation_flights.is_running(flight)
+    vector = None
+    if not running and semantic_cache.enabled:
+        # Near-duplicate of an earlier input (other URL, re-exported PDF...)
+        length = len(normalize_input(content))
+        vector = await semantic_cache.embed(content)
+        match = semantic_cache.lookup(vector, length, llm_config) if vector is not None else None
+        if match is not None:
+            metrics.generations.inc(outcome="cached")
+            # Exact repeats of this input skip the embedding from now on
+            await result_cache.set(key, match["result"])
+            yield shape_event(create_event(
+                StreamStatus.SUCCESS,
+                "Tạo mindmap thành công!",
+                {
+                    "ctm": match["result"]["ctm"],
+                    "attempts_used": 0,
+                    "validation_message": match["result"]["validation_message"],
+                    "cached": True,
+                    "semantic_similarity": round(match["similarity"], 4)
+                }
+            ), output)
+            return
+
+    if running:
+        metrics.coalesced.inc()
+    elif not background:
+        # Only a request that starts a new generation needs a place in the queue;
+        # fail before compressing the input when there is none
+        try:
+            scheduler.for_config(llm_config).check_admission()
+        except QueueFullError as e:
+            yield shape_event(_overloaded_event(e), output)
+            return
+
+    def start_generation() -> AsyncGenerator[StreamEvent, None]:
+        generation = generate_mindmap_scheduled(content, llm_config, key, title, background)
+        if vector is None:
+            return generation
+        return remember_semantic(generation, key, vector, length, llm_config)
+
+    async for event in generation_flights.subscribe(flight, start_generation):
+        # Shared events are shaped per subscriber, each may want another format
+        yield shape_event(event, output)
+
+
+async def remember_semantic(
+    events: AsyncGenerator[StreamEvent, None],
+    key: str,
+    vector: list[float],
+    length: int,
+    llm_config: LLMConfig | None
+) -> AsyncGenerator[StreamEvent, None]:
+    """Pass a generation through, adding its validated result to the semantic cache."""
+    async for event in events:
+        # Partial long-document maps (failed chunks) are not remembered
+        if event["status"] == StreamStatus.SUCCESS.value and not event["data"].get("failed_chunks"):
+            data = event["data"]
+            await semantic_cache.store(
+                key,
+                vector,
+                length,
+                {"ctm": data["ctm"], "validation_message": data["validation_message"]},
+                llm_config
+            )
+        yield event
+
+
+async def generate_mindmap_scheduled(
+    content: str,
+    llm_config: LLMConfig | None,
+    key: str,
+    title: str | None = None,
+    background: bool = False
+) -> AsyncGenerator[StreamEvent, None]:
+    """
+    Compress the input, wait for a backend slot, then run the single-call or map-reduce generation.
+
+    Background generations wait in the backend's background queue, which is never full.
+    """
+    compression = None
+    if settings.input_compression_enabled:
+        # Drop boilerplate and repeated passages before they cost prompt tokens
+        with metrics.stage("compress"):
+            content, compression = await compress_input(content)
+        metrics.input_tokens_removed.inc(compression["removed_boilerplate"], step="boilerplate")
+        metrics.input_tokens_removed.inc(compression["removed_duplicates"], step="duplicates")
+        metrics.input_tokens_removed.inc(compression["removed_for_budget"], step="budget")
+        yield create_event(
+            StreamStatus.PREPARING,
+            f"Đã rút gọn nội dung: bỏ {compression['tokens_removed']}/{compression['tokens_before']} token.",
+            {"compression": compression}
+        )
+
+    # Wait for a free slot of the backend, reporting the queue position
+    ticket = scheduler.for_config(llm_config).ticket(background)
+    try:
+        try:
+            async for position, estimated_wait in ticket.wait():
+                yield create_event(
+                    StreamStatus.QUEUED,
+                    f"Hệ thống đang bận, đang chờ đến lượt... (vị trí {position})",
+                    {"position": position, "estimated_wait_seconds": round(estimated_wait)}
+                )
+        except QueueFullError as e:
+            yield _overloaded_event(e)
+            return
+
+        # Inputs larger than one context window go through map-reduce
+        if 0 < settings.mindmap_long_document_threshold_chars < len(content):
+            generation = generate_mindmap_map_reduce(content, llm_config, key, title)
+        else:
+            generation = generate_mindmap_single(content, llm_config, key)
+        async for event in generation:
+            if compression is not None and event["status"] == StreamStatus.SUCCESS.value:
+                event["data"]["compression"] = compression
+            yield event
+    finally:
+        if ticket.state == "queued":
+            # Nobody waits for the result anymore: give the place in the queue up
+            metrics.record_cancellation("queued")
+        # Leaves the queue or frees the slot, also when the client disconnects
+        ticket.release()
+
+
+async def generate_mindmap_single(
+    content: str,
+    llm_config: LLMConfig | None,
+    key: str
+) -> AsyncGenerator[StreamEvent, None]:
+    """
+    Generate a mindmap with one LLM call per attempt, retrying on invalid CTM.
+
+    With progressive nodes, completed lines of the streamed output are sent as
+    NODES events; a RETRY rolls them back (``nodes_discarded``) and SUCCESS
+    tells whether they match the validated map (``nodes_confirmed``). Hedged
+    requests race whole answers of both backends instead (see invoke_llm).
+
+    Args:
+        content: Input text
+        llm_config: LLM configuration
+        key: Result cache key of the input
+    """
     max_retry = settings.mindmap_generate_max_retry
+    progressive = settings.mindmap_progressive_nodes
+    backend = llm_backend(llm_config)
+    alternate = hedge_alternate(llm_config)
+    # Progressive nodes need the streamed output; hedging races whole answers
+    stream_mode = (settings.mindmap_stream_llm or progressive) and alternate is None
+    nodes_interval = settings.mindmap_nodes_interval_ms / 1000
+    started = time.perf_counter()
+    first_node_sent = False
     retry_cnt = max_retry
     attempt = 1
     messages = [
         SystemMessage(mindmap_generate),
         HumanMessage(content)
     ]
+    # (elapsed seconds, characters received) of attempts aborted mid-stream
+    aborted_attempts: list[tuple[float, int]] = []
+    answered_by = backend
 
     # Initialize correct LLM based on config
     llm = get_llm(llm_config)
@@ -155,43 +433,122 @@ async def generate_mindmap(content: str, llm_config: LLMConfig | None = None) ->
             {"attempt": attempt, "max_retries": max_retry}
         )
 
-        # Invoke LLM asynchronously to avoid blocking event loop
-        response = (await llm.ainvoke(messages)).content
+        # Nodes of this attempt already sent in NODES events
+        nodes_sent = 0
+        if stream_mode:
+            # Stream tokens and stop at the first invalid line
+            validator = IncrementalCTMValidator()
+            parts: list[str] = []
+            attempt_started = time.perf_counter()
+            last_batch = 0.0
 
-        # Emit VALIDATING status
-        yield create_event(
-            StreamStatus.VALIDATING,
-            "Đang kiểm tra định dạng CTM...",
-            {"attempt": attempt}
-        )
+            def next_batch() -> StreamEvent:
+                nonlocal nodes_sent, last_batch, first_node_sent
+                now = time.perf_counter()
+                if not first_node_sent:
+                    first_node_sent = True
+                    metrics.time_to_first_node.observe(now - started)
+                event = _nodes_event(validator.tree, nodes_sent, attempt)
+                nodes_sent, last_batch = len(validator.tree), now
+                return event
 
-        # Validate response
-        validate_result = validate_ctm(response)
+            try:
+                with metrics.stage("llm_invoke"), hedger.track(backend) as call:
+                    async for text in stream_llm_response(llm, messages, validator):
+                        parts.append(text)
+                        # The first nodes go out at once, later ones at most once per interval
+                        if progressive and len(validator.tree) > nodes_sent and (
+                            not nodes_sent or time.perf_counter() - last_batch >= nodes_interval
+                        ):
+                            yield next_batch()
+                    # An aborted stream says nothing about the backend's latency
+                    call.complete = validator.error is None
+            except Exception as e:
+                # hedger.track has recorded the failure on the backend
+                metrics.generations.inc(outcome="error")
+                yield _backend_error_event(e, [backend], attempt, nodes_sent, aborted_attempts, stream_mode)
+                return
+            response = "".join(parts)
+            stream_error, elapsed = validator.error, time.perf_counter() - attempt_started
+            if progressive and stream_error is None and len(validator.tree) > nodes_sent:
+                # Lines completed after the last batch, including the final one
+                yield next_batch()
+        else:
+            try:
+                with metrics.stage("llm_invoke"):
+                    answered_by, response = await invoke_llm(messages, llm_config, alternate)
+            except Exception as e:
+                metrics.generations.inc(outcome="error")
+                backends = [backend] + ([llm_backend(alternate)] if alternate is not None else [])
+                yield _backend_error_event(e, backends, attempt, nodes_sent, aborted_attempts, stream_mode)
+                return
+            stream_error = None
+
+        if stream_error is not None:
+            # Aborted mid-stream, the full validation would fail anyway
+            aborted_attempts.append((elapsed, len(response)))
+            validate_result = {"is_valid": False, "message": stream_error, "error_code": validator.error_code}
+        else:
+            # Emit VALIDATING status
+            yield create_event(
+                StreamStatus.VALIDATING,
+                "Đang kiểm tra định dạng CTM...",
+                {"attempt": attempt}
+            )
+
+            # Validate response
+            with metrics.stage("validate"):
+                validate_result = parse_ctm(response)
+
+        repair_fixes = []
+        if not validate_result["is_valid"] and stream_error is None and settings.mindmap_auto_repair:
+            # Try cheap deterministic fixes before spending an LLM retry
+            repaired = repair_ctm(response)
+            if repaired is not None:
+                response = repaired["ctm"]
+                repair_fixes = repaired["fixes"]
+                validate_result = {"is_valid": True, "message": repaired["validation_message"]}
+                metrics.repairs.inc()
 
         if validate_result["is_valid"]:
+            progress = {}
+            if nodes_sent:
+                # The client keeps the streamed nodes only if they match the validated map
+                final_tree = validate_result.get("tree") or parse_ctm(response)["tree"]
+                progress = {
+                    "nodes_streamed": nodes_sent,
+                    "nodes_confirmed": _same_nodes(validator.tree, final_tree)
+                }
             # Success!
+            metrics.generations.inc(outcome="success")
+            metrics.output_nodes.observe(_count_nodes(response))
+            await result_cache.set(key, {"ctm": response, "validation_message": validate_result["message"]})
             yield create_event(
                 StreamStatus.SUCCESS,
                 "Tạo mindmap thành công!",
                 {
                     "ctm": response,
                     "attempts_used": attempt,
-                    "validation_message": validate_result["message"]
+                    "validation_message": validate_result["message"],
+                    "cached": False,
+                    "repaired": bool(repair_fixes),
+                    "repairs": repair_fixes,
+                    "backend": answered_by,
+                    **progress,
+                    **_retry_stats(attempt - 1, aborted_attempts, len(response), stream_mode)
                 }
             )
             return
 
         # Validation failed - prepare for retry
         messages.append(AIMessage(response))
-        messages.append(HumanMessage(
-            f"CTM format validation failed: {validate_result['message']}. "
-            "Please fix the error and regenerate the mindmap following the CTM rules strictly."
-        ))
+        messages.append(_correction_message(validate_result["message"]))
 
         retry_cnt -= 1
         attempt += 1
 
         if retry_cnt > 0:
+            metrics.retries.inc(error_code=validate_result["error_code"])
             # Emit RETRY status
             yield create_event(
                 StreamStatus.RETRY,
@@ -199,26 +556,377 @@ async def generate_mindmap(content: str, llm_config: LLMConfig | None = None) ->
                 {
                     "error": validate_result["message"],
                     "next_attempt": attempt,
-                    "remaining_retries": retry_cnt
+                    "remaining_retries": retry_cnt,
+                    "aborted_early": stream_error is not None,
+                    # Nodes streamed by the failed attempt are rolled back
+                    "nodes_discarded": nodes_sent
                 }
             )
 
     # All retries exhausted
+    metrics.generations.inc(outcome="error")
     yield create_event(
         StreamStatus.ERROR,
         f"Không thể tạo mindmap sau {max_retry} lần thử.",
         {
             "last_error": validate_result["message"],
-            "attempts_used": max_retry
+            "attempts_used": max_retry,
+            **_retry_stats(max_retry - 1, aborted_attempts, None, stream_mode)
+        }
+    )
+
+
+async def generate_mindmap_map_reduce(
+    content: str,
+    llm_config: LLMConfig | None,
+    key: str,
+    title: str | None = None
+) -> AsyncGenerator[StreamEvent, None]:
+    """
+    Long-document mode: map each chunk to a CTM subtree concurrently, then
+    merge the subtrees under a single root.
+
+    Args:
+        content: Full document text
+        llm_config: LLM configuration
+        key: Result cache key of the full document
+        title: Root label; derived from the document when not given
+    """
+    chunks = split_into_chunks(content, settings.mindmap_chunk_max_chars)
+    total = len(chunks)
+    # The generation holds one backend slot; more chunks only run in parallel on
+    # slots that are free right now, so the per-backend bound still holds
+    backend_scheduler = scheduler.for_config(llm_config)
+    extra_slots: list[Ticket] = []
+    while len(extra_slots) + 1 < min(settings.mindmap_chunk_concurrency, total):
+        ticket = backend_scheduler.ticket()
+        if not backend_scheduler.try_start(ticket):
+            break
+        extra_slots.append(ticket)
+    concurrency = len(extra_slots) + 1
+    semaphore = asyncio.Semaphore(concurrency)
+
+    yield create_event(
+        StreamStatus.PROCESSING,
+        f"Tài liệu dài, đang tạo mindmap cho {total} phần...",
+        {"mode": "long_document", "chunks_total": total, "concurrency": concurrency}
+    )
+
+    async def run_chunk(index: int, chunk: str):
+        async with semaphore:
+            return index, await generate_chunk_tree(llm_config, chunk, index, total)
+
+    tasks = [asyncio.create_task(run_chunk(i, chunk)) for i, chunk in enumerate(chunks)]
+    subtrees: list[CTMTree | None] = [None] * total
+    failed_chunks = []
+    attempts_used = 0
+    try:
+        for chunks_done, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+            index, (tree, attempts, error) = await next_done
+            subtrees[index] = tree
+            attempts_used += attempts
+            if tree is None:
+                failed_chunks.append(index + 1)
+            # Fewer chunks left than slots: give the spare ones back to the queue
+            while extra_slots and total - chunks_done < len(extra_slots) + 1:
+                extra_slots.pop().release()
+
+            # Emit per-chunk progress
+            yield create_event(
+                StreamStatus.PROCESSING,
+                f"Đã xử lý phần {chunks_done}/{total}...",
+                {
+                    "chunk": index + 1,
+                    "chunks_done": chunks_done,
+                    "chunks_total": total,
+                    "chunk_attempts": attempts,
+                    "chunk_error": error
+                }
+            )
+    finally:
+        # Stop outstanding chunk workers if the stream is closed early
+        for task in tasks:
+            task.cancel()
+        for ticket in extra_slots:
+            ticket.release()
+
+    valid_subtrees = [tree for tree in subtrees if tree is not None]
+    if not valid_subtrees:
+        metrics.generations.inc(outcome="error")
+        yield create_event(
+            StreamStatus.ERROR,
+            f"Không thể tạo mindmap cho phần nào trong {total} phần.",
+            {"attempts_used": attempts_used, "failed_chunks": failed_chunks}
+        )
+        return
+
+    yield create_event(
+        StreamStatus.VALIDATING,
+        "Đang ghép và kiểm tra định dạng CTM...",
+        {"chunks_total": total, "failed_chunks": failed_chunks}
+    )
+
+    response = merge_subtrees(title or document_title(content), valid_subtrees)
+    with metrics.stage("validate"):
+        validate_result = validate_ctm(response)
+    if not validate_result["is_valid"]:
+        metrics.generations.inc(outcome="error")
+        yield create_event(
+            StreamStatus.ERROR,
+            "Không thể ghép các phần mindmap.",
+            {"last_error": validate_result["message"], "attempts_used": attempts_used}
+        )
+        return
+
+    metrics.generations.inc(outcome="success")
+    metrics.output_nodes.observe(_count_nodes(response))
+    if not failed_chunks:
+        # A map missing whole sections is delivered once, never served from the cache
+        await result_cache.set(key, {"ctm": response, "validation_message": validate_result["message"]})
+    yield create_event(
+        StreamStatus.SUCCESS,
+        "Tạo mindmap thành công!",
+        {
+            "ctm": response,
+            "attempts_used": attempts_used,
+            "validation_message": validate_result["message"],
+            "cached": False,
+            "retries": attempts_used - total,
+            "chunks_total": total,
+            "failed_chunks": failed_chunks
         }
     )
 
 
-def create_event(status: StreamStatus, message: str, data: dict | None = None) -> str:
-    """Create a JSON event string for streaming"""
-    event: StreamEvent = {
+async def generate_chunk_tree(
+    llm_config: LLMConfig | None,
+    chunk: str,
+    index: int,
+    total: int
+) -> tuple[CTMTree | None, int, str | None]:
+    """
+    Generate and validate the CTM subtree of one chunk, retrying on invalid output.
+
+    A failing LLM call (network error, quota...) fails the chunk, not the
+    document: it is reported like a chunk that never validated.
+
+    Returns:
+        Tuple of (parsed subtree or None, attempts used, last error)
+    """
+    max_retry = settings.mindmap_generate_max_retry
+    messages = [
+        SystemMessage(mindmap_generate_section),
+        HumanMessage(f"Part {index + 1}/{total}:\n\n{chunk}")
+    ]
+    alternate = hedge_alternate(llm_config)
+    error = None
+    for attempt in range(1, max_retry + 1):
+        try:
+            with metrics.stage("llm_invoke"):
+                _, response = await invoke_llm(messages, llm_config, alternate)
+        except Exception as e:
+            return None, attempt, f"{type(e).__name__}: {e}"
+        with metrics.stage("validate"):
+            result = parse_ctm(response)
+        if not result["is_valid"] and settings.mindmap_auto_repair:
+            repaired = repair_ctm(response)
+            if repaired is not None:
+                result = parse_ctm(repaired["ctm"])
+                metrics.repairs.inc()
+        if result["is_valid"]:
+            return result["tree"], attempt, None
+        error = result["message"]
+        if attempt < max_retry:
+            metrics.retries.inc(error_code=result["error_code"])
+        messages.append(AIMessage(response))
+        messages.append(_correction_message(error))
+    return None, max_retry, error
+
+
+async def invoke_llm(messages, llm_config: LLMConfig | None, alternate: LLMConfig | None) -> tuple[str, str]:
+    """
+    One whole LLM call, hedged across both backends when the request allows it.
+
+    The requested backend runs on the scheduler slot the generation already
+    holds; the alternate one only gets the call when its own backend has a
+    free slot. The first answer that is valid CTM (after local repair) wins.
+
+    Args:
+        messages: Chat messages
+        llm_config: Requested LLM configuration
+        alternate: Config of the alternate backend (hedge_alternate), None for a plain call
+
+    Returns:
+        Tuple of (backend that answered, response)
+    """
+    backend = llm_backend(llm_config)
+    if alternate is None:
+        with hedger.track(backend):
+            return backend, (await get_llm(llm_config).ainvoke(messages)).content
+
+    alternate_scheduler = scheduler.for_config(alternate)
+
+    async def call_requested() -> str:
+        return (await get_llm(llm_config).ainvoke(messages)).content
+
+    async def call_alternate() -> str:
+        ticket = alternate_scheduler.ticket()
+        if not alternate_scheduler.try_start(ticket):
+            raise BackendBusy(f"No free slot on backend '{alternate_scheduler.name}'")
+        try:
+            return (await get_llm(alternate).ainvoke(messages)).content
+        finally:
+            ticket.release()
+
+    return await hedger.race(
+        {backend: call_requested, alternate_scheduler.name: call_alternate},
+        _acceptable_ctm
+    )
+
+
+def _acceptable_ctm(response: str) -> bool:
+    """Whether a response is valid CTM, possibly after local repair."""
+    if parse_ctm(response)["is_valid"]:
+        return True
+    # The winner is repaired again, and counted, by the caller
+    return settings.mindmap_auto_repair and repair_ctm(response, record=False) is not None
+
+
+async def stream_llm_response(llm, messages, validator: IncrementalCTMValidator) -> AsyncGenerator[str, None]:
+    """
+    Stream an LLM response, validating each completed line as it arrives.
+
+    Completed lines are fed to ``validator`` before each text chunk is
+    yielded, so ``validator.tree`` always holds the nodes accepted so far.
+    The stream is closed (cancelling the request) as soon as a hard CTM
+    error appears (``validator.error``), so a corrective retry can start
+    without waiting for the rest. With auto-repair enabled, lines are
+    repaired before validation so only errors the repair stage cannot fix
+    abort the stream.
+
+    Yields:
+        Text chunks of the response
+    """
+    repairer = CTMLineRepairer() if settings.mindmap_auto_repair else None
+
+    def check_line(line: str) -> str | None:
+        if repairer is not None:
+            line = repairer.repair_line(line)
+            if line is None:
+                return None
+        return validator.feed_line(line)
+
+    pending = ""
+    stream = llm.astream(messages)
+    try:
+        async for chunk in stream:
+            text = chunk.text
+            pending += text
+            if "\n" in pending:
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    if check_line(line) is not None:
+                        break
+            yield text
+            if validator.error is not None:
+                return
+    finally:
+        await stream.aclose()
+
+    if pending:
+        check_line(pending)
+
+
+def _nodes_event(tree: CTMTree, start: int, attempt: int) -> StreamEvent:
+    """NODES event with the nodes of ``tree`` from ``start`` on (see tree_format.encode_nodes)."""
+    return create_event(
+        StreamStatus.NODES,
+        f"Đã tạo {len(tree)} nút...",
+        {"attempt": attempt, "start": start, "node_count": len(tree), **encode_nodes(tree, start)}
+    )
+
+
+def _same_nodes(streamed: CTMTree, final: CTMTree | None) -> bool:
+    """Whether the streamed nodes are exactly the nodes of the validated map."""
+    return (
+        final is not None
+        and streamed.levels == final.levels
+        and streamed.labels == final.labels
+        and streamed.attributes == final.attributes
+    )
+
+
+def _count_nodes(ctm: str) -> int:
+    """Number of nodes of a valid CTM text: its non-blank lines outside code fences."""
+    return sum(1 for line in ctm.split("\n") if line.strip() and not line.startswith("```"))
+
+
+def _correction_message(error: str) -> HumanMessage:
+    """Follow-up message asking the LLM to fix an invalid CTM response."""
+    return HumanMessage(
+        f"CTM format validation failed: {error}. "
+        "Please fix the error and regenerate the mindmap following the CTM rules strictly."
+    )
+
+
+def _overloaded_event(error: QueueFullError) -> StreamEvent:
+    return create_event(
+        StreamStatus.ERROR,
+        "Hệ thống đang quá tải, vui lòng thử lại sau.",
+        {"retry_after": round(error.retry_after)}
+    )
+
+
+def _backend_error_event(
+    error: Exception,
+    backends: list[str],
+    attempt: int,
+    nodes_sent: int,
+    aborted_attempts: list[tuple[float, int]],
+    stream_mode: bool
+) -> StreamEvent:
+    """ERROR event of a generation whose LLM call failed: a corrective retry has nothing to correct."""
+    return create_event(
+        StreamStatus.ERROR,
+        "Không thể kết nối tới mô hình, vui lòng thử lại sau.",
+        {
+            "last_error": f"{type(error).__name__}: {error}",
+            "backend_errors": {name: hedger.backend(name).last_error for name in backends},
+            "attempts_used": attempt,
+            # Nodes streamed by the failed attempt are rolled back
+            "nodes_discarded": nodes_sent,
+            **_retry_stats(attempt - 1, aborted_attempts, None, stream_mode)
+        }
+    )
+
+
+def _retry_stats(
+    retries: int,
+    aborted_attempts: list[tuple[float, int]],
+    full_length: int | None,
+    stream_mode: bool
+) -> dict:
+    """Retry count and, in stream mode, an estimate of the wall time saved by early aborts."""
+    stats = {"retries": retries}
+    if not stream_mode:
+        return stats
+
+    # Assume an aborted attempt would have run at the same rate up to the
+    # length of the final response
+    saved = 0.0
+    if full_length:
+        for elapsed, received in aborted_attempts:
+            if received:
+                saved += max(0.0, elapsed * (full_length / received - 1))
+    stats["early_aborts"] = len(aborted_attempts)
+    stats["time_saved_ms"] = round(saved * 1000) if full_length else None
+    return stats
+
+
+def create_event(status: StreamStatus, message: str, data: dict | None = None) -> StreamEvent:
+    """Create an event for streaming; serialization happens at the edge (core.event_stream)"""
+    return {
         "status": status.value,
         "message": message,
         "data": data
     }
-    return json.dumps(event, ensure_ascii=False) + "\n"
@@ -0,0 +1,120 @@
+"""
+Compact wire format of a generated mindmap.
+
+Instead of raw CTM text, a client can ask for the tree the validator builds,
+as parallel arrays::
+
+    {
+        "levels": [0, 1, 2, ...],        # depth of node i
+        "parents": [-1, 0, 1, ...],      # index of its parent, -1 for the root
+        "labels": ["Root", ...],         # decoded labels (no CTM escapes)
+        "attributes": {"nodes": [...], "keys": [...], "values": [...]}
+    }
+
+Nodes are in document order and attribute rows are sorted by node. NODES
+events carry the same arrays for the nodes completed since the previous
+batch. The client lists the payload compressions it can decode; large
+payloads are then compressed with the first supported one and sent base64
+encoded.
+"""
+
+import base64
+import gzip
+from bisect import bisect_left
+
+import orjson
+
+from config.Setttings import settings
+from routers.mindmap.ctm_validator import CTMTree, parse_ctm, unescape_label
+from routers.mindmap.dto import OutputFormat, OutputOptions, StreamEvent, StreamStatus
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _gzip_compress(data: bytes) -> bytes:
+    # mtime=0 keeps the output deterministic
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+COMPRESSORS = {"gzip": _gzip_compress}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = _zstd_compress
+
+
+def encode_tree(tree: CTMTree) -> dict:
+    """Parallel-array form of a parsed tree."""
+    return encode_nodes(tree)
+
+
+def encode_nodes(tree: CTMTree, start: int = 0) -> dict:
+    """
+    Parallel-array form of the nodes from ``start`` on.
+
+    Parent and attribute node indices stay absolute, so batches of a growing
+    tree (NODES events) can be appended to what the client already has.
+    """
+    attributes = tree.attributes
+    first = bisect_left(attributes, start, key=lambda row: row[0]) if start else 0
+    return {
+        "levels": tree.levels[start:].tolist(),
+        "parents": tree.parents[start:].tolist(),
+        "labels": [unescape_label(label) for label in tree.labels[start:]],
+        "attributes": {
+            "nodes": [node for node, _, _ in attributes[first:]],
+            "keys": [key for _, key, _ in attributes[first:]],
+            "values": [unescape_label(value) for _, _, value in attributes[first:]]
+        }
+    }
+
+
+def pack_tree(tree: CTMTree, encodings: list[str]) -> tuple[str, dict | str]:
+    """
+    Encode a tree for the wire.
+
+    Args:
+        tree: Parsed tree
+        encodings: Compressions the client accepts, most preferred first
+
+    Returns:
+        Tuple of (encoding, payload): ``("identity", tree dict)`` or
+        ``("zstd" | "gzip", base64 of the compressed JSON)``
+    """
+    encoded = encode_tree(tree)
+    encoding = next((e for e in encodings if e in COMPRESSORS), None)
+    if encoding is None:
+        return "identity", encoded
+
+    data = orjson.dumps(encoded)
+    if len(data) < settings.mindmap_tree_compress_min_bytes:
+        # Small trees grow once base64 encoded
+        return "identity", encoded
+    return encoding, base64.b64encode(COMPRESSORS[encoding](data)).decode("ascii")
+
+
+def shape_event(event: StreamEvent, output: OutputOptions | None) -> StreamEvent:
+    """
+    Rewrite a SUCCESS event for the requested output format.
+
+    In tree mode ``data.ctm`` is replaced by ``data.tree``,
+    ``data.tree_encoding`` and ``data.node_count``. Other events, and
+    everything in the default CTM mode, pass through unchanged. Shared
+    events are never modified in place.
+    """
+    if output is None or output.format == OutputFormat.CTM or event["status"] != StreamStatus.SUCCESS.value:
+        return event
+
+    result = parse_ctm(event["data"]["ctm"])
+    if not result["is_valid"]:
+        return event
+    tree = result["tree"]
+    encoding, packed = pack_tree(tree, [e.strip().lower() for e in output.encodings])
+    data = {key: value for key, value in event["data"].items() if key != "ctm"}
+    data.update({"tree": packed, "tree_encoding": encoding, "node_count": len(tree)})
+    return {**event, "data": data}
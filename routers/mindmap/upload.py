@@ -0,0 +1,218 @@
+"""
+Streaming PDF uploads.
+
+The multipart body is parsed while it arrives and the size limit is enforced
+chunk by chunk, so oversized uploads are rejected early. The file part is
+spooled: kept in memory while small, moved to a named temporary file once it
+grows, so the PDF workers can memory-map it instead of receiving a copy.
+"""
+
+import asyncio
+import os
+import tempfile
+
+from fastapi import HTTPException, Request, status
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from config.Setttings import settings
+
+# Room for multipart boundaries, part headers and small form fields
+_BODY_OVERHEAD = 64 * 1024
+
+
+class UploadSpool:
+    """Upload data held in memory up to ``max_memory`` bytes, on disk beyond that."""
+
+    def __init__(self, filename: str, max_memory: int):
+        self.filename = filename
+        self.size = 0
+        self.max_memory = max_memory
+        self._buffer = bytearray()
+        self._file = None
+
+    @property
+    def path(self) -> str | None:
+        return self._file.name if self._file is not None else None
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self._file is None and len(self._buffer) + len(data) <= self.max_memory:
+            self._buffer += data
+            return
+        if self._file is None:
+            await asyncio.to_thread(self._rollover)
+        await asyncio.to_thread(self._file.write, data)
+
+    async def finish(self) -> None:
+        if self._file is not None:
+            await asyncio.to_thread(self._file.flush)
+
+    def source(self) -> bytes | str:
+        """Bytes for small uploads, the temporary file path for spooled ones."""
+        return self.path if self._file is not None else bytes(self._buffer)
+
+    def close(self) -> None:
+        """Release the upload; safe to call more than once."""
+        self._buffer = bytearray()
+        if self._file is not None:
+            path = self._file.name
+            self._file.close()
+            self._file = None
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _rollover(self) -> None:
+        self._file = tempfile.NamedTemporaryFile(prefix="mindmap-upload-", suffix=".pdf", delete=False)
+        self._file.write(self._buffer)
+        self._buffer = bytearray()
+
+
+def max_upload_bytes() -> int:
+    return settings.max_upload_size_mb * 1024 * 1024
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Max size is {settings.max_upload_size_mb} MB"
+    )
+
+
+class UploadForm:
+    """Text fields and spooled files of a multipart form."""
+
+    def __init__(self):
+        self.fields: dict[str, list[str]] = {}
+        self.files: list[UploadSpool] = []
+
+    def close(self) -> None:
+        for spool in self.files:
+            spool.close()
+
+
+async def receive_form(
+    request: Request,
+    file_field: str = "file",
+    max_files: int = 1,
+    max_total_bytes: int | None = None
+) -> UploadForm:
+    """
+    Stream a multipart form, spooling the parts of ``file_field`` as they arrive.
+
+    Every file is limited to ``max_upload_size_mb`` and the whole body to
+    ``max_total_bytes`` (one file by default). Other text fields are decoded as
+    UTF-8; extra file fields are ignored.
+
+    Raises:
+        HTTPException: 413 as soon as a limit is exceeded, 400 for a
+            malformed body or too many files
+    """
+    limit = max_upload_bytes()
+    body_limit = (max_total_bytes or limit) + _BODY_OVERHEAD
+
+    # Reject early when the client announces an oversized body
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > body_limit:
+        raise _too_large()
+
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload")
+
+    form = UploadForm()
+    current: dict = {}
+    pending: list[tuple[UploadSpool, bytes]] = []
+    header_name = bytearray()
+    header_value = bytearray()
+
+    def on_part_begin():
+        current.clear()
+
+    def on_header_field(data, start, end):
+        header_name.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        if header_name.lower() == b"content-disposition":
+            current["disposition"] = bytes(header_value)
+        header_name.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        _, options = parse_options_header(current.get("disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        if b"filename" in options:
+            if name != file_field:
+                return
+            if len(form.files) >= max_files:
+                raise ValueError(f"At most {max_files} file(s) allowed")
+            filename = options[b"filename"].decode("utf-8", errors="replace")
+            current["spool"] = UploadSpool(filename, settings.upload_spool_max_memory)
+            form.files.append(current["spool"])
+        elif name:
+            current["field"] = name
+            current["value"] = bytearray()
+
+    def on_part_data(data, start, end):
+        if "spool" in current:
+            pending.append((current["spool"], data[start:end]))
+        elif "field" in current:
+            current["value"] += data[start:end]
+
+    def on_part_end():
+        if "field" in current:
+            form.fields.setdefault(current["field"], []).append(current["value"].decode("utf-8"))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > body_limit:
+                raise _too_large()
+            parser.write(chunk)
+            # The parser callbacks are synchronous, so file data is written here
+            for spool, data in pending:
+                if spool.size + len(data) > limit:
+                    raise _too_large()
+                await spool.write(data)
+            pending.clear()
+        parser.finalize()
+    except HTTPException:
+        form.close()
+        raise
+    except Exception as e:
+        form.close()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid upload: {str(e)}")
+
+    for spool in form.files:
+        await spool.finish()
+    return form
+
+
+async def receive_pdf_upload(request: Request, field_name: str = "file") -> UploadSpool:
+    """
+    Stream a multipart upload into an UploadSpool.
+
+    Raises:
+        HTTPException: 413 as soon as the limit is exceeded, 400 for a
+            malformed body or a missing file field
+    """
+    form = await receive_form(request, field_name)
+    if not form.files:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Missing file field '{field_name}'")
+    return form.files[0]
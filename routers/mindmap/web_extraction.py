@@ -0,0 +1,145 @@
+"""
+Web page download and main-content extraction.
+
+Pages are fetched with the shared async client (core.http_client) and
+trafilatura runs in its own thread pool, so slow sites never starve the
+extraction workers (or the default executor).
+
+Extracted markdown is cached per URL together with the response validators
+(ETag / Last-Modified), so hot URLs are revalidated with a conditional GET
+and a 304 skips both the download body and the extraction.
+"""
+
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TypedDict
+from urllib.parse import urldefrag
+
+import trafilatura
+
+from config.Setttings import settings
+from core.cache import LRUCache
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_extract_executor() -> ThreadPoolExecutor:
+    """Lazily create the extraction pool."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.web_extract_workers,
+            thread_name_prefix="web-extract"
+        )
+    return _executor
+
+
+def shutdown_extract_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def extract_web_content(html: bytes | str, url: str | None = None) -> str | None:
+    """Extract the main content of a page as markdown, off the event loop."""
+    extract_func = partial(
+        trafilatura.extract,
+        html,
+        url=url,
+        output_format="markdown",
+        include_tables=True,
+        include_images=False
+    )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_extract_executor(), extract_func)
+
+
+class CachedPage(TypedDict):
+    markdown: str
+    etag: str | None
+    last_modified: str | None
+    body_hash: str
+
+
+class WebPageCache:
+    """URL-keyed cache of extracted markdown with conditional revalidation."""
+
+    def __init__(self):
+        self.pages: LRUCache[CachedPage] = LRUCache(
+            max_entries=settings.web_cache_max_entries,
+            max_bytes=settings.web_cache_max_bytes,
+            ttl_seconds=settings.web_cache_ttl_seconds,
+            sizeof=lambda page: len(page["markdown"].encode("utf-8"))
+        )
+        self.not_modified = 0
+        self.unchanged_body = 0
+        self.refreshed = 0
+
+    @staticmethod
+    def key(url: str) -> str:
+        return urldefrag(url)[0]
+
+    def lookup(self, url: str) -> CachedPage | None:
+        if not settings.web_cache_enabled:
+            return None
+        return self.pages.get(self.key(url))
+
+    @staticmethod
+    def conditional_headers(page: CachedPage | None) -> dict[str, str]:
+        """Request headers that let the server answer 304 Not Modified."""
+        headers = {}
+        if page is not None:
+            if page["etag"]:
+                headers["If-None-Match"] = page["etag"]
+            if page["last_modified"]:
+                headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def reuse(self, url: str, page: CachedPage, body: bytes | None) -> str | None:
+        """
+        Return the cached markdown if it is still valid for this response.
+
+        Args:
+            page: Cached entry the request was revalidated against
+            body: Downloaded body, or None for a 304 response
+        """
+        if body is None:
+            self.not_modified += 1
+        elif _body_hash(body) == page["body_hash"]:
+            # Servers without validators: an identical body needs no new extraction
+            self.unchanged_body += 1
+        else:
+            return None
+        # Still valid, so restart its TTL
+        self.pages.set(self.key(url), page)
+        return page["markdown"]
+
+    def store(self, url: str, headers: dict[str, str], body: bytes, markdown: str) -> None:
+        if not settings.web_cache_enabled:
+            return
+        self.refreshed += 1
+        self.pages.set(self.key(url), {
+            "markdown": markdown,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "body_hash": _body_hash(body)
+        })
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.web_cache_enabled,
+            "not_modified": self.not_modified,
+            "unchanged_body": self.unchanged_body,
+            "refreshed": self.refreshed,
+            "entries": self.pages.stats()
+        }
+
+
+def _body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+web_page_cache = WebPageCache()
@@ -38,6 +38,12 @@ const STATUS_CONFIG = {
         phase: 'XỬ LÝ NỘI DUNG',
         subtitle: 'Đang phân tích và chuẩn hóa văn bản...'
     },
+    QUEUED: {
+        label: 'Đang xếp hàng',
+        icon: '⏳',
+        phase: 'CHỜ CẤT CÁNH',
+        subtitle: 'Hệ thống đang bận, yêu cầu của bạn đang chờ đến lượt...'
+    },
     PROCESSING: {
         label: 'AI đang xử lý',
         icon: '🤖',
@@ -102,7 +108,15 @@ const statAltitude = document.getElementById('stat-altitude');
 const statProgress = document.getElementById('stat-progress');
 
 // ===== State =====
+// Running server-side job of this tab, kept so a reload resumes it instead of starting over:
+// { jobId, request: fingerprint of the request it runs, lastEventId: last event received }
+const JOB_STORAGE_KEY = 'mindmap_job';
+let currentJob = null;
+let requestKey = null;
+let finalEventSeen = false;
 let steps = [];
+// Labels of the nodes streamed so far by the current attempt (NODES events)
+let streamedNodes = [];
 let requestData = null;
 let isTurbo = false;
 let currentProgress = 0;
@@ -490,6 +504,11 @@ function updateStepState(status, isActive, isCompleted, isError = false) {
     icon.innerHTML = iconContent;
 }
 
+function updateStepDetail(status, message) {
+    const detail = missionSteps.querySelector(`[data-status="${status}"] .step-detail`);
+    if (detail) detail.textContent = message || '';
+}
+
 function markAllStepsCompleted() {
     const allSteps = missionSteps.querySelectorAll('.step');
     allSteps.forEach(s => {
@@ -519,6 +538,7 @@ function updateProgressByStatus(status) {
         'READING_FILE': 30,
         'LOADING_WEB': 30,
         'EXTRACTING_TEXT': 45,
+        'QUEUED': 50,
         'PROCESSING': 70,
         'VALIDATING': 85,
         'RETRY': 75,
@@ -559,8 +579,43 @@ function showLoading() {
     targetProgress = 0;
 }
 
+// ===== Job Resume =====
+// FNV-1a hash of the stored request: a job is only resumed for the request that started it
+function requestFingerprint(text) {
+    let hash = 0x811c9dc5;
+    for (let i = 0; i < text.length; i++) {
+        hash ^= text.charCodeAt(i);
+        hash = Math.imul(hash, 0x01000193);
+    }
+    return `${(hash >>> 0).toString(16)}:${text.length}`;
+}
+
+function loadJob() {
+    try {
+        const job = JSON.parse(sessionStorage.getItem(JOB_STORAGE_KEY));
+        return job && job.jobId && job.request === requestKey ? job : null;
+    } catch (e) {
+        return null;
+    }
+}
+
+function saveJob(job) {
+    currentJob = job;
+    sessionStorage.setItem(JOB_STORAGE_KEY, JSON.stringify(job));
+}
+
+function clearJob() {
+    currentJob = null;
+    sessionStorage.removeItem(JOB_STORAGE_KEY);
+}
+
 // ===== Stream Processing =====
 async function processStreamResponse(response) {
+    const jobId = response.headers.get('X-Job-Id');
+    if (jobId && (!currentJob || currentJob.jobId !== jobId)) {
+        saveJob({ jobId: jobId, request: requestKey, lastEventId: 0 });
+    }
+
     const reader = response.body.getReader();
     const decoder = new TextDecoder();
     let buffer = '';
@@ -605,6 +660,11 @@ function handleStreamEvent(data) {
 
     console.log('Stream event:', status, message);
 
+    if (currentJob && data.id) {
+        // A reload resumes after the last event received
+        saveJob({ ...currentJob, lastEventId: data.id });
+    }
+
     switch (status) {
         case 'CONNECTING':
         case 'PREPARING':
@@ -614,21 +674,38 @@ function handleStreamEvent(data) {
             addStep(status, message);
             break;
 
+        case 'QUEUED':
+            // Repeated while waiting; keep one step and refresh its position
+            addStep(status, message);
+            updateStepDetail(status, message);
+            break;
+
         case 'PROCESSING':
             addStep(status, message);
+            updateStepDetail(status, message);
             enableTurbo(); // AI processing = Turbo mode!
             break;
 
+        case 'NODES':
+            // Nodes arrive while the AI writes; batches continue from `start`
+            streamedNodes.length = eventData.start;
+            streamedNodes.push(...eventData.labels);
+            updateStepDetail('PROCESSING', `Đã tạo ${streamedNodes.length} nút: ${streamedNodes[streamedNodes.length - 1]}`);
+            targetProgress = Math.max(targetProgress, Math.min(84, 70 + streamedNodes.length));
+            break;
+
         case 'VALIDATING':
             addStep(status, message);
             disableTurbo();
             break;
 
         case 'RETRY':
+            streamedNodes = []; // The failed attempt's nodes are rolled back
             addStep(status, message);
             break;
 
         case 'SUCCESS':
+            finalEventSeen = true;
             if (eventData && eventData.ctm) {
                 showSuccess();
                 return eventData.ctm;
@@ -636,6 +713,7 @@ function handleStreamEvent(data) {
             break;
 
         case 'ERROR':
+            finalEventSeen = true;
             showError(message || 'Có lỗi xảy ra');
             break;
 
@@ -675,6 +753,7 @@ async function generateFromUrl(url) {
         llm_type: llmConfig.llm_type || 'ollama'
     });
     if (llmConfig.api_key) params.append('api_key', llmConfig.api_key);
+    if (llmConfig.hedge) params.append('hedge', 'true');
 
     const response = await fetch(`${API_BASE}/web/generate/stream?${params.toString()}`, {
         method: 'POST'
@@ -710,6 +789,7 @@ async function generateFromFile(fileData, fileName) {
         llm_type: llmConfig.llm_type || 'ollama'
     });
     if (llmConfig.api_key) params.append('api_key', llmConfig.api_key);
+    if (llmConfig.hedge) params.append('hedge', 'true');
 
     const response = await fetch(`${API_BASE}/file/generate/stream?${params.toString()}`, {
         method: 'POST',
@@ -724,6 +804,27 @@ async function generateFromFile(fileData, fileName) {
     return await processStreamResponse(response);
 }
 
+async function resumeJob(job) {
+    addStep('CONNECTING', 'Đang kết nối lại tiến trình đang chạy...');
+
+    // Continue after the last event received, then follow the job
+    currentJob = job;
+    const cursor = job.lastEventId || 0;
+    const response = await fetch(`${API_BASE}/jobs/${encodeURIComponent(job.jobId)}/stream?cursor=${cursor}`);
+
+    if (response.status === 404) {
+        return undefined; // Expired or unknown: start a new generation
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    finalEventSeen = false;
+    const ctm = await processStreamResponse(response);
+    // Nothing left after the cursor (the final event was already received): start over
+    return finalEventSeen ? ctm : undefined;
+}
+
 // ===== Main Process =====
 async function startGeneration() {
     // Get request data from localStorage
@@ -735,6 +836,7 @@ async function startGeneration() {
 
     try {
         requestData = JSON.parse(storedData);
+        requestKey = requestFingerprint(storedData);
     } catch (e) {
         showError('Dữ liệu yêu cầu không hợp lệ.');
         return;
@@ -743,11 +845,19 @@ async function startGeneration() {
     showLoading();
     missionSteps.innerHTML = '';
     steps = [];
+    streamedNodes = [];
 
     try {
-        let ctm = null;
+        let ctm = undefined;
+
+        // Only a job started for this very request is resumed
+        const job = loadJob();
+        if (job) {
+            ctm = await resumeJob(job);
+        }
+        if (ctm === undefined) clearJob();
 
-        switch (requestData.type) {
+        if (ctm === undefined) switch (requestData.type) {
             case 'text':
                 ctm = await generateFromText(requestData.text);
                 break;
@@ -761,6 +871,9 @@ async function startGeneration() {
                 throw new Error('Loại yêu cầu không hợp lệ');
         }
 
+        // The stream ended, so the job is over (success or error)
+        clearJob();
+
         if (ctm) {
             // Save CTM to localStorage and redirect
             localStorage.setItem('mindmap_ctm', ctm);
@@ -801,6 +914,7 @@ rocketScene.addEventListener('touchend', () => {
 
 retryBtn.addEventListener('click', () => {
     errorPanel.classList.remove('visible');
+    clearJob(); // Retry means a new generation
     startGeneration();
 });
 
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from config.Setttings import settings
+from core.scheduler import GenerationScheduler, QueueFullError
+from routers.mindmap import service
+from routers.mindmap.batch import BatchItem, BatchManager
+
+
+class AnsweringLLM:
+    async def ainvoke(self, messages):
+        return AIMessage("Root\n>a\n>b")
+
+
+@pytest.fixture
+def saturated(monkeypatch):
+    """Ollama scheduler with its only slot taken and no room in the interactive queue."""
+    monkeypatch.setattr(settings, "scheduler_ollama_max_concurrency", 1)
+    monkeypatch.setattr(settings, "scheduler_max_queue_depth", 0)
+    monkeypatch.setattr(settings, "batch_workers", 2)
+    monkeypatch.setattr(settings, "mindmap_cache_enabled", False)
+    monkeypatch.setattr(settings, "mindmap_stream_llm", False)
+    monkeypatch.setattr(settings, "mindmap_progressive_nodes", False)
+    fresh = GenerationScheduler()
+    monkeypatch.setattr(service, "scheduler", fresh)
+    monkeypatch.setattr(service, "get_llm", lambda llm_config=None: AnsweringLLM())
+    return fresh.for_config(None)
+
+
+def test_batch_item_waits_for_a_saturated_backend(saturated):
+    async def run():
+        blocker = saturated.ticket()
+        assert saturated.try_start(blocker)
+        with pytest.raises(QueueFullError):
+            saturated.check_admission()
+
+        manager = BatchManager()
+        job = manager.submit([BatchItem(0, "text", "Some text"), BatchItem(1, "text", "Other text")])
+        try:
+            await asyncio.sleep(0.05)
+            # Both items wait for the slot instead of failing admission
+            assert job.counts()["running"] == 2
+            assert saturated.stats()["background_queued"] == 2
+
+            blocker.release()
+            for _ in range(100):
+                if job.finished_at is not None:
+                    break
+                await asyncio.sleep(0.01)
+            return job
+        finally:
+            await manager.shutdown()
+
+    job = asyncio.run(run())
+    assert job.counts()["succeeded"] == 2
+    assert job.items[0].result["ctm"] == "Root\n>a\n>b"
@@ -0,0 +1,58 @@
+import os
+
+from core.cache import DiskCache
+
+VALUE = {"ctm": "x" * 90}  # 101 bytes as JSON
+
+
+def _age(cache: DiskCache, key: str, seconds_ago: float) -> None:
+    path = cache._path(key)
+    mtime = path.stat().st_mtime - seconds_ago
+    os.utime(path, (mtime, mtime))
+
+
+def test_totals_are_tracked_without_scanning(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path, max_bytes=1000)
+    scans = []
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(1) or [])
+
+    cache.set("a", VALUE)
+    cache.set("b", VALUE)
+    cache.set("a", {"ctm": "short"})
+
+    assert scans == []
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 101 + len('{"ctm": "short"}')
+
+
+def test_totals_are_seeded_from_the_directory(tmp_path):
+    first = DiskCache(tmp_path)
+    first.set("a", VALUE)
+    first.set("b", VALUE)
+
+    second = DiskCache(tmp_path)
+    assert (second.stats()["entries"], second.stats()["bytes"]) == (2, 202)
+    assert second.get("a") == VALUE
+
+
+def test_oldest_entries_are_evicted_over_the_budget(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=250)
+    cache.set("old", VALUE)
+    _age(cache, "old", 20)
+    cache.set("mid", VALUE)
+    _age(cache, "mid", 10)
+
+    cache.set("new", VALUE)
+
+    assert cache.get("old") is None
+    assert cache.get("mid") == cache.get("new") == VALUE
+    assert (cache.stats()["entries"], cache.stats()["bytes"], cache.evictions) == (2, 202, 1)
+
+
+def test_expired_entries_leave_the_totals(tmp_path):
+    cache = DiskCache(tmp_path, ttl_seconds=60)
+    cache.set("a", VALUE)
+    _age(cache, "a", 120)
+
+    assert cache.get("a") is None
+    assert (cache.stats()["entries"], cache.stats()["bytes"]) == (0, 0)
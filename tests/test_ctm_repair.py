@@ -0,0 +1,65 @@
+import pytest
+
+from routers.mindmap.ctm_repair import CTMLineRepairer, RepairStats, repair_ctm
+from routers.mindmap.ctm_validator import validate_ctm
+
+
+@pytest.mark.parametrize("text, fix, repaired", [
+    ("Root\n>a\n\n>b", "blank_lines", "Root\n>a\n>b"),
+    ("```json\nRoot\n>a\n```", "code_fence", "Root\n>a"),
+    ("Root\n  >a\n>b", "leading_whitespace", "Root\n>a\n>b"),
+    ("Root\n> a\n>> b", "space_after_marker", "Root\n>a\n>>b"),
+    ("Root\n>a|\n>b", "dangling_pipe", "Root\n>a\n>b"),
+    ("Root\n>>a\n>>>b\n>c", "level_skip", "Root\n>a\n>>b\n>c"),
+])
+def test_each_fix(text, fix, repaired):
+    result = repair_ctm(text)
+    assert result is not None
+    assert result["fixes"] == [fix]
+    assert result["ctm"] == repaired
+    assert validate_ctm(result["ctm"])["is_valid"]
+
+
+def test_combined_fixes():
+    result = repair_ctm("```\nRoot\n\n  > a|\n>>>b\n```")
+    assert result["ctm"] == "Root\n>a\n>>b"
+    assert result["fixes"] == [
+        "blank_lines", "code_fence", "dangling_pipe", "leading_whitespace", "level_skip", "space_after_marker"
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "Root\n>a",  # already valid: nothing to fix
+    ">Root\n>a",  # root problems are left to the validator
+    "Root\n>a|color",  # not a mechanical error
+    "Root\n>a\n>>>>b",  # skips of more than one level are not guessed
+])
+def test_unrepairable_returns_none(text):
+    assert repair_ctm(text) is None
+
+
+def test_level_skip_shifts_whole_subtree():
+    repairer = CTMLineRepairer()
+    lines = [repairer.repair_line(line) for line in ["Root", ">>a", ">>>b", ">>>>c", ">>d", ">e"]]
+    assert lines == ["Root", ">a", ">>b", ">>>c", ">d", ">e"]
+
+
+def test_stats_count_attempts_and_repairs():
+    stats = RepairStats()
+    stats.record(None)
+    stats.record({"ctm": "Root", "fixes": ["code_fence", "blank_lines"], "validation_message": ""})
+    assert stats.stats() == {
+        "attempts": 2,
+        "repaired": 1,
+        "retries_avoided": 1,
+        "fixes": {"code_fence": 1, "blank_lines": 1},
+    }
+
+
+def test_unrecorded_repair_leaves_stats_alone(monkeypatch):
+    stats = RepairStats()
+    monkeypatch.setattr("routers.mindmap.ctm_repair.repair_stats", stats)
+    assert repair_ctm("Root\n> a", record=False) is not None
+    assert stats.attempts == 0
+    repair_ctm("Root\n> a")
+    assert stats.attempts == 1
@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+from benchmarks import _legacy_ctm_validator as legacy
+from routers.mindmap.ctm_validator import IncrementalCTMValidator, parse_ctm, validate_ctm
+
+INVALID_INPUTS = [
+    "",
+    "   \n\n  ",
+    "```ctm\n```",
+    ">Root\n>a",
+    "Root\n >a",
+    "Root\n\t>a",
+    "Root\n> a",
+    "Root\n>>a",
+    "Root\n>a\n>>>b",
+    "Root\n>",
+    "Root\n>|k:v",
+    "Root\n>a|",
+    "Root\n>a|   ",
+    "Root\n>a|color",
+    "Root\n>a|:blue",
+    "Root\n>a|k:v,oops",
+    "Root\n>a|k:v\n>>>b",
+    "Root\n>a|bad\n> b",
+    "```ctm\n>Root\n>a\n```",
+    "```\nRoot\n>>a```",
+]
+
+# Fragments that produce the corner cases: escapes, fences, whitespace around markers
+_ATOMS = [">", ">>", " ", "\t", "|", ":", ",", "\\", "a", "Node", "k:v", "```", "```ctm", "\n", "\n\n", "x\\|y"]
+
+
+def _random_texts(seed: int, count: int) -> list[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(_ATOMS) for _ in range(rng.randint(0, 30))) for _ in range(count)]
+
+
+def _feed(text: str) -> IncrementalCTMValidator:
+    validator = IncrementalCTMValidator()
+    for line in text.split("\n"):
+        validator.feed_line(line)
+    return validator
+
+
+@pytest.mark.parametrize("text", INVALID_INPUTS)
+def test_invalid_input_matches_legacy(text):
+    result = validate_ctm(text)
+    assert not result["is_valid"]
+    assert result == legacy.validate_ctm(text)
+
+
+def test_random_input_matches_legacy():
+    for text in _random_texts(seed=1, count=20000):
+        assert validate_ctm(text) == legacy.validate_ctm(text), repr(text)
+
+
+def test_parse_builds_tree():
+    result = parse_ctm("```ctm\nRoot\n>a|color:blue\n>>b\n>c\n```")
+    assert result["is_valid"]
+    tree = result["tree"]
+    assert tree.labels == ["Root", "a", "b", "c"]
+    assert tree.levels.tolist() == [0, 1, 2, 1]
+    assert tree.parents.tolist() == [-1, 0, 1, 0]
+    assert tree.attributes == [(1, "color", "blue")]
+
+
+def test_incremental_reports_first_error():
+    validator = _feed("Root\n>a\n>>>b\n>c")
+    assert validator.error_code == "level_skip"
+    assert validator.error.startswith("Line 3:")
+    assert validator.tree.labels == ["Root", "a"]
+
+
+def test_incremental_unterminated_fence_is_root():
+    # Without a closing fence validate_ctm keeps "```" as the root node
+    text = "```\n>a\n>>b"
+    assert validate_ctm(text)["is_valid"]
+    validator = _feed(text)
+    assert validator.error is None
+    assert validator.tree.labels == ["```", "a", "b"]
+
+
+def test_incremental_fenced_last_line_is_deferred():
+    # The closing fence is cut off the last line: ">a|k:v," is valid, ">a|k:v,```" would not be
+    text = "```ctm\nRoot\n>a|k:v,```"
+    assert validate_ctm(text)["is_valid"]
+    assert _feed(text).error is None
+
+
+def test_incremental_never_stricter_than_full_validation():
+    for text in _random_texts(seed=2, count=20000):
+        if validate_ctm(text)["is_valid"]:
+            assert _feed(text).error is None, repr(text)
@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from config.Setttings import settings
+from core.hedging import BackendBusy, CircuitBreaker, Hedger
+
+
+@pytest.fixture(autouse=True)
+def fast_hedging(monkeypatch):
+    monkeypatch.setattr(settings, "hedge_default_delay_seconds", 0.05)
+    monkeypatch.setattr(settings, "hedge_min_samples", 5)
+    monkeypatch.setattr(settings, "breaker_failure_threshold", 2)
+    monkeypatch.setattr(settings, "breaker_reset_seconds", 60.0)
+
+
+class Call:
+    """Backend call factory: answers after ``delay``, or raises ``error``."""
+
+    def __init__(self, answer: str = "ok", delay: float = 0.0, error: Exception | None = None):
+        self.answer = answer
+        self.delay = delay
+        self.error = error
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> str:
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.answer
+
+
+def _race(hedger: Hedger, calls: dict, accept=lambda text: True):
+    return asyncio.run(hedger.race(calls, accept))
+
+
+def test_fast_preferred_backend_is_not_hedged():
+    hedger, preferred, other = Hedger(), Call("first"), Call("second")
+
+    assert _race(hedger, {"a": preferred, "b": other}) == ("a", "first")
+    assert other.started == 0
+    assert hedger.hedged_races == 0
+    assert hedger.backend("a").wins == 1
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled():
+    hedger, slow, fast = Hedger(), Call("slow", delay=5), Call("fast")
+
+    assert _race(hedger, {"a": slow, "b": fast}) == ("b", "fast")
+    assert slow.cancelled == 1
+    assert hedger.hedged_races == 1
+    assert hedger.backend("b").hedges == 1
+    assert hedger.backend("a").cancelled == 1
+    # A cancelled call is not a failure of its backend
+    assert hedger.backend("a").breaker.failures == 0
+
+
+def test_failed_call_fails_over_at_once():
+    hedger, failing, other = Hedger(), Call(error=ConnectionError("refused"), delay=0), Call("second")
+
+    assert _race(hedger, {"a": failing, "b": other}) == ("b", "second")
+    assert hedger.backend("b").failovers == 1
+    assert hedger.backend("a").last_error == "ConnectionError: refused"
+
+
+def test_rejected_answers_return_the_last_one():
+    hedger = Hedger()
+    # "a" is hedged before it answers, both answers are rejected
+    result = _race(hedger, {"a": Call("bad a", delay=0.1), "b": Call("bad b", delay=0.1)}, accept=lambda text: False)
+
+    assert result == ("b", "bad b")
+    assert hedger.backend("a").rejected == hedger.backend("b").rejected == 1
+
+
+def test_every_backend_failing_raises_the_last_error():
+    hedger = Hedger()
+    calls = {"a": Call(error=ConnectionError("a down")), "b": Call(error=TimeoutError("b down"))}
+
+    with pytest.raises(TimeoutError):
+        _race(hedger, calls)
+
+
+def test_every_backend_busy_raises_backend_busy():
+    hedger = Hedger()
+    calls = {"a": Call(error=BackendBusy("full")), "b": Call(error=BackendBusy("full"))}
+
+    with pytest.raises(BackendBusy):
+        _race(hedger, calls)
+    # Busy is not a failure
+    assert hedger.backend("a").breaker.failures == 0
+    assert hedger.backend("a").busy == 1
+
+
+def test_open_breaker_skips_the_backend():
+    hedger = Hedger()
+    for _ in range(2):
+        hedger.backend("a").breaker.record_failure()
+    preferred, other = Call("first"), Call("second")
+
+    assert _race(hedger, {"a": preferred, "b": other}) == ("b", "second")
+    assert preferred.started == 0
+    assert hedger.backend("a").skipped == 1
+    assert hedger.backend("b").failovers == 1
+
+
+def test_every_breaker_open_still_calls_the_preferred_backend():
+    hedger = Hedger()
+    for name in ("a", "b"):
+        for _ in range(2):
+            hedger.backend(name).breaker.record_failure()
+    preferred = Call("first")
+
+    assert _race(hedger, {"a": preferred, "b": Call("second")}) == ("a", "first")
+    assert preferred.started == 1
+
+
+def test_breaker_opens_after_failures_in_a_row():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    # Only the first caller gets the trial
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+
+
+def test_abandoned_trial_can_be_retried():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_abandoned()
+    assert breaker.allow()
+
+
+def test_track_records_latency_and_failures():
+    hedger = Hedger()
+    with hedger.track("a"):
+        pass
+    with pytest.raises(ConnectionError):
+        with hedger.track("a"):
+            raise ConnectionError("refused")
+    with hedger.track("a") as call:
+        call.complete = False
+
+    health = hedger.backend("a")
+    assert health.calls == 3
+    assert health.failures == 1
+    # The cut-short call is not a latency sample
+    assert len(health.latencies) == 1
+    assert health.breaker.failures == 0
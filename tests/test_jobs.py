@@ -0,0 +1,56 @@
+import asyncio
+
+from config.Setttings import settings
+from routers.mindmap.dto import StreamStatus
+from routers.mindmap.jobs import JobManager
+from routers.mindmap.service import create_event
+
+
+async def _generation(fail: bool = False):
+    yield create_event(StreamStatus.PROCESSING, "processing")
+    if fail:
+        raise RuntimeError("backend exploded")
+    yield create_event(StreamStatus.SUCCESS, "done", {"ctm": "Root"})
+
+
+def _run_job(manager: JobManager, generation, on_finish=None) -> tuple[str, list[dict]]:
+    async def collect():
+        job = await manager.start(generation, on_finish)
+        try:
+            return job.id, [event async for event in manager.stream(job)]
+        finally:
+            await manager.shutdown()
+    return asyncio.run(collect())
+
+
+def test_unwritable_store_does_not_fail_the_job(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "job_store_path", str(tmp_path / "missing" / "jobs.sqlite3"))
+    manager = JobManager()
+    finished = []
+
+    _, events = _run_job(manager, _generation(), on_finish=lambda: finished.append(True))
+
+    assert [event["status"] for event in events] == [StreamStatus.PROCESSING.value, StreamStatus.SUCCESS.value]
+    assert finished == [True]
+    # The running and the final status could not be saved
+    assert manager.stats()["store_errors"] == 2
+    assert manager.stats()["last_store_error"].startswith("OperationalError")
+
+
+def test_failed_job_ends_with_error_event(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "job_store_path", str(tmp_path / "jobs.sqlite3"))
+    manager = JobManager()
+
+    job_id, events = _run_job(manager, _generation(fail=True))
+
+    assert [event["status"] for event in events] == [StreamStatus.PROCESSING.value, StreamStatus.ERROR.value]
+    assert events[-1]["data"]["error"] == "RuntimeError: backend exploded"
+
+    async def resume():
+        # The job is gone from memory: the client resumes from the persisted record
+        stream = await manager.reattach(job_id, after=1)
+        return [event async for event in stream]
+
+    assert [(event["id"], event["status"]) for event in asyncio.run(resume())] == [(2, StreamStatus.ERROR.value)]
+    assert manager._store.load(job_id)["status"] == "failed"
+    assert manager.stats()["store_errors"] == 0
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from core.scheduler import BackendScheduler, QueueFullError
+
+
+def _scheduler(max_concurrency: int = 1, max_queue_depth: int = 2) -> BackendScheduler:
+    return BackendScheduler("test", max_concurrency, max_queue_depth, initial_service_seconds=10.0)
+
+
+def test_queued_tickets_get_slots_in_fifo_order():
+    scheduler = _scheduler(max_queue_depth=3)
+    running = scheduler.ticket()
+    assert scheduler.try_start(running)
+    queued = [scheduler.ticket() for _ in range(3)]
+    for ticket in queued:
+        assert not scheduler.try_start(ticket)
+        scheduler.enqueue(ticket)
+
+    for i, ticket in enumerate(queued):
+        assert [t.state for t in queued[i:]] == ["queued"] * (len(queued) - i)
+        running.release()
+        # The freed slot goes straight to the head of the queue
+        assert ticket.state == "running"
+        assert scheduler.active == 1
+        running = ticket
+    running.release()
+    assert scheduler.active == 0
+    assert scheduler.completed == 4
+
+
+def test_leaving_the_queue_moves_the_others_up():
+    scheduler = _scheduler()
+    running = scheduler.ticket()
+    scheduler.try_start(running)
+    first, second = scheduler.ticket(), scheduler.ticket()
+    scheduler.enqueue(first)
+    scheduler.enqueue(second)
+    assert scheduler.position(second) == 2
+
+    first.release()
+    assert first.state == "released"
+    assert scheduler.position(second) == 1
+    running.release()
+    assert second.state == "running"
+
+
+def test_full_queue_rejects_with_retry_after():
+    scheduler = _scheduler(max_concurrency=2, max_queue_depth=1)
+    for _ in range(2):
+        assert scheduler.try_start(scheduler.ticket())
+    scheduler.enqueue(scheduler.ticket())
+
+    with pytest.raises(QueueFullError) as error:
+        scheduler.enqueue(scheduler.ticket())
+    # Second in line behind two slots: one service time away
+    assert error.value.retry_after == 10.0
+    assert scheduler.rejected == 1
+    assert len(scheduler.queue) == 1
+
+
+def test_wait_reports_positions_until_the_slot_is_granted():
+    async def run():
+        scheduler = _scheduler()
+        running = scheduler.ticket()
+        scheduler.try_start(running)
+        ahead, ticket = scheduler.ticket(), scheduler.ticket()
+        scheduler.enqueue(ahead)
+
+        positions = []
+
+        async def wait():
+            async for position, estimated_wait in ticket.wait():
+                positions.append((position, estimated_wait))
+
+        waiter = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        ahead.release()
+        await asyncio.sleep(0)
+        running.release()
+        await asyncio.wait_for(waiter, 1)
+        return ticket, positions
+
+    ticket, positions = asyncio.run(run())
+    assert ticket.state == "running"
+    assert positions == [(2, 20.0), (1, 10.0)]
+
+
+def test_cancelled_waiter_gives_its_place_up():
+    async def run():
+        scheduler = _scheduler()
+        running = scheduler.ticket()
+        scheduler.try_start(running)
+        ticket = scheduler.ticket()
+
+        async def wait():
+            try:
+                async for _ in ticket.wait():
+                    pass
+            finally:
+                ticket.release()
+
+        waiter = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        assert len(scheduler.queue) == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return scheduler, ticket
+
+    scheduler, ticket = asyncio.run(run())
+    assert ticket.state == "released"
+    assert not scheduler.queue
+    assert scheduler.active == 1
+
+
+def test_background_waits_behind_interactive_and_is_never_rejected():
+    scheduler = _scheduler(max_queue_depth=0)
+    running = scheduler.ticket()
+    assert scheduler.try_start(running)
+
+    background = [scheduler.ticket(background=True) for _ in range(3)]
+    for ticket in background:
+        assert not scheduler.try_start(ticket)
+        scheduler.enqueue(ticket)
+    scheduler.max_queue_depth = 1
+    interactive = scheduler.ticket()
+    scheduler.enqueue(interactive)
+
+    assert scheduler.position(interactive) == 1
+    assert [scheduler.position(ticket) for ticket in background] == [2, 3, 4]
+
+    running.release()
+    assert interactive.state == "running"
+    interactive.release()
+    assert [ticket.state for ticket in background] == ["running", "queued", "queued"]
@@ -0,0 +1,116 @@
+import asyncio
+
+import httpx
+import pytest
+
+from config.Setttings import settings
+from core.hedging import Hedger
+from core.scheduler import GenerationScheduler
+from routers.mindmap import service
+from routers.mindmap.cache import ResultCache
+from routers.mindmap.dto import LLMConfig, LLMType, StreamStatus
+
+
+class UnreachableLLM:
+    """Chat model whose every call fails like an unreachable Ollama."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        raise httpx.ConnectError("All connection attempts failed")
+
+    async def astream(self, messages):
+        self.calls += 1
+        raise httpx.ConnectError("All connection attempts failed")
+        yield  # an async generator, like the real one
+
+
+def _run(content: str, llm_config: LLMConfig | None) -> list[dict]:
+    async def collect():
+        return [event async for event in service.generate_mindmap_single(content, llm_config, "key")]
+    return asyncio.run(collect())
+
+
+@pytest.fixture(autouse=True)
+def hedger(monkeypatch):
+    # Breakers tripped by one test must not skip backends in the next one
+    fresh = Hedger()
+    monkeypatch.setattr(service, "hedger", fresh)
+    return fresh
+
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    llm = UnreachableLLM()
+    monkeypatch.setattr(service, "get_llm", lambda llm_config=None: llm)
+    return llm
+
+
+@pytest.mark.parametrize("stream_llm, progressive", [(True, False), (False, True), (False, False)])
+def test_unreachable_backend_ends_with_error(monkeypatch, hedger, unreachable, stream_llm, progressive):
+    monkeypatch.setattr(settings, "mindmap_stream_llm", stream_llm)
+    monkeypatch.setattr(settings, "mindmap_progressive_nodes", progressive)
+
+    events = _run("text", None)
+
+    assert [event["status"] for event in events] == [StreamStatus.PROCESSING.value, StreamStatus.ERROR.value]
+    data = events[-1]["data"]
+    assert data["last_error"].startswith("ConnectError")
+    assert data["backend_errors"] == {"ollama": data["last_error"]}
+    # No corrective retries for a backend that does not answer
+    assert unreachable.calls == 1
+    assert hedger.backend("ollama").failures == 1
+
+
+def test_hedged_call_with_every_backend_failing_ends_with_error(monkeypatch, unreachable):
+    monkeypatch.setattr(settings, "hedging_enabled", True)
+    monkeypatch.setattr(settings, "ollama_chat_model", "test-model")
+    monkeypatch.setattr(settings, "ollama_base_url", "http://ollama.invalid")
+    llm_config = LLMConfig(llm_type=LLMType.GEMINI, api_key="test-key", hedge=True)
+
+    events = _run("text", llm_config)
+
+    assert events[-1]["status"] == StreamStatus.ERROR.value
+    assert set(events[-1]["data"]["backend_errors"]) == {"gemini", "ollama"}
+    assert unreachable.calls == 2
+
+
+def _generate(content: str) -> list[dict]:
+    async def collect():
+        return [event async for event in service.generate_mindmap(content)]
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def full_queue(monkeypatch):
+    """Ollama scheduler with its only slot taken and no room in the queue."""
+    monkeypatch.setattr(settings, "scheduler_ollama_max_concurrency", 1)
+    monkeypatch.setattr(settings, "scheduler_max_queue_depth", 0)
+    monkeypatch.setattr(settings, "semantic_cache_enabled", False)
+    monkeypatch.setattr(settings, "mindmap_cache_dir", "")
+    monkeypatch.setattr(service, "scheduler", GenerationScheduler())
+    monkeypatch.setattr(service, "result_cache", ResultCache())
+    backend = service.scheduler.for_config(None)
+    assert backend.try_start(backend.ticket())
+    return backend
+
+
+def test_full_queue_rejects_new_generations(full_queue, unreachable):
+    events = _generate("uncached text")
+
+    assert [event["status"] for event in events] == [StreamStatus.ERROR.value]
+    assert "retry_after" in events[0]["data"]
+    assert unreachable.calls == 0
+
+
+def test_full_queue_still_serves_cached_results(full_queue, unreachable):
+    content = "cached text"
+    asyncio.run(service.result_cache.set(service.cache_key(content, None), {"ctm": "Root\n>a", "validation_message": ""}))
+
+    events = _generate(content)
+
+    assert [event["status"] for event in events] == [StreamStatus.SUCCESS.value]
+    assert events[0]["data"]["cached"]
+    assert full_queue.rejected == 0
@@ -0,0 +1,138 @@
+import asyncio
+
+from core.singleflight import SharedRun, SingleFlight
+
+
+class Source:
+    """Generator factory that counts runs and can be held between events."""
+
+    def __init__(self, events: int = 3, fail: bool = False):
+        self.events = events
+        self.fail = fail
+        self.runs = 0
+        self.closed = 0
+        self.step = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        try:
+            for i in range(self.events):
+                await self.step.wait()
+                yield i
+            if self.fail:
+                raise RuntimeError("generation failed")
+        finally:
+            self.closed += 1
+
+
+async def _collect(events) -> list:
+    return [event async for event in events]
+
+
+def test_subscribers_share_one_run():
+    async def run():
+        flights, source = SingleFlight(), Source()
+        first = asyncio.create_task(_collect(flights.subscribe("key", source)))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(_collect(flights.subscribe("key", source)))
+        await asyncio.sleep(0)
+        assert flights.is_running("key")
+        source.step.set()
+        return flights, source, await first, await second
+
+    flights, source, first, second = asyncio.run(run())
+    assert first == second == [0, 1, 2]
+    assert source.runs == 1
+    assert (flights.started, flights.joined) == (1, 1)
+    # Finished runs are forgotten: the next request starts a new one
+    assert not flights.is_running("key")
+
+
+def test_late_joiner_gets_the_events_it_missed():
+    async def run():
+        flights, source = SingleFlight(), Source()
+        source.step.set()
+        first = flights.subscribe("key", source)
+        seen = [await anext(first), await anext(first)]
+        late = await _collect(flights.subscribe("key", source))
+        return seen + await _collect(first), late
+
+    first, late = asyncio.run(run())
+    assert first == late == [0, 1, 2]
+
+
+def test_last_subscriber_leaving_cancels_the_run():
+    async def run():
+        flights, source = SingleFlight(), Source()
+        subscribers = [flights.subscribe("key", source) for _ in range(2)]
+        tasks = [asyncio.create_task(_collect(events)) for events in subscribers]
+        await asyncio.sleep(0)
+        tasks[0].cancel()
+        await asyncio.sleep(0)
+        # Someone still listens
+        assert source.closed == 0 and flights.is_running("key")
+        tasks[1].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flights, source
+
+    flights, source = asyncio.run(run())
+    assert source.closed == 1
+    assert not flights.is_running("key")
+
+
+def test_detached_run_outlives_its_subscribers():
+    async def run():
+        source = Source()
+        shared = SharedRun(source(), on_close=lambda: None, detached=True)
+        listener = asyncio.create_task(_collect(shared.subscribe()))
+        await asyncio.sleep(0)
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        source.step.set()
+        await shared.task
+        return shared
+
+    shared = asyncio.run(run())
+    assert shared.done and shared.error is None
+    assert [event for _, event in shared.events] == [0, 1, 2]
+
+
+def test_failure_reaches_every_subscriber():
+    async def run():
+        flights, source = SingleFlight(), Source(events=1, fail=True)
+        tasks = [asyncio.create_task(_collect(flights.subscribe("key", source))) for _ in range(2)]
+        await asyncio.sleep(0)
+        source.step.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    for result in asyncio.run(run()):
+        assert isinstance(result, RuntimeError)
+
+
+def test_bounded_replay_skips_dropped_events():
+    async def run():
+        source = Source(events=5)
+        source.step.set()
+        shared = SharedRun(source(), on_close=lambda: None, max_events=2, detached=True)
+        shared.start()
+        await shared.task
+        return await _collect(shared.subscribe_from(0)), await _collect(shared.subscribe_from(4))
+
+    replay, after = asyncio.run(run())
+    assert replay == [(4, 3), (5, 4)]
+    assert after == [(5, 4)]
+
+
+def test_different_keys_run_separately():
+    async def run():
+        flights, source = SingleFlight(), Source()
+        tasks = [asyncio.create_task(_collect(flights.subscribe(key, source))) for key in ("a", "b")]
+        await asyncio.sleep(0)
+        source.step.set()
+        await asyncio.gather(*tasks)
+        return flights, source
+
+    flights, source = asyncio.run(run())
+    assert source.runs == 2
+    assert (flights.started, flights.joined) == (2, 0)
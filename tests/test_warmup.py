@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+import pytest
+
+from config.Setttings import settings
+from core.warmup import OllamaWarmer
+
+
+def _warmer(handler) -> OllamaWarmer:
+    warmer = OllamaWarmer()
+    warmer._client = httpx.AsyncClient(base_url="http://ollama.test", transport=httpx.MockTransport(handler))
+    return warmer
+
+
+@pytest.fixture(autouse=True)
+def ollama_model(monkeypatch):
+    monkeypatch.setattr(settings, "ollama_chat_model", "test-model")
+
+
+@pytest.mark.parametrize("tags", [
+    httpx.Response(200, text="<html>proxy error</html>"),  # not JSON
+    httpx.Response(200, json=["test-model"]),  # no "models" key
+    httpx.Response(200, json={"models": ["test-model"]}),  # models without names
+])
+def test_unexpected_tags_response_fails_without_raising(tags):
+    warmer = _warmer(lambda request: tags)
+    asyncio.run(warmer._warm_once())
+    assert warmer.state == "failed"
+    assert warmer.error
+    assert not warmer.ready
+
+
+def test_unexpected_error_fails_and_next_attempt_recovers():
+    responses = iter([RuntimeError("boom")])
+
+    def handler(request):
+        error = next(responses, None)
+        if error is not None:
+            raise error
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "test-model:latest"}]})
+        return httpx.Response(200, json={"done": True})
+
+    warmer = _warmer(handler)
+    asyncio.run(warmer._warm_once())
+    assert warmer.state == "failed"
+    assert warmer.error == "RuntimeError: boom"
+
+    asyncio.run(warmer._warm_once())
+    assert warmer.state == "ready"
+    assert warmer.error is None